@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Profile, Category, SubCategory, Product
+from .models import Profile, Category, SubCategory, Product, Order, Supplier, PurchaseOrder
 
 # Register your models here.
 admin.site.register(Profile)
@@ -7,3 +7,6 @@ admin.site.register(Category)
 admin.site.register(SubCategory)
 admin.site.register(Product)
 
+admin.site.register(Order)
+admin.site.register(Supplier)
+admin.site.register(PurchaseOrder)
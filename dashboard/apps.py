@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class DashboardConfig(AppConfig):
@@ -8,3 +9,8 @@ class DashboardConfig(AppConfig):
     def ready(self):
         # Import signal handlers here to ensure they are connected
         import dashboard.signals
+
+        if settings.METRICS:
+            from .metrics import observe_timing
+            from .profiling import timing_measured
+            timing_measured.connect(observe_timing)
@@ -0,0 +1,452 @@
+import contextlib
+import itertools
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from importlib import import_module
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Category, Customer, Order, Product, PurchaseOrder, PurchaseOrderLine, SubCategory, Supplier
+from .inventory import with_stock
+from .purchasing import create_purchase_order
+from .seeding import SeedSizes, seed_benchmark_data
+
+
+# Committed measurements `benchmark_views` compares against, and the test suite only their query
+# counts; rewritten by `benchmark_views --update-baselines`
+BASELINES_PATH = Path(__file__).resolve().parent / 'benchmark_baselines.json'
+
+# Every route of these URL configurations must have a benchmark case
+URL_MODULES = ['dashboard.urls', 'accounts.urls', 'welcome.urls']
+
+# The data the suite runs on: the measured user and a second one whose rows must not be read
+SUITE_USERS = 2
+SUITE_SIZES = SeedSizes(categories=4, sub_categories=3, products=5, customers=20, suppliers=5, orders=20, images=4)
+
+# How far a measurement may exceed its baseline before it is a regression. Query counts
+# are exact; wall time and memory vary between runs and machines, hence a ratio plus a margin.
+DEFAULT_TOLERANCE = {'time_ratio': 2.0, 'time_ms': 15.0, 'memory_ratio': 1.25, 'memory_kib': 128}
+
+# The ways of holding the database connection compared by `benchmark_connections`: settings of the default database
+CONNECTION_MODES = {
+    'new': {'CONN_MAX_AGE': 0},
+    'persistent': {'CONN_MAX_AGE': 600},
+    'pool': {'CONN_MAX_AGE': 0, 'OPTIONS': {'pool': True}},
+}
+
+
+class Case(NamedTuple):
+    path: Callable
+    method: str = 'get'
+    data: Callable = None
+    content_type: str = None
+    anonymous: bool = False
+
+
+class Measurement(NamedTuple):
+    queries: int
+    time_ms: float
+    peak_kib: int
+
+
+class ConnectionMeasurement(NamedTuple):
+    median_ms: float
+    p95_ms: float
+    connections: int
+
+
+class SessionMeasurement(NamedTuple):
+    queries: int
+    session_reads: int
+    session_writes: int
+    median_ms: float
+
+
+def route_names() -> set:
+    return {
+        pattern.name for module in URL_MODULES
+        for pattern in import_module(module).urlpatterns if pattern.name
+    }
+
+
+def build_cases(user) -> dict:
+    """
+    Describes one request to every route, on the rows of a seeded user.
+
+    Parameters:
+    - user (User): The seeded user the requests are made as.
+
+    Returns:
+    dict: The `Case` of each URL name. Paths and data are callables,
+    evaluated before each request so a case can make a fresh object to act on.
+    """
+    def first(model):
+        return model.objects.filter(owner=user).order_by('id').values_list('pk', flat=True).first()
+
+    def pk_path(name, model):
+        return lambda: reverse(name, args=[first(model)])
+
+    def open_purchase_order():
+        # Receiving is one-off: every request receives a purchase order of its own
+        product = Product.objects.filter(owner=user).order_by('id').first()
+        line = PurchaseOrderLine(product=product, name=product.name, quantity=10, unit_cost=1, total=10)
+        return reverse('purchase_order_receive', args=[create_purchase_order(user, None, [line]).pk])
+
+    def checkout_data():
+        products = with_stock(Product.objects.filter(owner=user)).filter(stock__gt=0).order_by('id')
+        products = products.values_list('pk', flat=True)[:3]
+        return json.dumps({'lines': [{'product': pk, 'quantity': 1} for pk in products]})
+
+    def path(name, query=''):
+        return lambda: reverse(name) + query
+
+    return {
+        'welcome': Case(path('welcome'), anonymous=True),
+        'terms-of-service': Case(path('terms-of-service'), anonymous=True),
+        'account_login': Case(path('account_login'), anonymous=True),
+        'account_signup': Case(path('account_signup'), anonymous=True),
+        'account_logout': Case(path('account_logout')),
+        'account_change_password': Case(path('account_change_password')),
+
+        'dashboard': Case(path('dashboard')),
+        'profile': Case(lambda: reverse('profile', args=[user.username])),
+
+        'category_create': Case(path('category_create')),
+        'categories': Case(path('categories')),
+        'category_update': Case(pk_path('category_update', Category)),
+        'category_delete': Case(pk_path('category_delete', Category)),
+        'category_export': Case(path('category_export')),
+
+        'sub_category_create': Case(path('sub_category_create')),
+        'sub_categories': Case(path('sub_categories')),
+        'sub_category_update': Case(pk_path('sub_category_update', SubCategory)),
+        'sub_category_delete': Case(pk_path('sub_category_delete', SubCategory)),
+        'sub_category_export': Case(path('sub_category_export')),
+        'sub_category_lookup': Case(path('sub_category_lookup', '?q=be')),
+
+        'product_create': Case(path('product_create')),
+        'products': Case(path('products')),
+        'product_update': Case(pk_path('product_update', Product)),
+        'product_delete': Case(pk_path('product_delete', Product)),
+        'product_export': Case(path('product_export')),
+
+        'pos': Case(path('pos')),
+        'checkout': Case(path('checkout'), method='post', data=checkout_data, content_type='application/json'),
+        'orders': Case(path('orders')),
+        'order_detail': Case(pk_path('order_detail', Order)),
+
+        'inventory': Case(path('inventory')),
+        'stock_movement_create': Case(path('stock_movement_create')),
+        'purchase_orders': Case(path('purchase_orders')),
+        'purchase_order_create': Case(path('purchase_order_create')),
+        'purchase_order_detail': Case(pk_path('purchase_order_detail', PurchaseOrder)),
+        'purchase_order_receive': Case(open_purchase_order, method='post'),
+
+        'customer_create': Case(path('customer_create')),
+        'customers': Case(path('customers')),
+        'customer_update': Case(pk_path('customer_update', Customer)),
+        'customer_delete': Case(pk_path('customer_delete', Customer)),
+        'customer_payment': Case(pk_path('customer_payment', Customer)),
+        'customer_lookup': Case(path('customer_lookup', '?q=am')),
+
+        'supplier_create': Case(path('supplier_create')),
+        'suppliers': Case(path('suppliers')),
+        'supplier_update': Case(pk_path('supplier_update', Supplier)),
+        'supplier_delete': Case(pk_path('supplier_delete', Supplier)),
+        'supplier_export': Case(path('supplier_export')),
+
+        'customer_report': Case(path('customer_report')),
+        'dues_report': Case(path('dues_report')),
+        'sales_report': Case(path('sales_report')),
+        'sales_report_export': Case(path('sales_report_export')),
+        'stock_report': Case(path('stock_report')),
+
+        'catalog_import': Case(path('catalog_import')),
+    }
+
+
+def prepare(case: Case) -> tuple:
+    # Outside the measured request: building the path or data may query, or write the object acted on
+    kwargs = {}
+    if case.data is not None:
+        kwargs['data'] = case.data()
+    if case.content_type is not None:
+        kwargs['content_type'] = case.content_type
+    return case.method, case.path(), kwargs
+
+
+def send(client: Client, prepared: tuple):
+    method, path, kwargs = prepared
+    response = getattr(client, method)(path, **kwargs)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    if response.status_code >= 400:
+        raise AssertionError(f'{method.upper()} {path} answered {response.status_code}.')
+    return response
+
+
+def measure(client: Client, case: Case, repeat: int) -> Measurement:
+    """
+    Measures one case: the queries of a request, the median wall time of
+    `repeat` requests and the peak memory allocated by a request.
+
+    A first request warms the caches, so the numbers are those of a page
+    served repeatedly.
+    """
+    send(client, prepare(case))
+
+    prepared = prepare(case)
+    with CaptureQueriesContext(connection) as queries:
+        send(client, prepared)
+    # Counted now: the captured list is a slice of the connection's log, which the next request resets
+    query_count = len(queries)
+
+    timings = []
+    for _ in range(repeat):
+        prepared = prepare(case)
+        start = time.perf_counter()
+        send(client, prepared)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Tracing slows allocations down, so memory is measured on its own request
+    prepared = prepare(case)
+    tracemalloc.start()
+    try:
+        send(client, prepared)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(queries=query_count, time_ms=round(statistics.median(timings), 2), peak_kib=peak // 1024)
+
+
+@contextlib.contextmanager
+def benchmark_storage():
+    # Seeded images go to a temporary media directory, and pages render without collected static files
+    storages = {**settings.STORAGES, 'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    }}
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root, STORAGES=storages):
+        yield
+
+
+def run_benchmarks(repeat: int = 5) -> dict:
+    """
+    Seeds the suite's data and measures every route.
+
+    Run it on a test database: it writes users and rows, and stores the
+    seeded images in a temporary media directory.
+
+    Parameters:
+    - repeat (int): Timed requests per route. Default is 5.
+
+    Returns:
+    dict: The `Measurement` of each URL name, or None for routes without a case.
+    """
+    with benchmark_storage():
+        user = seed_benchmark_data(SUITE_USERS, SUITE_SIZES, prefix='benchmark')[0]
+        cases = build_cases(user)
+
+        client = Client()
+        client.force_login(user)
+        anonymous = Client()
+
+        results = {}
+        for name in sorted(route_names()):
+            case = cases.get(name)
+            results[name] = None if case is None else measure(anonymous if case.anonymous else client, case, repeat)
+    return results
+
+
+def measure_connection_modes(user, path: str, repeat: int = 50) -> dict:
+    """
+    Measures a page under each of the `CONNECTION_MODES`.
+
+    The requests go through Django's WSGI handler, as on a server: the
+    test client keeps the connection open across requests, whatever its
+    settings. Run it on a test database holding the user's rows.
+
+    Parameters:
+    - user (User): The user the requests are made as.
+    - path (str): The page.
+    - repeat (int): Timed requests per mode, after a warm-up one. Default is 50.
+
+    Returns:
+    dict: The `ConnectionMeasurement` of each mode, its `connections` being
+    the database connections opened by the timed requests.
+    """
+    client = Client()
+    client.force_login(user)
+    cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+    environ = RequestFactory().get(path, HTTP_COOKIE=f'{cookie.key}={cookie.value}').environ
+    handler = WSGIHandler()
+
+    def serve():
+        statuses = []
+        response = handler(dict(environ), lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            b''.join(response)
+        finally:
+            # Sends request_finished, which closes the connection unless it is kept
+            response.close()
+        if not statuses[0].startswith('200'):
+            raise AssertionError(f'GET {path} answered {statuses[0]}.')
+
+    # Server processes seen, and those new since the warm-up: a pooled connection is reported each time it is lent
+    seen, opened = set(), []
+
+    def count(sender, connection, **kwargs):
+        backend_pid = connection.connection.info.backend_pid
+        if backend_pid not in seen:
+            seen.add(backend_pid)
+            opened.append(backend_pid)
+
+    original = {**connection.settings_dict, 'OPTIONS': {**connection.settings_dict['OPTIONS']}}
+    results = {}
+    connection_created.connect(count)
+    try:
+        for mode, mode_settings in CONNECTION_MODES.items():
+            connection.close()
+            connection.settings_dict.update({
+                **original, **mode_settings, 'OPTIONS': {**original['OPTIONS'], **mode_settings.get('OPTIONS', {})},
+            })
+            serve()
+            opened.clear()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                serve()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[mode] = ConnectionMeasurement(
+                median_ms=round(statistics.median(timings), 2),
+                p95_ms=round(statistics.quantiles(timings, n=20)[-1], 2) if repeat > 1 else round(timings[0], 2),
+                connections=len(opened),
+            )
+    finally:
+        connection_created.disconnect(count)
+        connection.close()
+        connection.settings_dict.clear()
+        connection.settings_dict.update(original)
+    return results
+
+
+def measure_session_modes(user, repeat: int = 50) -> dict:
+    """
+    Measures a logged-in user's round trip under each `SESSION_ENGINES`
+    mode: the dashboard, a customer created with a success message, and
+    the customer list showing the message.
+
+    Run it on a test database holding the user's rows; it creates customers.
+
+    Parameters:
+    - user (User): The user the requests are made as.
+    - repeat (int): Timed round trips per mode, after a warm-up one. Default is 50.
+
+    Returns:
+    dict: For each mode, the `SessionMeasurement` of each request by URL name.
+    """
+    numbers = itertools.count()
+
+    def customer():
+        number = next(numbers)
+        return {'name': f'Session Customer {number}', 'phone': f'+1777{number:07d}'}
+
+    steps = [
+        ('dashboard', lambda client: client.get(reverse('dashboard'))),
+        ('customer_create', lambda client: client.post(reverse('customer_create'), customer())),
+        ('customers', lambda client: client.get(reverse('customers'))),
+    ]
+
+    results = {}
+    for mode, engine in settings.SESSION_ENGINES.items():
+        with override_settings(SESSION_ENGINE=engine):
+            # A client of its own, whose handler loads the session middleware with the engine
+            client = Client()
+            client.force_login(user)
+            for _, step in steps:
+                step(client)
+
+            timings = {name: [] for name, _ in steps}
+            counts = {}
+            for _ in range(repeat):
+                for name, step in steps:
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = step(client)
+                        timings[name].append((time.perf_counter() - start) * 1000)
+                    statements = [query['sql'] for query in queries]
+                    if response.status_code >= 400:
+                        raise AssertionError(f'{name} answered {response.status_code} with sessions in {mode}.')
+                    session = [sql for sql in statements if '"django_session"' in sql]
+                    counts[name] = (
+                        len(statements),
+                        sum(sql.startswith('SELECT') for sql in session),
+                        sum(not sql.startswith('SELECT') for sql in session),
+                    )
+        results[mode] = {
+            name: SessionMeasurement(*counts[name], median_ms=round(statistics.median(timings[name]), 2))
+            for name, _ in steps
+        }
+    return results
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> dict:
+    if not path.exists():
+        return {'tolerance': DEFAULT_TOLERANCE, 'routes': {}}
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_baselines(results: dict, path: Path = BASELINES_PATH):
+    tolerance = load_baselines(path).get('tolerance', DEFAULT_TOLERANCE)
+    routes = {name: measurement._asdict() for name, measurement in sorted(results.items()) if measurement is not None}
+    with open(path, 'w') as file:
+        json.dump({'tolerance': tolerance, 'routes': routes}, file, indent=2)
+        file.write('\n')
+
+
+def find_regressions(results: dict, baselines: dict, timings: bool = True) -> list:
+    """
+    Compares measurements with their baselines.
+
+    Parameters:
+    - results (dict): From `run_benchmarks`.
+    - baselines (dict): From `load_baselines`.
+    - timings (bool): Whether to compare the wall time and peak memory as well as the
+      query counts. They vary between machines, unlike the counts. Default is True.
+
+    Returns:
+    list: A message per route without a case or baseline, and per measurement over its baseline.
+    """
+    tolerance = {**DEFAULT_TOLERANCE, **baselines.get('tolerance', {})}
+    regressions = []
+    for name, measurement in sorted(results.items()):
+        baseline = baselines['routes'].get(name)
+        if measurement is None:
+            regressions.append(f'{name}: no benchmark case, add one to dashboard.benchmarks.build_cases.')
+            continue
+        if baseline is None:
+            regressions.append(f'{name}: no baseline, run `manage.py benchmark_views --update-baselines`.')
+            continue
+
+        if measurement.queries > baseline['queries']:
+            regressions.append(f'{name}: {measurement.queries} queries, baseline {baseline["queries"]}.')
+        if not timings:
+            continue
+        time_limit = baseline['time_ms'] * tolerance['time_ratio'] + tolerance['time_ms']
+        if measurement.time_ms > time_limit:
+            regressions.append(f'{name}: {measurement.time_ms:.1f} ms, baseline {baseline["time_ms"]:.1f} ms (limit {time_limit:.1f}).')
+        memory_limit = baseline['peak_kib'] * tolerance['memory_ratio'] + tolerance['memory_kib']
+        if measurement.peak_kib > memory_limit:
+            regressions.append(f'{name}: {measurement.peak_kib} KiB peak, baseline {baseline["peak_kib"]} KiB (limit {memory_limit:.0f}).')
+    return regressions
@@ -0,0 +1,129 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .models import Order, OrderLine, Product, StockMovement
+from .dues import charge_sale
+from .inventory import with_stock
+from .rollups import record_sale
+
+
+# Largest quantity of one product accepted on a line
+MAX_QUANTITY = 10000
+
+
+def parse_quantities(lines) -> dict:
+    """
+    Validates the lines of a checkout request.
+
+    Parameters:
+    - lines (Iterable): (product id, quantity) pairs, as strings or integers. Lines
+      with a zero quantity are ignored and repeated products are merged.
+
+    Returns:
+    dict: The quantity of each product id.
+
+    Raises:
+    ValidationError: If a line is malformed or the order has no items.
+    """
+    quantities = {}
+    try:
+        for product_id, quantity in lines:
+            product_id, quantity = int(product_id), int(quantity)
+            if quantity < 0 or quantity > MAX_QUANTITY:
+                raise ValidationError(f'Quantities must be between 0 and {MAX_QUANTITY}.')
+            if quantity:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+    except (TypeError, ValueError):
+        raise ValidationError('Each line needs a product id and a whole quantity.')
+
+    if not quantities:
+        raise ValidationError('The order has no items.')
+    return quantities
+
+
+def checkout(owner, quantities: dict, customer=None, paid: Decimal = None) -> Order:
+    """
+    Writes a sale: the order, its lines, the sale movements of the inventory
+    ledger, the customer's balances and the sales rollup.
+
+    The transaction takes a fixed number of round trips whatever the basket
+    size: one statement locks the basket's products, in id order, and reads
+    their names and prices, a second reads their stock levels, then come the
+    order insert, one `bulk_create` each for the lines and the stock
+    movements, the customer balance update and the rollup increment.
+    Checkouts sharing a product therefore run one after the other, so two of
+    them never both sell the last units; checkouts of other products do not
+    wait on each other.
+
+    The owner's rollup row is also locked until the commit, from the last
+    statement on. Checkouts of one owner only queue up for the commit itself,
+    a cost accepted to keep the dashboard figures exact: incrementing after
+    the commit would lose sales whenever a process died in between.
+
+    Parameters:
+    - owner (User): The seller; every product must belong to them.
+    - quantities (dict): The quantity of each product id, from `parse_quantities`.
+    - customer (Customer): The buyer, one of the owner's customers. Optional.
+    - paid (Decimal): The amount paid, the rest is added to the customer's dues.
+      Default is the order total.
+
+    Returns:
+    Order: The saved order.
+
+    Raises:
+    ValidationError: If a product does not exist or belongs to another owner, if
+    there is not enough of a product in stock, or if the amount paid is not possible.
+    """
+    with transaction.atomic():
+        products = {
+            pk: (name, price) for pk, name, price in
+            Product.objects.select_for_update().filter(owner=owner, pk__in=quantities).order_by('pk')
+            .values_list('pk', 'name', 'price')
+        }
+        missing = sorted(set(quantities) - set(products))
+        if missing:
+            raise ValidationError(f'Unknown products: {", ".join(map(str, missing))}.')
+
+        # A statement of its own: one snapshot taken after the locks are granted sees the
+        # sales of the checkouts that held them, a statement waiting on them would not
+        stock = dict(with_stock(Product.objects.filter(pk__in=products)).values_list('pk', 'stock'))
+
+        lines = []
+        items = 0
+        total = Decimal(0)
+        short = []
+        for product_id, quantity in quantities.items():
+            name, price = products[product_id]
+            if quantity > stock[product_id]:
+                short.append(f'{name} ({max(stock[product_id], 0)} left)')
+            line_total = price * quantity
+            lines.append(OrderLine(product_id=product_id, name=name, quantity=quantity, unit_price=price, total=line_total))
+            items += quantity
+            total += line_total
+
+        if short:
+            raise ValidationError(f'Not enough stock: {", ".join(short)}.')
+        if paid is None:
+            paid = total
+        if paid < 0 or paid > total:
+            raise ValidationError(f'The amount paid must be between 0 and {total}.')
+        if paid < total and customer is None:
+            raise ValidationError('Only a customer can leave dues, select one.')
+
+        order = Order.objects.create(owner=owner, customer=customer, items=items, total=total, paid=paid)
+        for line in lines:
+            line.order = order
+        OrderLine.objects.bulk_create(lines)
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                owner=owner, product_id=product_id, kind=StockMovement.Kind.SALE, quantity=-quantity, order=order
+            )
+            for product_id, quantity in quantities.items()
+        ])
+
+        if customer is not None:
+            charge_sale(customer.pk, total, paid)
+        record_sale(owner.pk, order.created_at, total, items)
+
+    return order
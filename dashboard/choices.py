@@ -0,0 +1,155 @@
+import time
+
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def choices_version_key(owner_id) -> str:
+    return f'choices-version:{owner_id}'
+
+
+def get_choices_version(owner_id) -> int:
+    """
+    Parameters:
+    - owner_id (int): The owner whose choice lists are read.
+
+    Returns:
+    int: The version of the owner's categories and sub-categories, changed by `bump_choices_version`.
+
+    The version is only seen by the processes sharing the cache, so with a
+    per-process cache (LocMem) the others keep their lists until
+    `FORM_CHOICES_TIMEOUT`: `OwnerChoiceField` and the model validation
+    recheck what such a list says.
+    """
+    # A missing (evicted) version starts a new one, so stale lists are never reused
+    return cache.get_or_set(choices_version_key(owner_id), time.time_ns, None)
+
+
+def bump_choices_version(owner_id):
+    """
+    Invalidates the owner's cached choice lists once the current transaction commits.
+
+    Bumping after the commit keeps a concurrent request from caching the
+    rows of the transaction's snapshot under the new version.
+
+    Parameters:
+    - owner_id (int): The owner whose categories or sub-categories changed.
+    """
+    transaction.on_commit(lambda: cache.set(choices_version_key(owner_id), time.time_ns(), None))
+
+
+def get_owner_choices(model, owner_id) -> tuple:
+    """
+    Reads an owner's rows of a model as form choices, from the cache when possible.
+
+    Parameters:
+    - model (Model): Category or SubCategory.
+    - owner_id (int): The owner.
+
+    Returns:
+    tuple: (pk, name) pairs, ordered by name.
+    """
+    key = f'choices:{owner_id}:{get_choices_version(owner_id)}:{model._meta.label_lower}'
+    choices = cache.get(key)
+    if choices is None:
+        choices = tuple(model.objects.filter(owner_id=owner_id).order_by('name', 'id').values_list('pk', 'name'))
+        cache.set(key, choices, settings.FORM_CHOICES_TIMEOUT)
+    return choices
+
+
+class OwnerChoiceField(forms.TypedChoiceField):
+    """
+    A foreign key field offering an owner's cached rows of a model.
+
+    Unlike `ModelChoiceField`, rendering the options and checking that the
+    submitted id is one of the owner's use the cached list, without a query
+    for the ids it holds. An id it lacks may belong to a row created since,
+    by a process not sharing the cache, and is looked up in the database. The cleaned value
+    is an unsaved instance carrying the pk and name, enough to assign the
+    foreign key.
+    """
+
+    def __init__(self, model, owner_id, empty_label='---------', **kwargs):
+        self.model = model
+        self.owner_id = owner_id
+        self.names = dict(get_owner_choices(model, owner_id))
+        super().__init__(
+            choices=[('', empty_label), *self.names.items()],
+            coerce=lambda pk: model(pk=int(pk), name=self.names[int(pk)]),
+            empty_value=None,
+            **kwargs,
+        )
+
+    def valid_value(self, value):
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            return False
+        if pk in self.names:
+            return True
+
+        name = self.model.objects.filter(owner_id=self.owner_id, pk=pk).values_list('name', flat=True).first()
+        if name is None:
+            return False
+        self.names[pk] = name
+        return True
+
+    def prepare_value(self, value):
+        # Initial values of bound instances are model objects
+        return getattr(value, 'pk', value)
+
+
+class LazySelect(forms.Select):
+    """
+    A select rendering only the empty and selected options.
+
+    The other options are fetched on demand from `lookup_url` by
+    dashboard/js/lazy-select.js, filtered by the value of the `depends_on`
+    field of the same form and by a typed prefix, so the page weight does
+    not grow with the number of choices.
+    """
+
+    class Media:
+        js = ['dashboard/js/lazy-select.js']
+
+    def __init__(self, lookup_url, depends_on: str = None, attrs: dict = None):
+        attrs = {'data-lookup-url': lookup_url, **(attrs or {})}
+        if depends_on:
+            attrs['data-depends-on'] = depends_on
+        super().__init__(attrs=attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        selected = set(value)
+        options = [
+            self.create_option(name, option_value, label, str(option_value) in selected, index, attrs=attrs)
+            for index, (option_value, label) in enumerate(self.choices)
+            if option_value == '' or str(option_value) in selected
+        ]
+        return [(None, options, 0)]
+
+
+class OwnerChoicesMixin:
+    """
+    Replaces a ModelForm's foreign key fields named in `owner_choice_fields`
+    with `OwnerChoiceField`s over the user's rows, rendered with the widget
+    given in `Meta.widgets` if any.
+
+    The model's foreign key validation still runs, so a cached id whose row
+    was deleted since is an error and not a failed insert. A bound form
+    therefore still makes one query per field, that existence check: the
+    cache saves the options query of every request and the lookup of the
+    submitted row, not the check.
+    """
+    owner_choice_fields = []
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.owner_choice_fields:
+            field = self.fields[name]
+            widget = getattr(self.Meta, 'widgets', {}).get(name)
+            self.fields[name] = OwnerChoiceField(
+                field.queryset.model, user.pk, required=field.required, label=field.label, help_text=field.help_text,
+                **({'widget': widget} if widget is not None else {}),
+            )
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from .fragments import get_profile_version, get_shell_version
+
+
+def fragment_versions(request) -> dict:
+    """
+    Keys of the cached page shell fragments, resolved only by pages using them.
+    """
+    return {
+        'fragment_timeout': settings.TEMPLATE_FRAGMENT_TIMEOUT,
+        'shell_version': SimpleLazyObject(get_shell_version),
+        'profile_version': SimpleLazyObject(lambda: get_profile_version(request.user.pk)),
+    }
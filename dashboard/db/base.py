@@ -0,0 +1,74 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base, creation
+from .pool import close_pools, get_pool
+
+
+# Used for the keys `OPTIONS['pool']` leaves out
+DEFAULT_POOL_OPTIONS = {'max_size': 4, 'timeout': 30.0}
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections to the test database would keep it from being dropped
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Django's PostgreSQL backend, with an optional per-process pool of
+    connections.
+
+    With `OPTIONS['pool']` set, to True or to a dict overriding
+    `DEFAULT_POOL_OPTIONS`, connecting borrows an open connection from the
+    pool and closing gives it back, so a request skips the connection
+    handshake without a connection staying tied to each thread as with
+    `CONN_MAX_AGE`. The two do not combine: the connection must go back to
+    the pool at the end of each request, so `CONN_MAX_AGE` must be 0.
+
+    With `CONN_HEALTH_CHECKS`, an idle connection is checked before it is
+    lent, and replaced if the server dropped it.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The pool the open connection was borrowed from
+        self.pool = None
+
+    @property
+    def pool_options(self) -> dict:
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured('Pooled connections cannot be persistent, set CONN_MAX_AGE to 0.')
+        return {**DEFAULT_POOL_OPTIONS, **(options if isinstance(options, dict) else {})}
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool_options = self.pool_options
+        if pool_options is None:
+            return super().get_new_connection(conn_params)
+        pool = get_pool(conn_params, **pool_options)
+        connection = pool.getconn(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            check=self.settings_dict['CONN_HEALTH_CHECKS'],
+        )
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        pool, self.pool = self.pool, None
+        if self.in_atomic_block:
+            # Django keeps a connection closed in a transaction around, so that using it fails: it cannot be lent
+            pool.discard(self.connection)
+        else:
+            pool.putconn(self.connection)
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+
+# The pools of this process, by connection parameters and pool options: the same alias
+# may connect to other databases, e.g. the test database or 'postgres' to create it
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+def is_usable(connection) -> bool:
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of open psycopg2 connections, opened on demand.
+
+    Idle connections are handed out last in, first out, so a quiet process
+    keeps reusing the same few while the others are closed by the server's
+    or a proxy's idle timeout, and then dropped by the health check.
+    """
+
+    def __init__(self, max_size: int, timeout: float):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle = []
+        self.size = 0
+        self.condition = threading.Condition()
+
+    def getconn(self, connect, check: bool = False):
+        """
+        Borrows a connection, waiting up to `timeout` seconds for one to be
+        returned when `max_size` connections are out.
+
+        Parameters:
+        - connect (callable): Opens a new connection.
+        - check (bool): Whether to check that an idle connection still works,
+          closing it and borrowing another if not. Default is False.
+
+        Returns:
+        connection: The psycopg2 connection.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f'No database connection returned to the pool within {self.timeout}s.')
+                    self.condition.wait(remaining)
+                if self.idle:
+                    connection = self.idle.pop()
+                else:
+                    connection = None
+                    self.size += 1
+
+            if connection is None:
+                try:
+                    return connect()
+                except BaseException:
+                    self.discard(None)
+                    raise
+            if connection.closed or (check and not is_usable(connection)):
+                self.discard(connection)
+                continue
+            return connection
+
+    def putconn(self, connection):
+        """
+        Returns a borrowed connection, rolled back if left in a transaction,
+        and closed instead if it is broken.
+        """
+        status = connection.info.transaction_status if not connection.closed else TRANSACTION_STATUS_UNKNOWN
+        if status not in (TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN):
+            try:
+                connection.rollback()
+                status = connection.info.transaction_status
+            except psycopg2.Error:
+                status = TRANSACTION_STATUS_UNKNOWN
+        if status != TRANSACTION_STATUS_IDLE:
+            self.discard(connection)
+            return
+        with self.condition:
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        if connection is not None and not connection.closed:
+            connection.close()
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def close(self):
+        # Borrowed connections are closed when they are returned
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            self.discard(connection)
+
+
+def get_pool(conn_params: dict, max_size: int, timeout: float) -> ConnectionPool:
+    """
+    Parameters:
+    - conn_params (dict): The psycopg2 connection parameters.
+    - max_size (int): The most connections the pool opens.
+    - timeout (float): How long a borrower waits for a connection, in seconds.
+
+    Returns:
+    ConnectionPool: This process's pool for the parameters and options.
+    """
+    global _pools_pid
+    key = (tuple(sorted(conn_params.items())), max_size, timeout)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked: the parent's connections are its own, start afresh without closing them
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(max_size, timeout)
+        return pool
+
+
+def close_pools():
+    """
+    Closes the idle connections of this process's pools.
+    """
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,97 @@
+import re
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from .models import Customer, Payment
+
+
+# Digits, with the leading '+' of international numbers
+PHONE_STRIP_RE = re.compile(r'(?!^\+)[^\d]')
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Parameters:
+    - phone (str): A phone number as typed, e.g. '+1 (555) 010-2030'.
+
+    Returns:
+    str: The number without spaces or punctuation, e.g. '+15550102030'.
+    """
+    return PHONE_STRIP_RE.sub('', phone.strip())
+
+
+def find_customer(owner, contact: str):
+    """
+    Finds a customer by exact phone or email, through the unique indexes.
+
+    Parameters:
+    - owner (User): The seller.
+    - contact (str): A phone number or an email address.
+
+    Returns:
+    Customer: The matching customer, or None.
+    """
+    contact = contact.strip()
+    if not contact:
+        return None
+
+    # The exclusions repeat the conditions of the partial unique indexes, so the planner uses them
+    customers = Customer.objects.filter(owner=owner)
+    if '@' in contact:
+        customers = customers.exclude(email='').alias(email_lower=Lower('email'))
+        return customers.filter(email_lower=contact.lower()).first()
+
+    phone = normalize_phone(contact)
+    if not phone:
+        return None
+    return customers.exclude(phone='').filter(phone=phone).first()
+
+
+def charge_sale(customer_id: int, total: Decimal, paid: Decimal):
+    """
+    Adds a sale to a customer's running balances.
+
+    A single `UPDATE` relative to the stored values; call it inside the
+    sale's transaction so the balances and the order commit together.
+
+    Parameters:
+    - customer_id (int): The buyer.
+    - total (Decimal): The order total.
+    - paid (Decimal): The amount paid at checkout; the rest becomes dues.
+    """
+    Customer.objects.filter(pk=customer_id).update(
+        dues=F('dues') + (total - paid),
+        orders=F('orders') + 1,
+        total_spent=F('total_spent') + total,
+    )
+
+
+def record_payment(customer, amount: Decimal, note: str = '') -> Payment:
+    """
+    Records a payment and subtracts it from the customer's dues in one transaction.
+
+    The balance check and the decrement are the same conditional `UPDATE`,
+    so two concurrent payments can never take the dues below zero.
+
+    Parameters:
+    - customer (Customer): The paying customer.
+    - amount (Decimal): The amount paid, positive.
+    - note (str): Optional note, e.g. the payment method.
+
+    Returns:
+    Payment: The saved payment.
+
+    Raises:
+    ValidationError: If the amount is not positive or exceeds the dues.
+    """
+    if amount <= 0:
+        raise ValidationError('The amount must be positive.')
+
+    with transaction.atomic():
+        updated = Customer.objects.filter(pk=customer.pk, dues__gte=amount).update(dues=F('dues') - amount)
+        if not updated:
+            raise ValidationError('The amount exceeds the dues of the customer.')
+        return Payment.objects.create(owner_id=customer.owner_id, customer=customer, amount=amount, note=note)
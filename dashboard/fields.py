@@ -0,0 +1,145 @@
+import functools
+import posixpath
+
+from django.db import router, transaction
+from django.db.models.fields.files import ImageFieldFile
+from django.db.models.signals import post_delete, post_init, post_save
+from imagekit.models import ProcessedImageField
+from imagekit.models.fields.files import ProcessedImageFieldFile
+from . import image_processing
+from .profiling import timed
+from .renditions import generate_renditions
+
+
+class AsyncProcessedImageFieldFile(ProcessedImageFieldFile):
+    def save(self, name, content, save=True):
+        if not save:
+            return self._save(name, content, save)
+        # The reference the file takes is rolled back if saving the row fails
+        using = router.db_for_write(type(self.instance), instance=self.instance)
+        with transaction.atomic(using=using, savepoint=False):
+            return self._save(name, content, save)
+
+    def _save(self, name, content, save):
+        # The new file takes a reference, the one it replaces is released after the row is saved
+        replaced = getattr(self.instance, '_replaced_images', None) or set()
+        replaced.add(self.field.attname)
+        self.instance._replaced_images = replaced
+
+        key = None
+        if hasattr(self.storage, 'reuse_processed'):
+            key = image_processing.source_key(self.field, content)
+            processed_name = self.storage.reuse_processed(key)
+            if processed_name is not None:
+                # The same image was already processed: share its file instead
+                self.name = processed_name
+                setattr(self.instance, self.field.attname, self.name)
+                self._committed = True
+                if save:
+                    self.instance.save()
+                return
+
+        if not image_processing.is_async():
+            # Resized and encoded in the request, along with its renditions
+            with timed('img'):
+                super().save(name, content, save=False)
+            if key is not None:
+                self.storage.record_source(self.name, key)
+            generate_renditions(self)
+            if save:
+                self.instance.save()
+            return
+
+        # Store the raw upload as is, the worker pool produces the processed file
+        pending_name = posixpath.join(image_processing.PENDING_DIR, posixpath.basename(name))
+        ImageFieldFile.save(self, pending_name, content, save=False)
+
+        pending = getattr(self.instance, '_pending_images', None) or {}
+        pending[self.field.attname] = self.name
+        self.instance._pending_images = pending
+
+        if save:
+            self.instance.save()
+
+
+class AsyncProcessedImageField(ProcessedImageField):
+    """
+    `ProcessedImageField` that can defer its processing to a worker pool.
+
+    With `IMAGE_PROCESSING = 'async'` the raw upload is stored immediately
+    under `<upload_to>/pending/` and the resize/encode runs in
+    `dashboard.image_processing` after the row is committed. Otherwise it
+    behaves exactly like `ProcessedImageField`.
+
+    With a reference-counting storage (`dashboard.storage`), an upload that
+    was already processed reuses the stored result, and the file a row stops
+    using (replaced or deleted) loses its reference.
+    """
+    attr_class = AsyncProcessedImageFieldFile
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            post_init.connect(remember_images, sender=cls, dispatch_uid=f'{cls._meta.label}.remember_images')
+            post_save.connect(schedule_pending_images, sender=cls, dispatch_uid=f'{cls._meta.label}.pending_images')
+            post_save.connect(release_replaced_images, sender=cls, dispatch_uid=f'{cls._meta.label}.replaced_images')
+            post_delete.connect(release_images, sender=cls, dispatch_uid=f'{cls._meta.label}.released_images')
+
+
+class AtomicImageSaveMixin:
+    """
+    Model mixin saving a row in one transaction with the references its new
+    image files take (see `dashboard.storage`), so a failed or rolled back
+    save never leaves a file referenced by no row.
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+@functools.cache
+def image_fields(model) -> list:
+    return [field for field in model._meta.concrete_fields if isinstance(field, AsyncProcessedImageField)]
+
+
+def release(field, name: str):
+    # Raw uploads are released by the worker that processes them
+    if name and not image_processing.is_pending(name) and hasattr(field.storage, 'reference'):
+        field.storage.delete(name)
+
+
+def remember_images(sender, instance, **kwargs):
+    # The stored names as loaded, without building the field files; deferred fields are skipped
+    instance._stored_images = {
+        field.attname: value if isinstance(value := instance.__dict__[field.attname], str) else None
+        for field in image_fields(sender) if field.attname in instance.__dict__
+    }
+
+
+def schedule_pending_images(sender, instance, **kwargs):
+    image_processing.schedule_pending(instance)
+
+
+def release_replaced_images(sender, instance, **kwargs):
+    """
+    Releases the files a saved instance no longer uses.
+
+    Connected to `post_save`, and called directly after bulk writes that skip it.
+    """
+    replaced = getattr(instance, '_replaced_images', None)
+    if not replaced:
+        return
+
+    stored = getattr(instance, '_stored_images', {})
+    for field in image_fields(sender):
+        if field.attname in replaced and field.attname in stored:
+            release(field, stored[field.attname])
+            stored[field.attname] = getattr(instance, field.attname).name
+    instance._replaced_images = set()
+
+
+def release_images(sender, instance, **kwargs):
+    for field in image_fields(sender):
+        release(field, getattr(instance, field.attname).name)
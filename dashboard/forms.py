@@ -1,7 +1,14 @@
+import datetime
+
 from django import forms
+from django.urls import reverse_lazy
+from django.utils import timezone
 from django.contrib.auth.forms import UserChangeForm
 from django.contrib.auth.models import User
-from .models import Category, SubCategory, Product
+from .models import SubCategory, Product, StockMovement, Customer, Payment, Supplier
+from .choices import LazySelect, OwnerChoicesMixin
+from .dues import normalize_phone
+from .sales_report import BREAKDOWNS, GRANULARITIES
 
 
 class UserUpdateForm(UserChangeForm):
@@ -12,26 +19,138 @@ class UserUpdateForm(UserChangeForm):
         fields = ['username', 'first_name', 'last_name', 'email']
 
 
-class SubCategoryForm(forms.ModelForm):
+class SubCategoryForm(OwnerChoicesMixin, forms.ModelForm):
+    # Category choices of the logged-in user, from the per-owner cache
+    owner_choice_fields = ['category']
+
     class Meta:
         model = SubCategory
         fields = ['image', 'name', 'category', 'description']
 
+
+class ProductForm(OwnerChoicesMixin, forms.ModelForm):
+    # Category and Sub-Category choices of the logged-in user, from the per-owner cache
+    owner_choice_fields = ['category', 'sub_category']
+
+    class Meta:
+        model = Product
+        fields = ['image', 'name', 'category', 'sub_category', 'price', 'description']
+        widgets = {
+            # Fetched for the chosen category as the user types, not rendered in full
+            'sub_category': LazySelect(reverse_lazy('sub_category_lookup'), depends_on='category'),
+        }
+
+
+class StockMovementForm(forms.ModelForm):
+    class Meta:
+        model = StockMovement
+        fields = ['product', 'kind', 'quantity', 'note']
+        help_texts = {
+            'quantity': 'Units received or returned; for adjustments, negative to remove units.',
+        }
+
     def __init__(self, user, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Filter Category based on the logged-in user
-        self.fields['category'].queryset = Category.objects.filter(owner=user)
+        # Filter Product based on the logged-in user
+        self.fields['product'].queryset = Product.objects.filter(owner=user)
+
+        # Sales are recorded by the POS checkout
+        self.fields['kind'].choices = [
+            choice for choice in StockMovement.Kind.choices if choice[0] != StockMovement.Kind.SALE
+        ]
 
+    def clean(self):
+        cleaned_data = super().clean()
+        kind, quantity = cleaned_data.get('kind'), cleaned_data.get('quantity')
+        if quantity is not None:
+            if quantity == 0:
+                self.add_error('quantity', 'The quantity cannot be zero.')
+            elif kind != StockMovement.Kind.ADJUSTMENT and quantity < 0:
+                self.add_error('quantity', 'Only adjustments can remove units.')
+        return cleaned_data
 
-class ProductForm(forms.ModelForm):
+
+class CustomerForm(forms.ModelForm):
     class Meta:
-        model = Product
-        fields = ['image', 'name', 'category', 'sub_category', 'description']
+        model = Customer
+        fields = ['name', 'phone', 'email']
 
     def __init__(self, user, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Filter Category based on the logged-in user
-        self.fields['category'].queryset = Category.objects.filter(owner=user)
+        # The owner is part of the unique phone and email constraints, validated with the form
+        self.instance.owner = user
+
+    def _get_validation_exclusions(self):
+        # Constraints naming an excluded field are skipped, and the owner is not a form field
+        exclude = super()._get_validation_exclusions()
+        exclude.discard('owner')
+        return exclude
+
+    def clean_phone(self):
+        return normalize_phone(self.cleaned_data['phone'])
+
+
+class PaymentForm(forms.ModelForm):
+    class Meta:
+        model = Payment
+        fields = ['amount', 'note']
+
+
+class SupplierForm(forms.ModelForm):
+    class Meta:
+        model = Supplier
+        fields = ['name', 'contact_name', 'phone', 'email', 'address']
+
+    def clean_phone(self):
+        return normalize_phone(self.cleaned_data['phone'])
+
+
+class PurchaseOrderForm(forms.Form):
+    supplier = forms.ModelChoiceField(queryset=Supplier.objects.none())
+    reference = forms.CharField(max_length=100, required=False, help_text="The supplier's invoice or delivery number.")
+    file = forms.FileField(
+        label='Lines', help_text='CSV, JSON or JSON Lines file with product (id or name), quantity and unit cost.'
+    )
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Filter the supplier choices based on the currently logged-in user
+        self.fields['supplier'].queryset = Supplier.objects.filter(owner=user).order_by('name', 'id')
+
+
+class CatalogImportForm(forms.Form):
+    kind = forms.ChoiceField(
+        label='Import',
+        choices=[('categories', 'Categories'), ('sub-categories', 'Sub-Categories'), ('products', 'Products')],
+    )
+    file = forms.FileField(label='File', help_text='CSV, JSON or JSON Lines file.')
+    images = forms.FileField(label='Images', required=False, help_text='Zip archive of the images named in the file.')
+
+
+class SalesReportForm(forms.Form):
+    start = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    granularity = forms.ChoiceField(choices=GRANULARITIES.items())
+    breakdown = forms.ChoiceField(choices=[(key, label) for key, (label, *_) in BREAKDOWNS.items()])
+
+    # Last 30 days, by day
+    default_days = 30
+
+    def __init__(self, data=None, *args, **kwargs):
+        today = timezone.localdate()
+        defaults = {
+            'start': today - datetime.timedelta(days=self.default_days - 1),
+            'end': today,
+            'granularity': 'day',
+            'breakdown': 'total',
+        }
+        # Missing parameters fall back to the defaults instead of being errors
+        data = {**defaults, **{key: value for key, value in (data or {}).items() if value}}
+        super().__init__(data, *args, **kwargs)
 
-        # Filter Sub-Category based on the logged-in user
-        self.fields['sub_category'].queryset = SubCategory.objects.filter(owner=user)
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and end < start:
+            raise forms.ValidationError('The end date must not be before the start date.')
+        return cleaned_data
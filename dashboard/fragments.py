@@ -0,0 +1,73 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.template.loader import get_template
+
+
+# Templates rendered inside the cached page shell fragments
+SHELL_TEMPLATES = [
+    'dashboard/includes/common/google-fonts.html',
+    'dashboard/includes/common/vendor-css.html',
+    'dashboard/includes/common/main-css.html',
+    'dashboard/includes/common/vendor-js.html',
+    'dashboard/includes/sections/footer.html',
+    'dashboard/includes/sub-sections/logo.html',
+    'dashboard/includes/sub-sections/profile-dropdown.html',
+]
+
+
+def compute_shell_version() -> str:
+    """
+    Versions the page shell fragments by their content.
+
+    Changes with the shell templates, the app name and the static files
+    manifest (hashed asset URLs), so a deploy never serves fragments cached
+    by the previous release from a shared cache.
+
+    Returns:
+    str: A short hash of the shell's inputs.
+    """
+    digest = hashlib.md5(usedforsecurity=False)
+    digest.update(settings.APP_NAME.encode())
+    digest.update(str(getattr(staticfiles_storage, 'manifest_hash', '')).encode())
+    for name in SHELL_TEMPLATES:
+        digest.update(get_template(name).template.source.encode())
+    return digest.hexdigest()[:12]
+
+
+cached_shell_version = functools.cache(compute_shell_version)
+
+
+def get_shell_version() -> str:
+    # Templates may be edited while developing
+    return compute_shell_version() if settings.DEBUG else cached_shell_version()
+
+
+def profile_version_key(user_id) -> str:
+    return f'profile-version:{user_id}'
+
+
+def get_profile_version(user_id) -> int:
+    """
+    Parameters:
+    - user_id (int): The user whose header fragment is rendered.
+
+    Returns:
+    int: The version of the user's profile, changed by `bump_profile_version`.
+    """
+    # A missing (evicted) version starts a new one, so stale fragments are never reused
+    return cache.get_or_set(profile_version_key(user_id), time.time_ns, None)
+
+
+def bump_profile_version(user_id):
+    """
+    Invalidates the user's cached header fragment, e.g. after a profile update.
+
+    Parameters:
+    - user_id (int): The user whose profile changed.
+    """
+    cache.set(profile_version_key(user_id), time.time_ns(), None)
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import multiprocessing
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from imagekit.hashers import pickle
+from imagekit.utils import generate, suggest_extension
+from .profiling import timed
+from .renditions import generate_renditions
+from .storage import file_digest
+
+
+logger = logging.getLogger(__name__)
+
+# Directory, under each field's `upload_to`, holding raw uploads awaiting processing
+PENDING_DIR = 'pending'
+
+_executor = None
+
+
+def is_async() -> bool:
+    return settings.IMAGE_PROCESSING == 'async'
+
+
+def is_pending(name: str) -> bool:
+    """
+    Parameters:
+    - name (str): A stored image name.
+
+    Returns:
+    bool: True while the image is a raw upload waiting for its processed version.
+    """
+    return bool(name) and posixpath.basename(posixpath.dirname(name)) == PENDING_DIR
+
+
+def source_key(field, content) -> str:
+    """
+    Identifies the processed image a field produces from an upload.
+
+    Parameters:
+    - field (AsyncProcessedImageField): The field processing the upload.
+    - content (File): The raw upload.
+
+    Returns:
+    str: A hash of the upload's bytes and of the field's processors, format and options.
+    """
+    spec = field.get_spec(source=content)
+    spec_hash = pickle([spec.processors, spec.format, spec.options, spec.autoconvert])
+    return hashlib.sha256(f'{file_digest(content)}:{spec_hash}'.encode()).hexdigest()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Lazily starts this process's image worker pool.
+
+    Workers are spawned rather than forked, so they never share the parent's
+    database connections, and each one sets Django up on start.
+
+    Returns:
+    ProcessPoolExecutor: The worker pool.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def process_image(app_label: str, model_name: str, pk, field_name: str, pending_name: str) -> str:
+    """
+    Produces the processed version of a raw upload and points the row at it.
+
+    Runs the field's ImageKit spec (resize and encode) on the raw file, stores
+    the result under the field's `upload_to`, then swaps the row's value with a
+    conditional update, so a newer upload of the same row is never overwritten.
+
+    Parameters:
+    - app_label (str): The app of the model.
+    - model_name (str): The model holding the image.
+    - pk: The primary key of the row.
+    - field_name (str): The image field.
+    - pending_name (str): The stored name of the raw upload.
+
+    Returns:
+    str: The stored name of the processed image, or None if the row has moved on.
+    """
+    model = apps.get_model(app_label, model_name)
+    field = model._meta.get_field(field_name)
+    storage = field.storage
+
+    with storage.open(pending_name) as source:
+        key = source_key(field, source) if hasattr(storage, 'record_source') else None
+        spec = field.get_spec(source=source)
+        basename = posixpath.basename(pending_name)
+        filename = posixpath.splitext(basename)[0] + suggest_extension(basename, spec.format)
+        with timed('img'):
+            processed_name = storage.save(field.generate_filename(None, filename), generate(spec))
+
+    if key is not None:
+        storage.record_source(processed_name, key)
+
+    updated = model._default_manager.filter(pk=pk, **{field_name: pending_name}).update(**{field_name: processed_name})
+    storage.delete(pending_name)
+
+    if not updated:
+        storage.delete(processed_name)
+        return None
+
+    # Renditions are cheap to derive here, off the request thread
+    generate_renditions(field.attr_class(None, field, processed_name))
+
+    if model._meta.label == 'dashboard.Profile':
+        # The cached header still shows the placeholder; reaches web processes with a shared cache
+        from .fragments import bump_profile_version
+        bump_profile_version(model._default_manager.values_list('user_id', flat=True).get(pk=pk))
+    return processed_name
+
+
+def log_failure(future):
+    if future.exception() is not None:
+        logger.error('Image processing failed', exc_info=future.exception())
+
+
+def schedule(instance, field_name: str, pending_name: str):
+    """
+    Queues a raw upload for processing once the current transaction commits.
+
+    Falls back to processing in the request if the worker pool is unavailable.
+
+    Parameters:
+    - instance (Model): The saved row holding the raw upload.
+    - field_name (str): The image field.
+    - pending_name (str): The stored name of the raw upload.
+    """
+    args = (instance._meta.app_label, instance._meta.model_name, instance.pk, field_name, pending_name)
+
+    def submit():
+        global _executor
+        try:
+            get_executor().submit(process_image, *args).add_done_callback(log_failure)
+        except (BrokenProcessPool, RuntimeError, OSError):
+            logger.exception('Image worker pool unavailable, processing %s in process', pending_name)
+            _executor = None
+            process_image(*args)
+
+    transaction.on_commit(submit)
+
+
+def schedule_pending(instance):
+    """
+    Queues every raw upload a saved instance is holding.
+
+    Called from `post_save`, and directly after bulk writes that skip it.
+
+    Parameters:
+    - instance (Model): The saved row.
+    """
+    pending = getattr(instance, '_pending_images', None)
+    if not pending:
+        return
+
+    for field_name, pending_name in pending.items():
+        if getattr(instance, field_name).name == pending_name:
+            schedule(instance, field_name, pending_name)
+    instance._pending_images = {}
+
+
+def process_all_pending():
+    """
+    Synchronously processes every raw upload still referenced by a row.
+
+    Recovers images whose worker died before finishing, e.g. on a restart.
+
+    Returns:
+    int: The number of processed images.
+    """
+    from .fields import AsyncProcessedImageField
+
+    count = 0
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if not isinstance(field, AsyncProcessedImageField):
+                continue
+
+            rows = model._default_manager.filter(**{f'{field.name}__contains': f'/{PENDING_DIR}/'})
+            for pk, name in rows.values_list('pk', field.name).iterator():
+                if is_pending(name):
+                    process_image(model._meta.app_label, model._meta.model_name, pk, field.name, name)
+                    count += 1
+    return count
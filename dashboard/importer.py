@@ -0,0 +1,422 @@
+import csv
+import itertools
+import json
+import os
+import zipfile
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.forms import modelform_factory
+from django.utils import timezone
+from .choices import bump_choices_version
+from .export import unescape_cell
+from .fields import release_replaced_images
+from .forms import SubCategoryForm, ProductForm
+from .image_processing import schedule_pending
+from .models import Category, SubCategory, Product
+from .search import search_fields_changed, update_search_vector
+
+
+def normalize_key(key: str) -> str:
+    """
+    Normalizes a column title, so exported headers ('Sub Category') match field names.
+
+    Parameters:
+    - key (str): The column title.
+
+    Returns:
+    str: The field name the column maps to.
+    """
+    return (key or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def read_rows(file, filename: str):
+    """
+    Streams the rows of a CSV or JSON import file.
+
+    CSV files are read with their header row. JSON files may hold one object
+    per line (JSON Lines, streamed) or a single top-level array (loaded at once).
+
+    Parameters:
+    - file (TextIO): The opened file, in text mode.
+    - filename (str): The file name, used to detect the format.
+
+    Yields:
+    tuple: (line number, row dict with normalized keys).
+    """
+    if filename.lower().endswith('.csv'):
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, {normalize_key(key): value for key, value in row.items()}
+        return
+
+    first = file.read(1)
+    while first.isspace():
+        first = file.read(1)
+
+    if first == '[':
+        rows = json.loads(first + file.read())
+    else:
+        lines = itertools.chain([first + file.readline()], file)
+        rows = (json.loads(line) for line in lines if line.strip())
+
+    for index, row in enumerate(rows, start=1):
+        yield index, {normalize_key(key): value for key, value in row.items()}
+
+
+class ImageSource:
+    """
+    Looks up import images by name in a zip archive or a directory.
+
+    Names are matched on their relative path first and on their base name
+    second, so exported paths such as 'products/cola.jpg' still resolve.
+    """
+
+    def __init__(self, source):
+        self.archive = None
+        self.paths = {}
+
+        if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+            for root, _dirs, files in os.walk(source):
+                for name in files:
+                    path = os.path.join(root, name)
+                    self.paths.setdefault(os.path.relpath(path, source).replace(os.sep, '/'), path)
+                    self.paths.setdefault(name, path)
+        elif zipfile.is_zipfile(source):
+            self.archive = zipfile.ZipFile(source)
+            for info in self.archive.infolist():
+                if not info.is_dir():
+                    self.paths.setdefault(info.filename, info)
+                    self.paths.setdefault(os.path.basename(info.filename), info)
+        else:
+            raise ValueError('Images must be a zip archive or a directory.')
+
+    def find(self, name: str):
+        name = name.replace('\\', '/').lstrip('/')
+        return self.paths.get(name) or self.paths.get(os.path.basename(name))
+
+    def exists(self, name: str) -> bool:
+        return self.find(name) is not None
+
+    def open(self, name: str):
+        """
+        Parameters:
+        - name (str): The image name given in the import row.
+
+        Returns:
+        ContentFile: The image content, or None if no such image exists.
+        """
+        entry = self.find(name)
+        if entry is None:
+            return None
+
+        if self.archive is not None:
+            data = self.archive.read(entry)
+        else:
+            with open(entry, 'rb') as image:
+                data = image.read()
+        return ContentFile(data, name=os.path.basename(name.replace('\\', '/')))
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+
+class LookupCache:
+    """
+    Per-import cache resolving an owner's category or sub-category names to ids.
+
+    The owner's names are loaded with a single query on first use, instead
+    of one query per imported row. With `scope`, the name of a foreign key
+    such as 'category', names are only unique within it: they resolve
+    within the scope the row gives, and without one only if a single record
+    has the name.
+    """
+
+    def __init__(self, model, owner, scope: str = None):
+        self.model = model
+        self.owner = owner
+        self.scope = scope
+        self.ids = None
+        self.names = None
+
+    def load(self):
+        self.ids = {}
+        self.names = {}
+        fields = ['id', 'name'] + ([f'{self.scope}_id'] if self.scope else [])
+        for pk, row_name, *scope in self.model.objects.filter(owner=self.owner).order_by('-id').values_list(*fields):
+            key = row_name.casefold()
+            self.ids[(scope[0] if scope else None, key)] = pk
+            self.names.setdefault(key, set()).add(pk)
+
+    def resolve(self, name: str, scope=None):
+        """
+        Parameters:
+        - name (str): The name given in the import row.
+        - scope (int): The id of the row's `scope` record, if it gives one. Default is None.
+
+        Returns:
+        int: The id of the named record, or None if there is none.
+
+        Raises:
+        ValidationError: If no scope is given and several records have the name.
+        """
+        if self.ids is None:
+            self.load()
+        key = name.strip().casefold()
+        if self.scope is None or scope is not None:
+            return self.ids.get((scope, key))
+
+        pks = self.names.get(key, ())
+        if len(pks) > 1:
+            label = self.model._meta.get_field(self.scope).verbose_name
+            raise ValidationError(f'Several records are named "{name}", give the {label} to choose one.')
+        return next(iter(pks), None)
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def add_error(self, line: int, message: str):
+        self.errors.append((line, message))
+
+
+class CatalogImporter:
+    """
+    Imports rows of `model` for one owner in batched, transactional writes.
+
+    Each row is validated with the fields of `form_class`, the same rules the
+    create/update views apply, and the record it builds with the model's
+    `full_clean`. Related names are resolved through `LookupCache`, within
+    the related record named by `scopes`, rows matching an existing record
+    of the owner on `identity` update it, and every batch is written with
+    one `bulk_create` and one `bulk_update` inside a transaction.
+    """
+    model = None
+    form_class = None
+    relations = {}
+    # Relation name -> the relation its names are unique within
+    scopes = {}
+    # The fields naming a record, relations by id
+    identity = ['name']
+    batch_size = 1000
+
+    def __init__(self, owner, images: ImageSource = None, batch_size: int = None):
+        self.owner = owner
+        self.images = images
+        self.batch_size = batch_size or self.batch_size
+        self.fields = self.form_class.base_fields
+        self.caches = {
+            name: LookupCache(model, owner, self.scopes.get(name)) for name, model in self.relations.items()
+        }
+        self.result = ImportResult()
+
+    def run(self, rows) -> ImportResult:
+        """
+        Parameters:
+        - rows (Iterable): (line number, row dict) pairs, e.g. from `read_rows`.
+
+        Returns:
+        ImportResult: Counts of created and updated records, and the row errors.
+        """
+        batch = []
+        for line, row in rows:
+            try:
+                batch.append((line, self.clean_row(row)))
+            except ValidationError as error:
+                for message in error.messages:
+                    self.result.add_error(line, message)
+
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+
+        if batch:
+            self.write_batch(batch)
+        return self.result
+
+    def clean_row(self, row: dict) -> dict:
+        values = {}
+        errors = []
+
+        for name, field in self.fields.items():
+            raw = row.get(name)
+            raw = '' if raw is None else unescape_cell(str(raw).strip())
+
+            try:
+                if name in self.relations:
+                    values[name] = self.clean_relation(name, raw, values)
+                elif name == 'image':
+                    values[name] = self.clean_image(raw)
+                else:
+                    values[name] = field.clean(raw)
+            except ValidationError as error:
+                errors.extend(f'Error in {field.label}: {message}' for message in error.messages)
+
+        if errors:
+            raise ValidationError(errors)
+        return values
+
+    def clean_relation(self, name: str, raw: str, values: dict):
+        if not raw:
+            return None
+
+        # The scope is cleaned first, as it comes first in the form
+        scope = values.get(self.scopes[name]) if name in self.scopes else None
+        pk = self.caches[name].resolve(raw, scope)
+        if pk is None:
+            raise ValidationError(f'"{raw}" does not exist.')
+        return pk
+
+    def clean_image(self, raw: str):
+        # An empty image is only an error for new records, decided in `write_batch`
+        if not raw:
+            return None
+        if self.images is None:
+            raise ValidationError('No image archive or directory was provided.')
+        if not self.images.exists(raw):
+            raise ValidationError(f'"{raw}" was not found in the images.')
+        return raw
+
+    def open_image(self, name: str):
+        # Read and validated only when written, so a batch never holds its images in memory
+        content = self.fields['image'].clean(self.images.open(name))
+        content.seek(0)
+        return content
+
+    def validate(self, obj, line: int) -> bool:
+        """
+        Runs the model validation the form's `_post_clean` would, leaving out
+        the image, validated when opened, and the fields the importer sets.
+
+        Returns:
+        bool: Whether the record is valid, its errors added to the result if not.
+        """
+        try:
+            obj.full_clean(exclude=['owner', 'image', *self.relations])
+        except ValidationError as error:
+            for field_name, messages in error.message_dict.items():
+                field = self.fields.get(field_name)
+                for message in messages:
+                    self.result.add_error(line, f'Error in {field.label}: {message}' if field else message)
+            return False
+        return True
+
+    def identify(self, obj) -> tuple:
+        return tuple(
+            getattr(obj, f'{name}_id' if name in self.relations else name) for name in self.identity
+        )
+
+    def write_batch(self, batch: list):
+        # Later rows win when a batch names the same record twice
+        rows = {tuple(values[name] for name in self.identity): (line, values) for line, values in batch}
+        existing = {}
+        names = {values['name'] for _line, values in rows.values()}
+        for obj in self.model.objects.filter(owner=self.owner, name__in=names).order_by('-id'):
+            existing[self.identify(obj)] = obj
+
+        to_create = []
+        to_update = []
+        now = timezone.now()
+        image_label = self.fields['image'].label
+
+        with transaction.atomic():
+            for key, (line, values) in rows.items():
+                image = values.pop('image')
+                obj = existing.get(key)
+
+                if obj is None and image is None:
+                    self.result.add_error(line, f'Error in {image_label}: This field is required.')
+                    continue
+
+                if obj is None:
+                    obj = self.model(owner=self.owner)
+                for field_name, value in values.items():
+                    setattr(obj, f'{field_name}_id' if field_name in self.relations else field_name, value)
+                if not self.validate(obj, line):
+                    continue
+
+                content = None
+                if image is not None:
+                    try:
+                        content = self.open_image(image)
+                    except ValidationError as error:
+                        for message in error.messages:
+                            self.result.add_error(line, f'Error in {image_label}: {message}')
+                        continue
+
+                if obj.pk is None:
+                    to_create.append(obj)
+                else:
+                    obj.last_update = now
+                    to_update.append(obj)
+
+                if content is not None:
+                    # Processes (resizes) and stores the file
+                    obj.image.save(content.name, content, save=False)
+
+            self.model.objects.bulk_create(to_create)
+            if to_update:
+                update_fields = [
+                    field_name for field_name in self.fields if field_name not in self.identity
+                ] + ['last_update']
+                self.model.objects.bulk_update(to_update, update_fields)
+
+            self.after_batch(to_create + to_update)
+
+            # bulk writes skip post_save: queue raw uploads stored in async mode and
+            # release the images the updated rows replaced here
+            for obj in to_create + to_update:
+                schedule_pending(obj)
+                release_replaced_images(self.model, obj)
+
+        self.result.created += len(to_create)
+        self.result.updated += len(to_update)
+
+    def after_batch(self, objs: list):
+        pass
+
+
+class CategoryImporter(CatalogImporter):
+    model = Category
+    form_class = modelform_factory(Category, fields=['image', 'name', 'description'])
+
+    def after_batch(self, objs: list):
+        # bulk writes skip post_save, which invalidates the form choices
+        bump_choices_version(self.owner.pk)
+
+
+class SubCategoryImporter(CatalogImporter):
+    model = SubCategory
+    form_class = SubCategoryForm
+    relations = {'category': Category}
+    # Names are only unique within a category
+    identity = ['category', 'name']
+
+    def after_batch(self, objs: list):
+        # bulk writes skip post_save, which invalidates the form choices
+        bump_choices_version(self.owner.pk)
+
+
+class ProductImporter(CatalogImporter):
+    model = Product
+    form_class = ProductForm
+    relations = {'category': Category, 'sub_category': SubCategory}
+    scopes = {'sub_category': 'category'}
+
+    def after_batch(self, objs: list):
+        # bulk writes skip the post_save signal that maintains the search vector
+        changed = [obj.pk for obj in objs if search_fields_changed(obj)]
+        if changed:
+            update_search_vector(Product.objects.filter(pk__in=changed))
+
+
+IMPORTERS = {
+    'categories': CategoryImporter,
+    'sub-categories': SubCategoryImporter,
+    'products': ProductImporter,
+}
@@ -0,0 +1,99 @@
+import datetime
+
+from django.db.models import Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import Product, StockMovement, StockSnapshot
+from .watermarks import committed_watermark
+
+
+def latest_snapshots(as_of: datetime.datetime = None):
+    """
+    Parameters:
+    - as_of (datetime): Only consider snapshots taken at or before this time. Optional.
+
+    Returns:
+    QuerySet: The snapshots of the outer product, latest first, for use in a `Subquery`.
+    """
+    snapshots = StockSnapshot.objects.filter(product=OuterRef('pk'))
+    if as_of is not None:
+        snapshots = snapshots.filter(created_at__lte=as_of)
+    return snapshots.order_by('-created_at', '-id')
+
+
+def with_snapshot(queryset, as_of: datetime.datetime = None):
+    """
+    Annotates products with their latest stock snapshot.
+
+    Parameters:
+    - queryset (QuerySet): Products.
+    - as_of (datetime): Read the latest snapshot taken at or before this time. Optional.
+
+    Returns:
+    QuerySet: The products with `snapshot_quantity`, `snapshot_movement_id` and
+    `snapshot_at` (None for products never snapshotted).
+    """
+    snapshots = latest_snapshots(as_of)
+    return queryset.annotate(
+        snapshot_quantity=Coalesce(Subquery(snapshots.values('quantity')[:1]), 0),
+        snapshot_movement_id=Coalesce(Subquery(snapshots.values('last_movement_id')[:1]), 0),
+        snapshot_at=Subquery(snapshots.values('created_at')[:1]),
+    )
+
+
+def with_stock(queryset, up_to: int = None):
+    """
+    Annotates products with their current stock level.
+
+    The level is the latest snapshot plus the movements recorded since, both
+    read through per-product indexes, so its cost depends on the activity
+    since the last snapshot and not on the size of the ledger.
+
+    Parameters:
+    - queryset (QuerySet): Products.
+    - up_to (int): Only count movements up to this id. Optional.
+
+    Returns:
+    QuerySet: The products with a `stock` annotation.
+    """
+    recent = StockMovement.objects.filter(product=OuterRef('pk'), id__gt=OuterRef('snapshot_movement_id'))
+    if up_to is not None:
+        recent = recent.filter(id__lte=up_to)
+    recent = recent.order_by().values('product').annotate(total=Sum('quantity')).values('total')
+
+    return with_snapshot(queryset).annotate(
+        stock=F('snapshot_quantity') + Coalesce(Subquery(recent), 0),
+    )
+
+
+def stock_level(product) -> int:
+    return with_stock(Product.objects.filter(pk=product.pk)).values_list('stock', flat=True).get()
+
+
+def take_snapshots(products=None, batch_size: int = 1000) -> int:
+    """
+    Writes a new snapshot of every product whose stock moved since its last snapshot.
+
+    Parameters:
+    - products (QuerySet): The products to snapshot. Default is all products.
+    - batch_size (int): Products read and snapshots inserted per batch. Default is 1000.
+
+    Returns:
+    int: The number of snapshots written.
+    """
+    watermark = committed_watermark(StockMovement)
+    products = with_stock(products if products is not None else Product.objects.all(), up_to=watermark)
+    # Products without movements since their snapshot keep it
+    products = products.filter(Exists(StockMovement.objects.filter(
+        product=OuterRef('pk'), id__gt=OuterRef('snapshot_movement_id'), id__lte=watermark
+    )))
+
+    written = 0
+    batch = []
+    for pk, stock in products.order_by('pk').values_list('pk', 'stock').iterator(chunk_size=batch_size):
+        batch.append(StockSnapshot(product_id=pk, quantity=stock, last_movement_id=watermark))
+        if len(batch) >= batch_size:
+            written += len(StockSnapshot.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        written += len(StockSnapshot.objects.bulk_create(batch))
+    return written
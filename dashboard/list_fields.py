@@ -0,0 +1,48 @@
+def get_model_fields(model, field_order: list) -> list:
+    """
+    Resolves the column names of a list page into model fields.
+
+    Parameters:
+    - model (Model): The model being listed.
+    - field_order (list): The names of the fields to display, in column order.
+
+    Returns:
+    list: The model fields, in the same order.
+    """
+    return [model._meta.get_field(field_name) for field_name in field_order]
+
+
+def queryset_for_fields(queryset, field_order: list, extra_fields: list = None, related_fields: list = None):
+    """
+    Restricts a list queryset to the columns a list page displays.
+
+    Foreign keys named in `field_order` are joined with `select_related` so
+    rendering a row never triggers a lazy query, and `only()` limits both the
+    listed model and the joined models to the columns that are shown.
+
+    Parameters:
+    - queryset (QuerySet): The queryset to restrict.
+    - field_order (list): The names of the fields to display.
+    - extra_fields (list): Additional fields the page needs, e.g. the ordering fields. Optional.
+    - related_fields (list): The fields to load on each joined model, used for its string
+      representation. Default is ['name'].
+
+    Returns:
+    QuerySet: The restricted queryset.
+    """
+    related_fields = related_fields or ['name']
+    model = queryset.model
+
+    select_related = []
+    only = []
+    for field in get_model_fields(model, list(field_order) + list(extra_fields or [])):
+        only.append(field.name)
+
+        if field.many_to_one:
+            select_related.append(field.name)
+            only.extend(
+                f'{field.name}__{name}' for name in related_fields
+                if any(related.name == name for related in field.related_model._meta.concrete_fields)
+            )
+
+    return queryset.select_related(*select_related).only(*only)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from dashboard.sales_report import aggregate_sales, rebuild_sales_buckets
+
+
+class Command(BaseCommand):
+    help = (
+        'Folds the orders written since the last run into the hourly sales buckets of the reports. '
+        'Run it periodically (e.g. every few minutes) to keep report reads short.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Orders per transaction.')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every bucket from the order history.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild_sales_buckets(batch_size=options['batch_size'])
+        else:
+            count = aggregate_sales(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} orders aggregated.'))
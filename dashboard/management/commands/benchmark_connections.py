@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import get_runner
+from django.urls import reverse
+from dashboard.benchmarks import SUITE_SIZES, benchmark_storage, measure_connection_modes
+from dashboard.seeding import seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the dashboard page with a new database connection per request, a persistent '
+        'connection and a pooled one, on seeded data in a test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Timed requests per mode.')
+
+    def handle(self, *args, **options):
+        runner = get_runner(settings)(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        try:
+            with benchmark_storage():
+                user = seed_benchmark_data(1, SUITE_SIZES, prefix='connections')[0]
+                results = measure_connection_modes(user, reverse('dashboard'), repeat=options['repeat'])
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+
+        baseline = results['new'].median_ms
+        self.stdout.write(f'{"Mode":<12} {"Median ms":>9} {"p95 ms":>8} {"Connections":>11}')
+        for mode, measurement in results.items():
+            self.stdout.write(
+                f'{mode:<12} {measurement.median_ms:>9.2f} {measurement.p95_ms:>8.2f} {measurement.connections:>11}'
+                + ('' if mode == 'new' else f'   {baseline - measurement.median_ms:.2f} ms saved per request')
+            )
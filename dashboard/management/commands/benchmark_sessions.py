@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import get_runner
+from dashboard.benchmarks import SUITE_SIZES, benchmark_storage, measure_session_modes
+from dashboard.seeding import seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the queries, session reads and writes and wall time of a logged-in round trip '
+        'with each session engine, on seeded data in a test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Timed round trips per mode.')
+
+    def handle(self, *args, **options):
+        runner = get_runner(settings)(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        try:
+            with benchmark_storage():
+                user = seed_benchmark_data(1, SUITE_SIZES, prefix='sessions')[0]
+                results = measure_session_modes(user, repeat=options['repeat'])
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+
+        self.stdout.write(f'{"Mode":<15} {"Request":<16} {"Queries":>7} {"Reads":>5} {"Writes":>6} {"Median ms":>9}')
+        for mode, requests in results.items():
+            for name, measurement in requests.items():
+                self.stdout.write(
+                    f'{mode:<15} {name:<16} {measurement.queries:>7} {measurement.session_reads:>5} '
+                    f'{measurement.session_writes:>6} {measurement.median_ms:>9.2f}'
+                )
@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from dashboard.views import DashboardView
+
+
+UNCACHED_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = 'Measures the render time of the dashboard page without and with template and fragment caching.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--username', help='The user rendering the page, defaults to the first user.')
+
+    def measure(self, request, iterations: int) -> float:
+        view = DashboardView.as_view()
+        view(request).render()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            view(request).render()
+        return (time.perf_counter() - start) / iterations * 1000
+
+    def templates(self, cached: bool) -> list:
+        loaders = settings.TEMPLATE_LOADERS
+        options = {**settings.TEMPLATES[0]['OPTIONS'], 'loaders': (
+            [('django.template.loaders.cached.Loader', loaders)] if cached else loaders
+        )}
+        return [{**settings.TEMPLATES[0], 'OPTIONS': options}]
+
+    def handle(self, *args, **options):
+        users = User.objects.select_related('profile').order_by('pk')
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to render the page for.')
+
+        request = RequestFactory().get('/')
+        request.user = user
+        iterations = options['iterations']
+
+        # Before: templates read and parsed on every render, no fragment cache
+        with override_settings(TEMPLATES=self.templates(cached=False), CACHES=UNCACHED_CACHES):
+            before = self.measure(request, iterations)
+
+        # After: parsed templates kept in memory, shell fragments cached
+        with override_settings(TEMPLATES=self.templates(cached=True)):
+            cache.clear()
+            after = self.measure(request, iterations)
+
+        self.stdout.write(f'Uncached templates and fragments: {before:7.2f} ms')
+        self.stdout.write(f'Cached loader and fragments:      {after:7.2f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Saving: {before - after:.2f} ms per render ({(1 - after / before) * 100:.0f}%)'
+        ))
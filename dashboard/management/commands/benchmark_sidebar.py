@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from dashboard.sidebar import Sidebar, get_menu, render_sidebar
+
+
+class Command(BaseCommand):
+    help = 'Measures the per-request cost of the sidebar, rebuilt from scratch and served from its cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def measure(self, func, iterations: int) -> float:
+        func()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if settings.DEBUG:
+            self.stderr.write('DEBUG is on: the sidebar is not cached, run with DEBUG=False.')
+        sidebar = Sidebar(section_active_id=3, sub_section_active_id=2)
+
+        def rebuilt():
+            # What every request did: build the menu, reverse its URLs, render the template
+            get_menu.cache_clear()
+            return render_sidebar(sidebar.section_active_id, sidebar.sub_section_active_id)
+
+        def cached():
+            return sidebar.render('benchmark')
+
+        before = self.measure(rebuilt, iterations)
+        get_menu.cache_clear()
+        after = self.measure(cached, iterations)
+
+        self.stdout.write(f'Rebuilt per request: {before:9.1f} µs')
+        self.stdout.write(f'Cached fragment:     {after:9.1f} µs')
+        self.stdout.write(self.style.SUCCESS(
+            f'Saving: {before - after:.1f} µs per request ({before / after:.0f}x faster)'
+        ))
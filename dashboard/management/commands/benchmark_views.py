@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import get_runner
+from dashboard.benchmarks import BASELINES_PATH, find_regressions, load_baselines, run_benchmarks, write_baselines
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the queries, wall time and peak memory of every route on seeded data, in a test '
+        'database, and compares them with the committed baselines.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per route.')
+        parser.add_argument(
+            '--update-baselines', action='store_true',
+            help=f'Write the measurements to {BASELINES_PATH.name} instead of comparing them.',
+        )
+
+    def handle(self, *args, **options):
+        runner = get_runner(settings)(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        try:
+            results = run_benchmarks(repeat=options['repeat'])
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+
+        baselines = load_baselines()['routes']
+        self.stdout.write(f'{"Route":<26} {"Queries":>7} {"ms":>8} {"Peak KiB":>9}   Baseline')
+        for name, measurement in results.items():
+            if measurement is None:
+                continue
+            baseline = baselines.get(name)
+            compared = (
+                f'{baseline["queries"]:>3} {baseline["time_ms"]:>8.2f} {baseline["peak_kib"]:>7}' if baseline else '-'
+            )
+            self.stdout.write(
+                f'{name:<26} {measurement.queries:>7} {measurement.time_ms:>8.2f} {measurement.peak_kib:>9}   {compared}'
+            )
+
+        if options['update_baselines']:
+            write_baselines(results)
+            self.stdout.write(self.style.SUCCESS(f'Baselines written to {BASELINES_PATH}.'))
+            return
+
+        regressions = find_regressions(results, load_baselines())
+        if regressions:
+            raise CommandError('Regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,50 @@
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.fields import AsyncProcessedImageField
+from dashboard.image_processing import is_pending
+from dashboard.models import Profile, Category, SubCategory, Product, StoredFile
+
+
+class Command(BaseCommand):
+    help = 'Moves images stored before content addressing to hashed names, keeping one copy of duplicates.'
+
+    def handle(self, *args, **options):
+        tracked = set(StoredFile.objects.values_list('name', flat=True))
+        # Original name -> hashed name, shared by every row using the same file
+        moved = {}
+        storage = None
+        count = 0
+
+        for model in (Profile, Category, SubCategory, Product):
+            for field in model._meta.concrete_fields:
+                if not isinstance(field, AsyncProcessedImageField):
+                    continue
+
+                storage = field.storage
+                if not hasattr(storage, 'reference'):
+                    raise CommandError('The default storage is not content-addressed.')
+
+                rows = model.objects.exclude(**{field.name: ''}).values_list('pk', field.name)
+                for pk, name in rows.iterator():
+                    if not name or name == field.default or is_pending(name) or name in tracked:
+                        continue
+
+                    if name in moved:
+                        storage.reference(moved[name])
+                    elif storage.exists(name):
+                        with storage.open(name) as file:
+                            moved[name] = storage.save(name, file)
+                    else:
+                        self.stderr.write(f'{name}: file not found')
+                        continue
+
+                    model.objects.filter(pk=pk, **{field.name: name}).update(**{field.name: moved[name]})
+                    count += 1
+
+        # Every row now uses the hashed names, the originals are unreferenced
+        for name in moved:
+            FileSystemStorage.delete(storage, name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} images moved to {len(set(moved.values()))} content-addressed files.'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from dashboard.fields import AsyncProcessedImageField
+from dashboard.image_processing import is_pending
+from dashboard.models import Profile, Category, SubCategory, Product
+from dashboard.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generates the responsive renditions of every stored image that lacks them.'
+
+    def handle(self, *args, **options):
+        count = 0
+        for model in (Profile, Category, SubCategory, Product):
+            for field in model._meta.concrete_fields:
+                if not isinstance(field, AsyncProcessedImageField):
+                    continue
+
+                names = model.objects.exclude(**{field.name: ''}).values_list(field.name, flat=True).distinct()
+                for name in names.iterator():
+                    if not name or is_pending(name):
+                        continue
+                    try:
+                        generate_renditions(field.attr_class(None, field, name))
+                    except OSError as error:
+                        self.stderr.write(f'{name}: {error}')
+                        continue
+                    count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Renditions generated for {count} images.'))
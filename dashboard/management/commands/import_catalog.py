@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.importer import IMPORTERS, ImageSource, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk imports categories, sub-categories or products from a CSV or JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help='What the file contains.')
+        parser.add_argument('path', help='CSV, JSON or JSON Lines file to import.')
+        parser.add_argument('--owner', required=True, help='Username of the catalog owner.')
+        parser.add_argument('--images', help='Zip archive or directory holding the images named in the file.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows written per transaction.')
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["owner"]}" does not exist.')
+
+        try:
+            images = ImageSource(options['images']) if options['images'] else None
+        except (ValueError, OSError) as error:
+            raise CommandError(error)
+
+        importer = IMPORTERS[options['kind']](owner, images=images, batch_size=options['batch_size'])
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as file:
+                result = importer.run(read_rows(file, options['path']))
+        finally:
+            if images is not None:
+                images.close()
+
+        for line, message in result.errors:
+            self.stderr.write(f'Line {line}: {message}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} created, {result.updated} updated, {len(result.errors)} errors.'
+        ))
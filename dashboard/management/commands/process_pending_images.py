@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from dashboard.image_processing import process_all_pending
+
+
+class Command(BaseCommand):
+    help = 'Processes raw image uploads left pending, e.g. after a worker restart.'
+
+    def handle(self, *args, **options):
+        count = process_all_pending()
+        self.stdout.write(self.style.SUCCESS(f'{count} images processed.'))
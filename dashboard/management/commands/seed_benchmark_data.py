@@ -0,0 +1,45 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.seeding import SeedSizes, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates users with realistic catalogs (with images), customers, suppliers, purchase orders '
+        'and sales, to benchmark the dashboard on production-like data.'
+    )
+
+    def add_arguments(self, parser):
+        defaults = SeedSizes()
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--categories', type=int, default=defaults.categories, help='Categories per user.')
+        parser.add_argument('--sub-categories', type=int, default=defaults.sub_categories, help='Sub-categories per category.')
+        parser.add_argument('--products', type=int, default=defaults.products, help='Products per sub-category.')
+        parser.add_argument('--customers', type=int, default=defaults.customers, help='Customers per user.')
+        parser.add_argument('--suppliers', type=int, default=defaults.suppliers, help='Suppliers per user.')
+        parser.add_argument('--orders', type=int, default=defaults.orders, help='Sales per user.')
+        parser.add_argument('--images', type=int, default=defaults.images, help='Distinct images shared by the catalogs.')
+        parser.add_argument('--prefix', default='bench', help='Username prefix, users are named <prefix>-0, <prefix>-1, ...')
+        parser.add_argument('--password', default='benchmark', help="The users' password.")
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed giving the same data.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        usernames = [f'{prefix}-{index}' for index in range(options['users'])]
+        existing = list(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        if existing:
+            raise CommandError(f'Users already exist: {", ".join(sorted(existing))}. Use another --prefix.')
+
+        sizes = SeedSizes(**{field: options[field] for field in SeedSizes._fields})
+        start = time.perf_counter()
+        try:
+            users = seed_benchmark_data(options['users'], sizes, prefix=prefix, password=options['password'], seed=options['seed'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        products = sizes.categories * sizes.sub_categories * sizes.products
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(users)} users seeded with {products} products each in {time.perf_counter() - start:.1f} s.'
+        ))
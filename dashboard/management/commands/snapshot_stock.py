@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from dashboard.inventory import take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Snapshots the stock of every product that moved since its last snapshot. '
+        'Run it periodically (e.g. hourly or nightly) to keep stock reads short.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products per batch.')
+
+    def handle(self, *args, **options):
+        count = take_snapshots(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} stock snapshots written.'))
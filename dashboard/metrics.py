@@ -0,0 +1,382 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+from django.views import View
+from .profiling import profile_request
+
+
+logger = logging.getLogger(__name__)
+
+# Prefix of every exported metric name
+NAMESPACE = 'denvow'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+IMAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Request methods kept as label values, others are counted as 'other'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class Metric(NamedTuple):
+    name: str
+    kind: str
+    help: str
+    labels: tuple = ()
+    buckets: tuple = ()
+
+
+REQUEST_DURATION = Metric(
+    'request_duration_seconds', 'histogram', 'Time to handle a request, by URL name.', ('view', 'method'),
+    LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Metric('response_size_bytes', 'histogram', 'Response body size, by URL name.', ('view',), SIZE_BUCKETS)
+DB_DURATION = Metric(
+    'db_duration_seconds', 'histogram', 'Database time of a request, by URL name.', ('view',), LATENCY_BUCKETS,
+)
+DB_QUERIES = Metric('db_queries_total', 'counter', 'Database statements run, by URL name.', ('view',))
+IMAGE_DURATION = Metric(
+    'image_processing_seconds', 'histogram', 'Duration of upload processing and rendition generation.', (),
+    IMAGE_BUCKETS,
+)
+CACHE_REQUESTS = Metric(
+    'cache_requests_total', 'counter', 'Cache reads, by key group and result (hit or miss).', ('group', 'result'),
+)
+
+METRICS = (REQUEST_DURATION, RESPONSE_SIZE, DB_DURATION, DB_QUERIES, IMAGE_DURATION, CACHE_REQUESTS)
+
+
+class Registry:
+    """
+    Thread-safe counters and histograms of this process.
+
+    With a `METRICS_DIR`, every process (web workers, image workers) writes
+    its totals to a file of its own there, every `METRICS_FLUSH_INTERVAL`
+    seconds from a background thread, and `collect` sums the files of all
+    processes. A forked worker starts from zero with a new file, so the
+    totals of the parent are never counted twice. Clear the directory when
+    deploying, as Prometheus expects counters to only grow while a
+    deployment runs.
+    """
+
+    def __init__(self, metrics: tuple):
+        self.metrics = {metric.name: metric for metric in metrics}
+        self.lock = threading.Lock()
+        self.pid = None
+        self.values = {}
+        self.dirty = False
+        self.path = None
+
+    def start_process(self):
+        # Called under the lock, on first use in each process
+        self.pid = os.getpid()
+        self.values = {name: {} for name in self.metrics}
+        self.dirty = False
+        self.path = None
+        if settings.METRICS_DIR:
+            directory = Path(settings.METRICS_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            self.path = directory / f'metrics-{self.pid}-{time.time_ns()}.json'
+            threading.Thread(target=self.flush_periodically, daemon=True, name='metrics-flush').start()
+            atexit.register(self.flush)
+
+    def observe(self, metric: Metric, labels: tuple, value: float):
+        """
+        Counts a value: adds it to a counter, or to the bucket of a histogram it falls in.
+
+        Parameters:
+        - metric (Metric): One of the registered metrics.
+        - labels (tuple): The values of the metric's labels.
+        - value (float): The amount or the observed value.
+        """
+        with self.lock:
+            if self.pid != os.getpid():
+                self.start_process()
+            series = self.values[metric.name]
+            if metric.kind == 'counter':
+                series[labels] = series.get(labels, 0) + value
+            else:
+                # One count per bucket and one for +Inf, then the sum
+                entry = series.get(labels)
+                if entry is None:
+                    entry = series[labels] = [0] * (len(metric.buckets) + 1) + [0.0]
+                entry[bisect_left(metric.buckets, value)] += 1
+                entry[-1] += value
+            self.dirty = True
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            if self.pid != os.getpid():
+                self.start_process()
+            self.dirty = False
+            return {
+                name: [[list(labels), value if isinstance(value, (int, float)) else list(value)] for labels, value in series.items()]
+                for name, series in self.values.items()
+            }
+
+    def flush(self):
+        if self.path is None or self.pid != os.getpid():
+            return
+        # Written aside and renamed, so readers never see a partial file
+        temporary = self.path.with_suffix(f'.{threading.get_ident()}.tmp')
+        try:
+            temporary.write_text(json.dumps(self.snapshot()))
+            os.replace(temporary, self.path)
+        except OSError:
+            # E.g. the directory was cleared; the next flush writes the totals again
+            logger.warning('Could not write the metrics to %s', self.path, exc_info=True)
+
+    def flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            if self.dirty:
+                self.flush()
+
+    def collect(self) -> dict:
+        """
+        Returns:
+        dict: The values of every metric, summed over the processes sharing
+        `METRICS_DIR`, or of this process only without it.
+        """
+        if not settings.METRICS_DIR:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for path in Path(settings.METRICS_DIR).glob('metrics-*.json'):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    # Removed, or replaced while it was read
+                    continue
+
+        totals = {name: {} for name in self.metrics}
+        for snapshot in snapshots:
+            for name, series in snapshot.items():
+                if name not in totals:
+                    continue
+                for labels, value in series:
+                    labels = tuple(labels)
+                    current = totals[name].get(labels)
+                    if current is None:
+                        totals[name][labels] = value
+                    elif isinstance(value, list):
+                        totals[name][labels] = [a + b for a, b in zip(current, value)]
+                    else:
+                        totals[name][labels] = current + value
+        return totals
+
+
+registry = Registry(METRICS)
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render(totals: dict) -> str:
+    """
+    Formats collected values in the Prometheus text exposition format.
+
+    Histograms have cumulative `_bucket` series, from which Prometheus
+    computes quantiles, e.g. the p99 latency per view:
+    `histogram_quantile(0.99, sum by (view, le) (rate(denvow_request_duration_seconds_bucket[5m])))`.
+    A `cache_hit_ratio` gauge is derived from the cache reads.
+
+    Parameters:
+    - totals (dict): From `Registry.collect`.
+
+    Returns:
+    str: The exposition text.
+    """
+    lines = []
+    for metric in registry.metrics.values():
+        name = f'{NAMESPACE}_{metric.name}'
+        lines.append(f'# HELP {name} {metric.help}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for labels, value in sorted(totals[metric.name].items()):
+            if metric.kind == 'counter':
+                lines.append(f'{name}{format_labels(metric.labels, labels)} {value}')
+                continue
+
+            cumulative = 0
+            for bound, count in zip([*metric.buckets, '+Inf'], value[:-1]):
+                cumulative += count
+                bucket_labels = format_labels(metric.labels, labels, f'le="{bound}"')
+                lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(metric.labels, labels)} {value[-1]}')
+            lines.append(f'{name}_count{format_labels(metric.labels, labels)} {cumulative}')
+
+    reads = {}
+    for (group, result), count in totals[CACHE_REQUESTS.name].items():
+        reads.setdefault(group, {'hit': 0, 'miss': 0})[result] += count
+    name = f'{NAMESPACE}_cache_hit_ratio'
+    lines.append(f'# HELP {name} Share of the cache reads that hit, by key group.')
+    lines.append(f'# TYPE {name} gauge')
+    for group, counts in sorted(reads.items()):
+        lines.append(f'{name}{format_labels(("group",), (group,))} {counts["hit"] / (counts["hit"] + counts["miss"]):.4f}')
+    return '\n'.join(lines) + '\n'
+
+
+def observe_timing(sender, metric: str, duration_ms: float, **kwargs):
+    """
+    Receives `dashboard.profiling.timing_measured`, connected when `METRICS` is on.
+    """
+    if metric == 'img':
+        registry.observe(IMAGE_DURATION, (), duration_ms / 1000)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, response size and database time of each request,
+    labelled with the name of the URL pattern it resolved to.
+
+    Requests that resolved to no pattern (404s) share the 'unmatched'
+    label, so scanners cannot grow the number of series. With `METRICS`
+    off, Django drops the middleware at startup.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with profile_request() as profile:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = getattr(request.resolver_match, 'view_name', None) or 'unmatched'
+        method = request.method if request.method in METHODS else 'other'
+        registry.observe(REQUEST_DURATION, (view, method), duration)
+        registry.observe(DB_DURATION, (view,), profile.durations['db'] / 1000)
+        registry.observe(DB_QUERIES, (view,), profile.queries)
+        if not response.streaming:
+            registry.observe(RESPONSE_SIZE, (view,), len(response.content))
+        return response
+
+
+class MetricsView(View):
+    """
+    Serves the metrics for Prometheus to scrape.
+
+    Not found unless `METRICS` is on. With a `METRICS_TOKEN`, scrapers must
+    send it as a bearer token.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not settings.METRICS:
+            raise Http404
+        if settings.METRICS_TOKEN:
+            expected = f'Bearer {settings.METRICS_TOKEN}'
+            if not constant_time_compare(request.headers.get('Authorization', ''), expected):
+                return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        return HttpResponse(render(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def key_group(key: str) -> str:
+    """
+    Parameters:
+    - key (str): A cache key, e.g. 'choices:12:1700000000:dashboard.category'.
+
+    Returns:
+    str: The key without its per-user and per-version parts, e.g. 'choices',
+    or 'template.cache.<fragment name>' for template fragments.
+    """
+    if key.startswith('template.cache.'):
+        return key.rsplit('.', 1)[0]
+    if ':' in key:
+        return key.split(':', 1)[0]
+    return 'other'
+
+
+class InstrumentedCache(BaseCache):
+    """
+    A cache backend counting the hits and misses of the backend it wraps,
+    given as a cache configuration in `OPTIONS['CACHE']`.
+
+    Only reads are counted; every call is passed on unchanged.
+    """
+    _missing = object()
+
+    def __init__(self, location, params):
+        super().__init__({})
+        wrapped = params['OPTIONS']['CACHE']
+        self.cache = import_string(wrapped['BACKEND'])(wrapped.get('LOCATION', ''), wrapped)
+
+    def count(self, key: str, hit: bool):
+        registry.observe(CACHE_REQUESTS, (key_group(key), 'hit' if hit else 'miss'), 1)
+
+    def get(self, key, default=None, version=None):
+        value = self.cache.get(key, self._missing, version=version)
+        self.count(key, value is not self._missing)
+        return default if value is self._missing else value
+
+    def get_many(self, keys, version=None):
+        values = self.cache.get_many(keys, version=version)
+        for key in keys:
+            self.count(key, key in values)
+        return values
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.cache.get(key, self._missing, version=version)
+        self.count(key, value is not self._missing)
+        if value is self._missing:
+            return self.cache.get_or_set(key, default, timeout, version=version)
+        return value
+
+    # Everything else is passed on as is
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.cache.add(key, value, timeout, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.cache.set(key, value, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.cache.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        return self.cache.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.cache.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.cache.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.cache.decr(key, delta, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.cache.set_many(data, timeout, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self.cache.delete_many(keys, version=version)
+
+    def clear(self):
+        return self.cache.clear()
+
+    def close(self, **kwargs):
+        return self.cache.close(**kwargs)
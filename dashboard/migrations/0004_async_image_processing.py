@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-18 08:59
+
+import dashboard.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_product_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='image',
+            field=dashboard.fields.AsyncProcessedImageField(upload_to='categories'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=dashboard.fields.AsyncProcessedImageField(upload_to='products'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_pic',
+            field=dashboard.fields.AsyncProcessedImageField(blank=True, default='avater/default/avater.png', null=True, upload_to='avater'),
+        ),
+        migrations.AlterField(
+            model_name='subcategory',
+            name='image',
+            field=dashboard.fields.AsyncProcessedImageField(upload_to='sub-categories'),
+        ),
+    ]
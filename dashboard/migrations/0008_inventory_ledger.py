@@ -0,0 +1,60 @@
+# Generated by Django 5.0 on 2026-10-18 09:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def stock_to_movements(apps, schema_editor):
+    # The stock counters become opening adjustments of the ledger
+    Product = apps.get_model('dashboard', 'Product')
+    StockMovement = apps.get_model('dashboard', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        StockMovement(owner_id=owner_id, product_id=pk, kind='adjustment', quantity=stock, note='Opening stock')
+        for pk, owner_id, stock in Product.objects.exclude(stock=0).values_list('pk', 'owner_id', 'stock').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_pos_checkout'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('purchase', 'Purchase'), ('sale', 'Sale'), ('adjustment', 'Adjustment'), ('return', 'Return')], max_length=10)),
+                ('quantity', models.IntegerField()),
+                ('note', models.CharField(blank=True, default='', max_length=250)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='dashboard.order')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'id'], name='stockmovement_product_id_idx'), models.Index(fields=['owner', '-id'], name='stockmovement_owner_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('last_movement_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-created_at', '-id'], name='stocksnapshot_product_idx')],
+            },
+        ),
+        migrations.RunPython(stock_to_movements, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='product',
+            name='stock',
+        ),
+    ]
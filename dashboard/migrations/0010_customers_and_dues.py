@@ -0,0 +1,139 @@
+# Generated by Django 5.0 on 2026-10-18 09:27
+
+import django.contrib.postgres.indexes
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+import django.db.models.functions.text
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def delete_placeholder_customers(apps, schema_editor):
+    # Customer had no fields before: any row is meaningless and would need an owner
+    apps.get_model('dashboard', 'Customer').objects.all().delete()
+
+
+def mark_orders_paid(apps, schema_editor):
+    # Orders before dues were always paid in full
+    Order = apps.get_model('dashboard', 'Order')
+    Order.objects.update(paid=models.F('total'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_sales_report_buckets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_placeholder_customers, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('note', models.CharField(blank=True, default='', max_length=250)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='dues',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='email',
+            field=models.EmailField(blank=True, default='', max_length=254),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='last_update',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='name',
+            field=models.CharField(default='', max_length=150),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='orders',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='owner',
+            field=models.ForeignKey(default=1, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.customer'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='paid',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['owner', 'name', 'id'], name='customer_owner_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='customer_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phone'], name='customer_phone_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(models.F('owner'), models.OrderBy(models.F('dues'), descending=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('dues__gt', 0)), name='customer_owner_dues_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['owner', '-total_spent', '-id'], name='customer_owner_spent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(models.F('owner'), models.F('phone'), condition=models.Q(('phone', ''), _negated=True), name='customer_owner_phone_uniq', violation_error_message='A customer with this phone already exists.'),
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(models.F('owner'), django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='customer_owner_email_uniq', violation_error_message='A customer with this email already exists.'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='dashboard.customer'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(mark_orders_paid, migrations.RunPython.noop),
+    ]
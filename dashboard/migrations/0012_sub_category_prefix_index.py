@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-18 09:35
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_suppliers_and_purchase_orders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subcategory',
+            index=models.Index(models.F('owner'), models.F('category'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), name='subcategory_name_prefix_idx'),
+        ),
+    ]
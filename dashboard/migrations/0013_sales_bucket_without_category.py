@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-18 10:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_sub_category_prefix_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='salesbucket',
+            name='category',
+        ),
+    ]
@@ -0,0 +1,4 @@
+from .crud import OwnerCreateMixin, OwnerDeleteMixin, OwnerListMixin, OwnerUpdateMixin
+from .owner import OwnedObjectMixin, OwnerFormMixin, OwnerQuerysetMixin
+from .pages import FormMessagesMixin, PageContextMixin
+from .query_budget import QueryBudgetExceeded, QueryBudgetMixin
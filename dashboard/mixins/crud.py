@@ -0,0 +1,29 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from .owner import OwnedObjectMixin, OwnerFormMixin, OwnerQuerysetMixin
+from .pages import FormMessagesMixin, PageContextMixin
+from .query_budget import QueryBudgetMixin
+
+
+# The budget counts the session and user lookups, so it wraps the login check
+class OwnerCreateMixin(QueryBudgetMixin, LoginRequiredMixin, PageContextMixin, FormMessagesMixin, OwnerFormMixin):
+    """
+    For a CreateView of an owned model: the new object belongs to the logged-in user.
+    """
+
+
+class OwnerListMixin(QueryBudgetMixin, LoginRequiredMixin, PageContextMixin, OwnerQuerysetMixin):
+    """
+    For a ListView of an owned model: only the logged-in user's rows are listed.
+    """
+
+
+class OwnerUpdateMixin(QueryBudgetMixin, LoginRequiredMixin, PageContextMixin, FormMessagesMixin, OwnerFormMixin, OwnedObjectMixin):
+    """
+    For an UpdateView of an owned model: only the logged-in user's objects can be edited.
+    """
+
+
+class OwnerDeleteMixin(QueryBudgetMixin, LoginRequiredMixin, PageContextMixin, FormMessagesMixin, OwnedObjectMixin):
+    """
+    For a DeleteView of an owned model: only the logged-in user's objects can be deleted.
+    """
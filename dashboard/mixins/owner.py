@@ -0,0 +1,50 @@
+from django.core.exceptions import PermissionDenied
+
+
+class OwnerQuerysetMixin:
+    """
+    Limits a view's queryset to the rows of the logged-in user.
+
+    The filter is on `owner_id`, so it adds a condition to the view's one
+    query instead of a join, and never loads the user row.
+    """
+
+    def get_queryset(self):
+        # From the manager, not ListView's queryset: list views order after annotating (e.g. search rank)
+        return self.model._default_manager.filter(owner_id=self.request.user.pk)
+
+
+class OwnedObjectMixin(OwnerQuerysetMixin):
+    """
+    Looks up a single object of the logged-in user, in the same query as the scoping.
+
+    Other owners' objects are not found (404). The ownership check that
+    follows compares ids only, so it costs no query either.
+    """
+    permission_denied_message = 'You do not have permission to access this object.'
+
+    def get_object(self, queryset=None):
+        obj = super().get_object(queryset)
+        if obj.owner_id != self.request.user.pk:
+            raise PermissionDenied(self.permission_denied_message)
+        return obj
+
+
+class OwnerFormMixin:
+    """
+    Builds model forms for the logged-in user.
+
+    New instances are given their owner before validation, so unique
+    constraints involving the owner are validated with the form. Forms
+    whose choices depend on the user take it as `user` when
+    `form_takes_user` is set.
+    """
+    form_takes_user = False
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        if kwargs.get('instance') is None and getattr(self, 'model', None) is not None:
+            kwargs['instance'] = self.model(owner=self.request.user)
+        if self.form_takes_user:
+            kwargs['user'] = self.request.user
+        return kwargs
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.messages.views import SuccessMessageMixin
+from ..page_title import page_title_data
+from ..sidebar import sidebar_data
+
+
+class PageContextMixin:
+    """
+    Adds the context every dashboard page renders: the title, the app name,
+    the active sidebar entry and the breadcrumb.
+
+    `sidebar` is the (menu item, sub item) pair of `sidebar_data`, and
+    `breadcrumb` the path before the page title, e.g. ['Home', 'Product Management'].
+    """
+    title = ''
+    sidebar = (1, 1)
+    breadcrumb = ['Home']
+
+    def get_title(self) -> str:
+        return self.title
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["title"] = self.get_title()
+        context["app_name"] = settings.APP_NAME
+        context["sidebar_data"] = sidebar_data(*self.sidebar)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=[*self.breadcrumb, context['title']])
+        return context
+
+
+class FormMessagesMixin(SuccessMessageMixin):
+    """
+    Flashes `success_message` once the form is saved, and each form error
+    with the label of its field when it is not.
+    """
+
+    def form_invalid(self, form):
+        response = super().form_invalid(form)
+        for field, errors in form.errors.items():
+            for error in errors:
+                if field == '__all__':
+                    messages.error(self.request, f'Error: {error}')
+                else:
+                    field_name = form.fields[field].label
+                    messages.error(self.request, f'Error in {field_name}: {error}')
+        return response
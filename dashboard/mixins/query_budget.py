@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudgetMixin:
+    """
+    Declares the most queries one request to the view may run.
+
+    The count covers the whole request as the view handles it, from the
+    session and user lookups to rendering the template, so a query added
+    per row or per related object shows up as soon as the page has rows.
+    Set it for the costliest request the view serves without files, with
+    cold caches (the session and the form choices read from the database).
+    Requests uploading files are held to `upload_query_budget` instead, as
+    storing an image adds the stored-file bookkeeping queries.
+    Checked when `QUERY_BUDGET_CHECKS` is on (by default with `DEBUG`, and
+    always in the tests); a request over budget raises `QueryBudgetExceeded`
+    listing its queries.
+    """
+    query_budget = None
+    upload_query_budget = None
+
+    def get_query_budget(self) -> int:
+        if self.upload_query_budget is not None and self.request.FILES:
+            return self.upload_query_budget
+        return self.query_budget
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.query_budget is None or not settings.QUERY_BUDGET_CHECKS:
+            return super().dispatch(request, *args, **kwargs)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = super().dispatch(request, *args, **kwargs)
+            # Template responses run their queries as they render
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+
+        budget = self.get_query_budget()
+        if len(queries) > budget:
+            statements = '\n'.join(f'{index}. {query["sql"]}' for index, query in enumerate(queries, start=1))
+            raise QueryBudgetExceeded(
+                f'{type(self).__name__} ran {len(queries)} queries, over its budget of {budget}:\n{statements}'
+            )
+        return response
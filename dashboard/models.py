@@ -1,16 +1,23 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Lower, Upper
 from django.contrib.auth.models import User
+from django.core.validators import MinValueValidator
+from django.contrib.postgres.indexes import BrinIndex, GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.forms import ValidationError
-from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFill
+from .fields import AsyncProcessedImageField, AtomicImageSaveMixin
 
 
 # Create your models here.
-class Profile(models.Model):
+class Profile(AtomicImageSaveMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     job_title = models.CharField(max_length=150)
 
-    profile_pic = ProcessedImageField(
+    profile_pic = AsyncProcessedImageField(
         upload_to='avater', 
         blank=True, 
         null=True, 
@@ -35,12 +42,12 @@ class Profile(models.Model):
         return f'{self.user.username} Profile'
     
 
-class Category(models.Model):
+class Category(AtomicImageSaveMixin, models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
 
     name = models.CharField(max_length=150)
 
-    image = ProcessedImageField(
+    image = AsyncProcessedImageField(
         upload_to='categories',
         processors=[ResizeToFill(600, 600)],
         format='JPEG',
@@ -54,15 +61,21 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     last_update = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Serves the owner-scoped keyset pagination of the list views
+            models.Index(fields=['owner', 'name', 'id'], name='category_owner_name_id_idx'),
+        ]
+
     def __str__(self) -> str:
         return self.name
     
 
-class SubCategory(models.Model):
+class SubCategory(AtomicImageSaveMixin, models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=150)
 
-    image = ProcessedImageField(
+    image = AsyncProcessedImageField(
         upload_to='sub-categories',
         processors=[ResizeToFill(600, 600)],
         format='JPEG',
@@ -82,15 +95,27 @@ class SubCategory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     last_update = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Serves the owner-scoped keyset pagination of the list views
+            models.Index(fields=['owner', 'name', 'id'], name='subcategory_owner_name_id_idx'),
+
+            # Serves the prefix lookups of the product form's sub-category selector
+            models.Index(
+                F('owner'), F('category'), OpClass(Upper('name'), name='text_pattern_ops'),
+                name='subcategory_name_prefix_idx',
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
 
-class Product(models.Model):
+class Product(AtomicImageSaveMixin, models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     
     name = models.CharField(max_length=150)
-    image = ProcessedImageField(
+    image = AsyncProcessedImageField(
         upload_to='products',
         processors=[ResizeToFill(600, 600)],
         format='JPEG',
@@ -114,16 +139,360 @@ class Product(models.Model):
     )
 
     description = models.TextField(max_length=250)
+    price = models.DecimalField(max_digits=12, decimal_places=2, default=0, validators=[MinValueValidator(0)])
+
     created_at = models.DateTimeField(auto_now_add=True)
     last_update = models.DateTimeField(auto_now=True)
 
+    # Weighted name/category/description document, maintained by dashboard.signals
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Serves the owner-scoped keyset pagination of the list views
+            models.Index(fields=['owner', 'name', 'id'], name='product_owner_name_id_idx'),
+
+            # Serve the full-text and typo-tolerant product search
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='product_name_trgm_idx'),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
 
+class Order(models.Model):
+    """
+    A sale rung up at the POS, written with its lines by dashboard.checkout.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    customer = models.ForeignKey('Customer', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    # Totals of the lines, computed once at checkout
+    items = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    # Paid at checkout; the rest is added to the customer's dues
+    paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Serves the owner-scoped, newest first keyset pagination of the orders list
+            models.Index(fields=['owner', '-created_at', '-id'], name='order_owner_created_id_idx'),
+
+            # Orders are appended in time order, so a tiny block-range index serves time range scans
+            BrinIndex(fields=['created_at'], name='order_created_at_brin'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Order #{self.pk}'
+
+
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+
+    # The product as sold: the name and price stay on the line if the product changes or goes
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    name = models.CharField(max_length=150)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2)
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def __str__(self) -> str:
+        return f'{self.quantity} x {self.name}'
+
+
+class StockMovement(models.Model):
+    """
+    An entry of the append-only inventory ledger: units of a product going in
+    (positive quantity) or out (negative). Stock levels are read through
+    dashboard.inventory, from the latest StockSnapshot plus the later movements.
+    """
+
+    class Kind(models.TextChoices):
+        PURCHASE = 'purchase', 'Purchase'
+        SALE = 'sale', 'Sale'
+        ADJUSTMENT = 'adjustment', 'Adjustment'
+        RETURN = 'return', 'Return'
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    quantity = models.IntegerField()
+
+    # The sale or the delivery a movement comes from, if any
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True)
+    purchase_order = models.ForeignKey('PurchaseOrder', on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=250, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Serve the movements after a product's snapshot, and the newest first ledger pages
+            models.Index(fields=['product', 'id'], name='stockmovement_product_id_idx'),
+            models.Index(fields=['owner', '-id'], name='stockmovement_owner_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Stock movements are append-only, record a new movement instead.')
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return f'{self.get_kind_display()} {self.quantity:+d} {self.product_id}'
+
+
+class StockSnapshot(models.Model):
+    """
+    A product's stock level once every movement up to `last_movement_id` is counted,
+    written periodically by dashboard.inventory.take_snapshots.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Serves the latest snapshot of a product, as of now or of a report date
+            models.Index(fields=['product', '-created_at', '-id'], name='stocksnapshot_product_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.product_id} {self.quantity} @ {self.last_movement_id}'
+
+
+class SalesBucket(models.Model):
+    """
+    Sales of one product in one local hour or day, pre-aggregated from order
+    lines by dashboard.sales_report so reports never scan the order history.
+
+    Buckets hold no category: reports join the product's current one, so a
+    product moved to another category takes its past sales along, and the
+    sales of a deleted product fall under no category.
+    """
+
+    class Span(models.TextChoices):
+        HOUR = 'hour', 'Hour'
+        DAY = 'day', 'Day'
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    span = models.CharField(max_length=4, choices=Span.choices)
+    start = models.DateTimeField()
+
+    # Kept as a plain id: buckets outlive the products they count
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    lines = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves the (owner, span, start range) reads of the reports
+            models.UniqueConstraint(
+                fields=['owner', 'span', 'start', 'product'], name='salesbucket_owner_span_start_product_uniq'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.owner} {self.span} {self.start} {self.product_id}'
+
+
+class AggregationWatermark(models.Model):
+    """
+    The last source row id an incremental aggregation has counted, by name.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    last_update = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f'{self.name} @ {self.last_id}'
+
+
+class DailySalesRollup(models.Model):
+    """
+    Per-owner sales totals of one day, maintained incrementally by dashboard.rollups
+    as sales are written, so dashboard KPIs never scan the order history.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+
+    orders = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    new_customers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves the (owner, date range) reads of the dashboard
+            models.UniqueConstraint(fields=['owner', 'date'], name='dailysalesrollup_owner_date_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.owner} {self.date}'
+
+
 class Customer(models.Model):
-    pass
+    """
+    A buyer of an owner, looked up at the POS by phone, email or name.
+
+    `dues` (owed), `orders` and `total_spent` are running balances, updated in
+    the same transaction as each sale (dashboard.checkout) and payment
+    (dashboard.dues), so the reports never aggregate the order history.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    name = models.CharField(max_length=150)
+
+    # Stored normalized by dashboard.dues.normalize_phone; blank when unknown
+    phone = models.CharField(max_length=20, blank=True, default='')
+    email = models.EmailField(blank=True, default='')
+
+    dues = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    orders = models.PositiveIntegerField(default=0, editable=False)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_update = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Exact POS lookups; blank values are not unique
+            models.UniqueConstraint(
+                F('owner'), F('phone'), name='customer_owner_phone_uniq', condition=~Q(phone=''),
+                violation_error_message='A customer with this phone already exists.',
+            ),
+            models.UniqueConstraint(
+                F('owner'), Lower('email'), name='customer_owner_email_uniq', condition=~Q(email=''),
+                violation_error_message='A customer with this email already exists.',
+            ),
+        ]
+        indexes = [
+            # Serves the owner-scoped keyset pagination of the list views
+            models.Index(fields=['owner', 'name', 'id'], name='customer_owner_name_id_idx'),
+
+            # Serve the partial phone and typo-tolerant name lookups
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='customer_name_trgm_idx'),
+            GinIndex(fields=['phone'], opclasses=['gin_trgm_ops'], name='customer_phone_trgm_idx'),
+
+            # The Dues Report: customers owing money, largest dues first, in one index scan
+            models.Index(
+                F('owner'), F('dues').desc(), F('id').desc(), name='customer_owner_dues_idx', condition=Q(dues__gt=0),
+            ),
 
+            # The Customer Report: best customers first
+            models.Index(fields=['owner', '-total_spent', '-id'], name='customer_owner_spent_idx'),
+        ]
 
-class Suplier(models.Model):
-    pass
+    def __str__(self) -> str:
+        return self.name
+
+
+class Payment(models.Model):
+    """
+    A payment towards a customer's dues, recorded by dashboard.dues.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(max_digits=14, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    note = models.CharField(max_length=250, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f'{self.customer} {self.amount}'
+
+
+class Supplier(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    name = models.CharField(max_length=150)
+    contact_name = models.CharField(max_length=150, blank=True, default='')
+
+    # Stored normalized by dashboard.dues.normalize_phone
+    phone = models.CharField(max_length=20, blank=True, default='')
+    email = models.EmailField(blank=True, default='')
+    address = models.CharField(max_length=250, blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_update = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Serves the owner-scoped keyset pagination of the list views
+            models.Index(fields=['owner', 'name', 'id'], name='supplier_owner_name_id_idx'),
+
+            # Serve the partial phone and typo-tolerant name searches
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='supplier_name_trgm_idx'),
+            GinIndex(fields=['phone'], opclasses=['gin_trgm_ops'], name='supplier_phone_trgm_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class PurchaseOrder(models.Model):
+    """
+    An order placed with a supplier. Receiving it (dashboard.purchasing) appends
+    one purchase movement per product to the inventory ledger.
+    """
+
+    class Status(models.TextChoices):
+        OPEN = 'open', 'Open'
+        RECEIVED = 'received', 'Received'
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Kept when the supplier is deleted, as part of the stock history
+    supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True)
+    reference = models.CharField(max_length=100, blank=True, default='')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+
+    # Totals of the lines, computed when the order is written
+    lines_count = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    received_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves the owner's purchase orders, newest first
+            models.Index(fields=['owner', '-created_at', '-id'], name='po_owner_created_id_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Purchase Order #{self.pk}'
+
+
+class PurchaseOrderLine(models.Model):
+    purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='lines')
+
+    # The product as ordered: the name and cost stay on the line if the product changes or goes
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    name = models.CharField(max_length=150)
+    quantity = models.PositiveIntegerField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=2)
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def __str__(self) -> str:
+        return f'{self.quantity} x {self.name}'
+
+
+class StoredFile(models.Model):
+    """
+    A file of the content-addressed media storage (dashboard.storage) and the
+    number of field values referencing it.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+
+    # Hash of the upload and processing a processed image was made from, blank otherwise
+    source_key = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,204 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # Times keep their microseconds, which DjangoJSONEncoder drops: the cursor must equal the row's value
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values: tuple) -> str:
+    """
+    Encodes the keyset values of a row into an opaque, URL-safe cursor.
+
+    Dates and times are written in ISO 8601 and decimals as strings, to be
+    read back by `cursor_values`.
+
+    Parameters:
+    - values (tuple): The values of the ordering fields for a row.
+
+    Returns:
+    str: The encoded cursor.
+    """
+    raw = json.dumps(list(values), separators=(',', ':'), cls=CursorEncoder).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, length: int) -> tuple:
+    """
+    Decodes a cursor produced by `encode_cursor`.
+
+    Parameters:
+    - cursor (str): The encoded cursor.
+    - length (int): The expected number of keyset values.
+
+    Returns:
+    tuple: The keyset values.
+
+    Raises:
+    ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError('Invalid cursor.') from error
+
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('Invalid cursor.')
+    if any(isinstance(value, (list, dict)) for value in values):
+        raise ValueError('Invalid cursor.')
+    return tuple(values)
+
+
+def cursor_values(queryset, fields: list, values: tuple) -> tuple:
+    """
+    Converts decoded cursor values to the types of the ordering fields, so
+    that e.g. a datetime or decimal compares as one and not as a string.
+
+    Parameters:
+    - queryset (QuerySet): The paginated queryset, annotated with any ordering annotation.
+    - fields (list): The ordering fields, with a leading '-' for descending ones.
+    - values (tuple): The values decoded by `decode_cursor`.
+
+    Returns:
+    tuple: The typed values.
+
+    Raises:
+    ValidationError: If a value does not fit its field.
+    """
+    typed = []
+    for field, value in zip(fields, values):
+        name = field.lstrip('-')
+        annotation = queryset.query.annotations.get(name)
+        model_field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+        typed.append(model_field.to_python(value))
+    return tuple(typed)
+
+
+def keyset_filter(fields: list, values: tuple, reverse: bool = False) -> Q:
+    """
+    Builds the row comparison `(f1, f2, ...) > (v1, v2, ...)` as a Q object.
+
+    Parameters:
+    - fields (list): The ordering fields, most significant first. A leading '-' marks a
+      descending field.
+    - values (tuple): The keyset values of the cursor row.
+    - reverse (bool): Select the rows before the cursor instead of after it. Default is False.
+
+    Returns:
+    Q: Filter selecting the rows strictly after (or before) the cursor row.
+    """
+    condition = Q()
+    for index, field in enumerate(fields):
+        descending = field.startswith('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+        equal = {name.lstrip('-'): values[i] for i, name in enumerate(fields[:index])}
+        condition |= Q(**equal, **{f'{field.lstrip("-")}__{lookup}': values[index]})
+    return condition
+
+
+def reverse_ordering(fields: list) -> list:
+    """
+    Flips the direction of every ordering field.
+
+    Parameters:
+    - fields (list): Ordering fields, with a leading '-' for descending ones.
+
+    Returns:
+    list: The same fields in the opposite direction.
+    """
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in fields]
+
+
+class KeysetPage:
+    """
+    A single page of rows produced by `KeysetPaginationMixin`.
+
+    Exposes the subset of the `django.core.paginator.Page` interface the
+    templates need, plus the cursors for the neighbouring pages.
+    """
+
+    def __init__(self, object_list: list, next_cursor: str = None, previous_cursor: str = None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginationMixin:
+    """
+    Replaces the offset pagination of `ListView` with cursor (keyset) pagination.
+
+    Rows are ordered by `ordering`, which must end with a unique field
+    (usually `id`). Each page is read with a range condition on those
+    fields, so fetching page N costs the same index scan as page 1.
+    """
+
+    after_kwarg = 'after'
+    before_kwarg = 'before'
+
+    def get_keyset_fields(self) -> list:
+        return list(self.get_ordering())
+
+    def paginate_queryset(self, queryset, page_size):
+        fields = self.get_keyset_fields()
+        after = self.request.GET.get(self.after_kwarg)
+        before = self.request.GET.get(self.before_kwarg)
+
+        try:
+            if before:
+                cursor = cursor_values(queryset, fields, decode_cursor(before, len(fields)))
+                queryset = queryset.filter(keyset_filter(fields, cursor, reverse=True))
+                queryset = queryset.order_by(*reverse_ordering(fields))
+            elif after:
+                cursor = cursor_values(queryset, fields, decode_cursor(after, len(fields)))
+                queryset = queryset.filter(keyset_filter(fields, cursor)).order_by(*fields)
+            else:
+                queryset = queryset.order_by(*fields)
+        except (ValueError, ValidationError):
+            # Malformed, or values that do not fit the ordering fields
+            raise Http404('Invalid page cursor.')
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if before:
+            rows.reverse()
+
+        def cursor_of(obj):
+            return encode_cursor(tuple(getattr(obj, field.lstrip('-')) for field in fields))
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or before:
+                next_cursor = cursor_of(rows[-1])
+            if (has_more and before) or after:
+                previous_cursor = cursor_of(rows[0])
+
+        page = KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+        return (None, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,220 @@
+import contextlib
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.dispatch import Signal
+
+
+logger = logging.getLogger(__name__)
+
+# The profile of the request being handled, None outside a profiled request
+_current = contextvars.ContextVar('request_profile', default=None)
+
+# The metrics of the `timed` blocks being run, so nested blocks count once
+_active = contextvars.ContextVar('timed_metrics', default=frozenset())
+
+# Held by the request being run under cProfile: a process runs one profiler at a time
+# (Python 3.12 refuses to enable a second), so sampled requests overlapping it are not profiled
+_profiler_lock = threading.Lock()
+
+# Sent with `metric` and `duration_ms` after each `timed` block, in or out of a request
+timing_measured = Signal()
+
+# Server-Timing metric names and descriptions
+SERVER_TIMING = {
+    'db': 'Database',
+    'tpl': 'Templates',
+    'img': 'Image processing',
+}
+
+
+class RequestProfile:
+    """
+    Durations, in milliseconds, accumulated while a request is handled.
+    """
+
+    def __init__(self):
+        self.durations = dict.fromkeys(SERVER_TIMING, 0.0)
+        self.queries = 0
+
+    def add(self, metric: str, duration_ms: float):
+        self.durations[metric] += duration_ms
+
+
+@contextlib.contextmanager
+def timed(metric: str):
+    """
+    Adds the time spent in the block to a metric of the current request's
+    profile, and sends it with `timing_measured`.
+
+    Costs two context variable lookups when there is neither a profiled
+    request nor a receiver. Nested blocks of the same metric count once,
+    so e.g. renditions generated while an upload is processed are not
+    counted twice.
+
+    Parameters:
+    - metric (str): A key of `SERVER_TIMING`.
+    """
+    profile = _current.get()
+    active = _active.get()
+    if metric in active or (profile is None and not timing_measured.has_listeners()):
+        yield
+        return
+
+    token = _active.set(active | {metric})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        _active.reset(token)
+        if profile is not None:
+            profile.add(metric, duration_ms)
+        timing_measured.send(sender=None, metric=metric, duration_ms=duration_ms)
+
+
+class QueryTimer:
+    """
+    A database execute wrapper counting the queries of a profile and timing them.
+    """
+
+    def __init__(self, profile: RequestProfile):
+        self.profile = profile
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.profile.add('db', (time.perf_counter() - start) * 1000)
+            self.profile.queries += 1
+
+
+@contextlib.contextmanager
+def profile_request():
+    """
+    Collects the profile of the request being handled.
+
+    Nested uses, e.g. by two middleware, share the outermost profile.
+
+    Yields:
+    RequestProfile: The profile, complete when the block exits.
+    """
+    profile = _current.get()
+    if profile is not None:
+        yield profile
+        return
+
+    profile = RequestProfile()
+    token = _current.set(profile)
+    try:
+        with contextlib.ExitStack() as stack:
+            # Wrappers stay on the connection objects, so connections opened by the request are timed too
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(QueryTimer(profile)))
+            yield profile
+    finally:
+        _current.reset(token)
+
+
+class ProfilingMiddleware:
+    """
+    Measures where each request spends its time: database queries, template
+    rendering and image processing.
+
+    The durations are sent in a `Server-Timing` header, shown by the browser's
+    developer tools, and logged as one JSON line per request by the
+    `dashboard.profiling` logger. A `PROFILING_SAMPLE_RATE` fraction of the
+    requests also runs under cProfile, dumped to `PROFILING_DIR` for
+    `python -m pstats` or snakeviz, one request at a time: a sampled request
+    overlapping a profiled one, or started while another profiler is active
+    in the process, is only timed.
+
+    Place it first in `MIDDLEWARE` so the other middleware is measured too.
+    With `PROFILING` off, Django drops it at startup and requests do not go
+    through it at all.
+
+    Template time covers TemplateResponses, i.e. the class-based views.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.directory = settings.PROFILING_DIR
+
+    def __call__(self, request):
+        if self.sample_rate and random.random() < self.sample_rate and _profiler_lock.acquire(blocking=False):
+            try:
+                return self.handle(request, self.start_profiler())
+            finally:
+                _profiler_lock.release()
+        return self.handle(request, None)
+
+    def start_profiler(self) -> cProfile.Profile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active, e.g. a debugger's
+            return None
+        return profiler
+
+    def handle(self, request, profiler: cProfile.Profile):
+        start = time.perf_counter()
+        with profile_request() as profile:
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        total_ms = (time.perf_counter() - start) * 1000
+
+        view = getattr(request.resolver_match, 'view_name', None) or '-'
+        response['Server-Timing'] = self.server_timing(profile, total_ms)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(profile.durations['db'], 2),
+            'queries': profile.queries,
+            'template_ms': round(profile.durations['tpl'], 2),
+            'image_ms': round(profile.durations['img'], 2),
+        }))
+        if profiler is not None:
+            self.dump(profiler, view, total_ms)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called just before the response renders, finished by the post-render callback
+        profile = _current.get()
+        if profile is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda _: profile.add('tpl', (time.perf_counter() - start) * 1000))
+        return response
+
+    def server_timing(self, profile: RequestProfile, total_ms: float) -> str:
+        descriptions = {**SERVER_TIMING, 'db': f'{SERVER_TIMING["db"]} ({profile.queries} queries)'}
+        metrics = [
+            f'{name};dur={duration:.1f};desc="{descriptions[name]}"'
+            for name, duration in profile.durations.items() if duration or name == 'db'
+        ]
+        return ', '.join([*metrics, f'total;dur={total_ms:.1f}'])
+
+    def dump(self, profiler: cProfile.Profile, view: str, total_ms: float):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{view.replace(":", "-")}-{total_ms:.0f}ms-{uuid.uuid4().hex[:8]}.prof'
+        profiler.dump_stats(os.path.join(self.directory, name))
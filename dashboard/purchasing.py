@@ -0,0 +1,165 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Product, PurchaseOrder, PurchaseOrderLine, StockMovement
+
+
+# Largest quantity of one product accepted on a line
+MAX_QUANTITY = 1000000
+
+# Lines inserted per statement
+BATCH_SIZE = 1000
+
+RECEIVE_SQL = """
+    INSERT INTO {movement} (owner_id, product_id, kind, quantity, purchase_order_id, note, created_at)
+    SELECT %(owner)s, l.product_id, %(kind)s, SUM(l.quantity), l.purchase_order_id, %(note)s, %(now)s
+    FROM {line} l
+    WHERE l.purchase_order_id = %(purchase_order)s AND l.product_id IS NOT NULL
+    GROUP BY l.product_id, l.purchase_order_id
+    ORDER BY l.product_id
+"""
+
+
+def parse_purchase_lines(owner, rows) -> list:
+    """
+    Validates the lines of a purchase order file.
+
+    Products are named by id or by name in a `product` column and resolved
+    in two queries, whatever the number of lines. A name several of the
+    owner's products share is an error, the line must give the id.
+
+    Parameters:
+    - owner (User): The buyer; every product must belong to them.
+    - rows (Iterable): (line number, row dict) pairs from `importer.read_rows`, with
+      `product`, `quantity` and `unit_cost` keys.
+
+    Returns:
+    list: Unsaved PurchaseOrderLine objects.
+
+    Raises:
+    ValidationError: With one message per invalid line.
+    """
+    parsed = []
+    errors = []
+    for line_number, row in rows:
+        product = str(row.get('product') or '').strip()
+        try:
+            quantity = int(row.get('quantity') or 0)
+            unit_cost = Decimal(str(row.get('unit_cost') or 0)).quantize(Decimal('0.01'))
+        except (TypeError, ValueError, InvalidOperation):
+            errors.append(f'Line {line_number}: the quantity and unit cost must be numbers.')
+            continue
+
+        if not product:
+            errors.append(f'Line {line_number}: the product is missing.')
+        elif quantity <= 0 or quantity > MAX_QUANTITY:
+            errors.append(f'Line {line_number}: the quantity must be between 1 and {MAX_QUANTITY}.')
+        elif unit_cost < 0:
+            errors.append(f'Line {line_number}: the unit cost cannot be negative.')
+        else:
+            parsed.append((line_number, product, quantity, unit_cost))
+
+    products = Product.objects.filter(owner=owner)
+    ids = {int(product) for _, product, _, _ in parsed if product.isdigit()}
+    by_id = {pk: (pk, name) for pk, name in products.filter(pk__in=ids).values_list('pk', 'name')}
+    names = {product for _, product, _, _ in parsed if not product.isdigit()}
+    by_name = {}
+    for pk, name in products.filter(name__in=names).values_list('pk', 'name'):
+        by_name.setdefault(name, []).append((pk, name))
+
+    lines = []
+    for line_number, product, quantity, unit_cost in parsed:
+        if product.isdigit():
+            matches = [by_id[int(product)]] if int(product) in by_id else []
+        else:
+            matches = by_name.get(product, [])
+        if not matches:
+            errors.append(f'Line {line_number}: unknown product {product!r}.')
+            continue
+        if len(matches) > 1:
+            errors.append(f'Line {line_number}: several products are named {product!r}, give the product id to choose one.')
+            continue
+        product_id, name = matches[0]
+        lines.append(PurchaseOrderLine(
+            product_id=product_id, name=name, quantity=quantity, unit_cost=unit_cost, total=unit_cost * quantity
+        ))
+
+    if errors:
+        raise ValidationError(errors)
+    if not lines:
+        raise ValidationError('The purchase order has no lines.')
+    return lines
+
+
+def create_purchase_order(owner, supplier, lines: list, reference: str = '') -> PurchaseOrder:
+    """
+    Writes a purchase order and its lines, inserted in batches of `BATCH_SIZE`.
+
+    Parameters:
+    - owner (User): The buyer.
+    - supplier (Supplier): The supplier, one of the owner's.
+    - lines (list): Unsaved lines, from `parse_purchase_lines`.
+    - reference (str): The supplier's reference, e.g. an invoice number. Optional.
+
+    Returns:
+    PurchaseOrder: The saved order.
+    """
+    with transaction.atomic():
+        purchase_order = PurchaseOrder.objects.create(
+            owner=owner, supplier=supplier, reference=reference, lines_count=len(lines),
+            items=sum(line.quantity for line in lines), total=sum(line.total for line in lines),
+        )
+        for line in lines:
+            line.purchase_order = purchase_order
+        PurchaseOrderLine.objects.bulk_create(lines, batch_size=BATCH_SIZE)
+    return purchase_order
+
+
+def receive_purchase_order(purchase_order: PurchaseOrder) -> int:
+    """
+    Receives a delivery: appends a purchase movement per product to the inventory ledger.
+
+    Whatever the number of lines, this is two statements in one transaction:
+    a conditional `UPDATE` marking the order received, which also keeps a
+    concurrent or repeated receive from counting the delivery twice, and a
+    single `INSERT ... SELECT` writing the movements from the stored lines.
+    Stock levels follow from the ledger (dashboard.inventory), so no product
+    row is updated or locked.
+
+    Parameters:
+    - purchase_order (PurchaseOrder): The open order to receive.
+
+    Returns:
+    int: The number of stock movements written.
+
+    Raises:
+    ValidationError: If the order was already received.
+    """
+    now = timezone.now()
+    sql = RECEIVE_SQL.format(
+        movement=connection.ops.quote_name(StockMovement._meta.db_table),
+        line=connection.ops.quote_name(PurchaseOrderLine._meta.db_table),
+    )
+
+    with transaction.atomic():
+        received = PurchaseOrder.objects.filter(pk=purchase_order.pk, status=PurchaseOrder.Status.OPEN).update(
+            status=PurchaseOrder.Status.RECEIVED, received_at=now,
+        )
+        if not received:
+            raise ValidationError(f'{purchase_order} was already received.')
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'owner': purchase_order.owner_id,
+                'kind': StockMovement.Kind.PURCHASE,
+                'note': f'{purchase_order}'[:250],
+                'now': now,
+                'purchase_order': purchase_order.pk,
+            })
+            written = cursor.rowcount
+
+    purchase_order.status = PurchaseOrder.Status.RECEIVED
+    purchase_order.received_at = now
+    return written
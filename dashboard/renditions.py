@@ -0,0 +1,89 @@
+from imagekit import ImageSpec, register
+from imagekit.cachefiles import ImageCacheFile
+from imagekit.processors import ResizeToFill
+from .profiling import timed
+
+
+# Square widths derived from every stored image
+RENDITION_WIDTHS = (64, 160, 600)
+
+# Output formats, preferred first, with their MIME types
+RENDITION_FORMATS = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+class Pregenerated:
+    """
+    Cache file strategy of renditions generated when their image is stored.
+
+    Reading a rendition never generates it, so a page render never resizes
+    images; whether it exists is checked through the cache file backend.
+    """
+
+    def should_verify_existence(self, file):
+        return True
+
+
+class Rendition(ImageSpec):
+    """
+    A square, resized copy of a stored image in a given format.
+
+    ImageKit names the cache file from the source name and a hash of the
+    processors, format and options, so each rendition has a deterministic
+    path under `CACHE/images/`. Renditions are generated by
+    `generate_renditions` once the image is processed, in the request or in
+    the worker pool, and by the `generate_renditions` command for older images.
+    """
+    options = {'quality': 80}
+    cachefile_strategy = Pregenerated()
+
+    def __init__(self, source, width: int, format: str):
+        self.processors = [ResizeToFill(width, width)]
+        self.format = format
+        super().__init__(source=source)
+
+    def generate(self):
+        with timed('img'):
+            return super().generate()
+
+
+register.generator('dashboard:rendition', Rendition)
+
+
+def rendition(image, width: int, format: str) -> ImageCacheFile:
+    """
+    Parameters:
+    - image (FieldFile): The stored source image.
+    - width (int): The rendition width (and height) in pixels.
+    - format (str): A key of `RENDITION_FORMATS`.
+
+    Returns:
+    ImageCacheFile: The rendition, which may not have been generated yet.
+    """
+    return ImageCacheFile(Rendition(source=image, width=width, format=format))
+
+
+def has_renditions(image) -> bool:
+    """
+    Parameters:
+    - image (FieldFile): The stored source image.
+
+    Returns:
+    bool: Whether the renditions of the image were generated.
+    """
+    # `generate_renditions` writes this one last
+    return bool(rendition(image, RENDITION_WIDTHS[-1], list(RENDITION_FORMATS)[-1]))
+
+
+def generate_renditions(image):
+    """
+    Eagerly generates every rendition of an image, e.g. right after it is processed.
+
+    Parameters:
+    - image (FieldFile): The stored source image.
+    """
+    for format in RENDITION_FORMATS:
+        for width in RENDITION_WIDTHS:
+            rendition(image, width, format).generate()
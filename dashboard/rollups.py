@@ -0,0 +1,150 @@
+import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from .models import DailySalesRollup
+
+
+# Dashboard KPI periods, by filter value
+PERIODS = {
+    'today': 'Today',
+    'month': 'This Month',
+    'year': 'This Year',
+}
+
+# Rolled-up values shown as KPI cards, with their default period
+KPI_DEFAULT_PERIODS = {
+    'sales': 'today',
+    'revenue': 'month',
+    'customers': 'year',
+}
+
+# Rollup column behind each KPI
+KPI_COLUMNS = {
+    'sales': 'orders',
+    'revenue': 'revenue',
+    'customers': 'new_customers',
+}
+
+
+def increment(owner_id: int, date: datetime.date, **amounts):
+    """
+    Adds amounts to an owner's rollup row of a day, creating the row if needed.
+
+    The update is a single `UPDATE ... SET x = x + n` on the existing row, so
+    concurrent writers never lose increments. Call it last in the writing
+    transaction, the row stays locked until the transaction commits.
+
+    Parameters:
+    - owner_id (int): The owner of the sale.
+    - date (date): The local date of the sale.
+    - amounts: Increments by rollup column, e.g. orders=1, revenue=Decimal('9.50').
+    """
+    rows = DailySalesRollup.objects.filter(owner_id=owner_id, date=date)
+    changes = {column: F(column) + amount for column, amount in amounts.items()}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailySalesRollup.objects.create(owner_id=owner_id, date=date, **amounts)
+    except IntegrityError:
+        # Created concurrently since the update
+        rows.update(**changes)
+
+
+def record_sale(owner_id: int, when: datetime.datetime, revenue: Decimal, items: int, orders: int = 1):
+    """
+    Parameters:
+    - owner_id (int): The owner of the sale.
+    - when (datetime): When the sale happened.
+    - revenue (Decimal): The sale total; negative for refunds.
+    - items (int): The number of items sold.
+    - orders (int): The number of orders, 1 unless recording a batch.
+    """
+    increment(owner_id, timezone.localdate(when), orders=orders, items=items, revenue=revenue)
+
+
+def record_customer(owner_id: int, when: datetime.datetime):
+    increment(owner_id, timezone.localdate(when), new_customers=1)
+
+
+def period_ranges(period: str, today: datetime.date) -> tuple:
+    """
+    Computes the dates of a KPI period and of the same span one period earlier.
+
+    The previous range covers as many days as have elapsed in the current
+    one, so a half-elapsed month is compared with the first half of the last.
+
+    Parameters:
+    - period (str): A key of `PERIODS`.
+    - today (date): The current local date.
+
+    Returns:
+    tuple: ((start, end), (previous start, previous end)), inclusive dates.
+    """
+    if period == 'today':
+        yesterday = today - datetime.timedelta(days=1)
+        return (today, today), (yesterday, yesterday)
+
+    if period == 'month':
+        start = today.replace(day=1)
+        previous_start = (start - datetime.timedelta(days=1)).replace(day=1)
+    else:
+        start = today.replace(month=1, day=1)
+        previous_start = start.replace(year=start.year - 1)
+
+    # Same number of elapsed days, never reaching into the current period
+    previous_end = min(previous_start + (today - start), start - datetime.timedelta(days=1))
+    return (start, today), (previous_start, previous_end)
+
+
+def percent_change(current, previous):
+    if not previous:
+        return None
+    return round((current - previous) / previous * 100)
+
+
+def get_kpis(owner, selection: dict, today: datetime.date = None) -> dict:
+    """
+    Reads the dashboard KPI cards from the owner's daily rollups.
+
+    All cards, for their selected period and the previous one, are computed
+    by a single query over at most two years of daily rows, however long
+    the sales history is.
+
+    Parameters:
+    - owner (User): The dashboard owner.
+    - selection (dict): The selected period of each KPI, e.g. from the query string.
+    - today (date): The current local date, defaults to today.
+
+    Returns:
+    dict: By KPI, a dict with the period key and label, value and percent change.
+    """
+    today = today or timezone.localdate()
+    periods = {
+        kpi: selection.get(kpi) if selection.get(kpi) in PERIODS else default
+        for kpi, default in KPI_DEFAULT_PERIODS.items()
+    }
+
+    aggregates = {}
+    earliest = today
+    for kpi, period in periods.items():
+        column = KPI_COLUMNS[kpi]
+        current, previous = period_ranges(period, today)
+        earliest = min(earliest, previous[0])
+        aggregates[f'{kpi}_current'] = Sum(column, filter=Q(date__range=current), default=0)
+        aggregates[f'{kpi}_previous'] = Sum(column, filter=Q(date__range=previous), default=0)
+
+    totals = DailySalesRollup.objects.filter(owner=owner, date__gte=earliest, date__lte=today).aggregate(**aggregates)
+
+    return {
+        kpi: {
+            'period': period,
+            'label': PERIODS[period],
+            'value': totals[f'{kpi}_current'],
+            'change': percent_change(totals[f'{kpi}_current'], totals[f'{kpi}_previous']),
+        }
+        for kpi, period in periods.items()
+    }
@@ -0,0 +1,241 @@
+import contextlib
+import datetime
+import heapq
+import itertools
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+from .models import AggregationWatermark, Order, OrderLine, SalesBucket
+from .watermarks import committed_watermark
+
+
+# Report granularities, by truncation kind
+GRANULARITIES = {
+    'hour': 'Hour',
+    'day': 'Day',
+    'week': 'Week',
+    'month': 'Month',
+}
+
+# Report breakdowns, with the bucket and order line fields of their key and name. Both
+# read the product's current category, so moving a product moves its past sales too
+BREAKDOWNS = {
+    'total': ('Total', None, None),
+    'category': (
+        'Category', ('product__category', 'product__category__name'), ('product__category', 'product__category__name'),
+    ),
+    'product': ('Product', ('product', 'product__name'), ('product', 'product__name')),
+}
+
+# Bucket span each granularity is read from; a year of daily buckets is small
+GRANULARITY_SPANS = {
+    'hour': SalesBucket.Span.HOUR,
+    'day': SalesBucket.Span.DAY,
+    'week': SalesBucket.Span.DAY,
+    'month': SalesBucket.Span.DAY,
+}
+
+WATERMARK_NAME = 'sales_buckets'
+
+AGGREGATE_SQL = """
+    INSERT INTO {bucket} (owner_id, span, start, product_id, quantity, revenue, lines)
+    SELECT o.owner_id, s.span, date_trunc(s.span, o.created_at AT TIME ZONE %(tz)s) AT TIME ZONE %(tz)s,
+           l.product_id, SUM(l.quantity), SUM(l.total), COUNT(*)
+    FROM {line} l
+    JOIN {order} o ON o.id = l.order_id
+    CROSS JOIN (VALUES ('hour'), ('day')) s (span)
+    WHERE o.id > %(after)s AND o.id <= %(upper)s
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (owner_id, span, start, product_id) DO UPDATE SET
+        quantity = {bucket}.quantity + EXCLUDED.quantity,
+        revenue = {bucket}.revenue + EXCLUDED.revenue,
+        lines = {bucket}.lines + EXCLUDED.lines
+"""
+
+
+def aggregate_sales(batch_size: int = 10000) -> int:
+    """
+    Adds the orders written since the last run to the hourly and daily sales buckets.
+
+    Buckets are cut along local time (`TIME_ZONE`), so days and the report
+    date ranges line up. Each batch of orders is folded into both spans by a single
+    `INSERT ... SELECT ... ON CONFLICT DO UPDATE`, in the same transaction
+    as the watermark that records it, so an interrupted run resumes where
+    it stopped without counting an order twice. Checkouts never touch the
+    buckets, and the reports add the few orders after the watermark on
+    the fly.
+
+    Parameters:
+    - batch_size (int): Orders folded per transaction. Default is 10000.
+
+    Returns:
+    int: The number of orders aggregated.
+    """
+    watermark = committed_watermark(Order)
+    tables = {
+        name: connection.ops.quote_name(model._meta.db_table)
+        for name, model in (('bucket', SalesBucket), ('line', OrderLine), ('order', Order))
+    }
+    sql = AGGREGATE_SQL.format(**tables)
+
+    aggregated = 0
+    while True:
+        with transaction.atomic():
+            # Serializes concurrent runs
+            state, _ = AggregationWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+            if state.last_id >= watermark:
+                return aggregated
+
+            upper = min(state.last_id + batch_size, watermark)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, {'tz': settings.TIME_ZONE, 'after': state.last_id, 'upper': upper})
+
+            aggregated += Order.objects.filter(id__gt=state.last_id, id__lte=upper).count()
+            state.last_id = upper
+            state.save(update_fields=['last_id', 'last_update'])
+
+
+def rebuild_sales_buckets(batch_size: int = 10000) -> int:
+    """
+    Recomputes every sales bucket from the order history.
+
+    Returns:
+    int: The number of orders aggregated.
+    """
+    with transaction.atomic():
+        AggregationWatermark.objects.select_for_update().filter(name=WATERMARK_NAME).update(last_id=0)
+        SalesBucket.objects.all().delete()
+    return aggregate_sales(batch_size=batch_size)
+
+
+def aggregated_up_to() -> int:
+    return AggregationWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_id', flat=True).first() or 0
+
+
+@contextlib.contextmanager
+def consistent_snapshot():
+    """
+    Runs the reads of a report in one REPEATABLE READ transaction.
+
+    The watermark, the buckets and the orders past the watermark are then
+    read from the same snapshot, so an aggregation run committing meanwhile
+    is neither missed nor counted twice. Inside an existing transaction,
+    the caller's isolation level applies.
+    """
+    if connection.in_atomic_block:
+        yield
+        return
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def report_range(start: datetime.date, end: datetime.date) -> tuple:
+    """
+    Returns:
+    tuple: The aware (start, end) datetimes covering the local dates, end excluded.
+    """
+    start = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
+    end = timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min))
+    return start, end
+
+
+def group_rows(queryset, time_field: str, granularity: str, breakdown_fields: tuple):
+    """
+    Groups bucket or order line rows into report rows.
+
+    Returns:
+    QuerySet: (period, key, name, quantity, revenue, lines) tuples, ordered by period and key.
+    """
+    queryset = queryset.annotate(period=Trunc(time_field, granularity, tzinfo=timezone.get_current_timezone()))
+    if breakdown_fields is None:
+        queryset = queryset.annotate(group_key=Value(0), label=Value(''))
+    else:
+        key_field, name_field = breakdown_fields
+        queryset = queryset.annotate(group_key=Coalesce(F(key_field), 0), label=Coalesce(F(name_field), Value('')))
+    return queryset.order_by().values_list('period', 'group_key', 'label')
+
+
+def bucket_rows(owner, start, end, granularity: str, breakdown: str):
+    rows = SalesBucket.objects.filter(owner=owner, span=GRANULARITY_SPANS[granularity], start__gte=start, start__lt=end)
+    rows = group_rows(rows, 'start', granularity, BREAKDOWNS[breakdown][1])
+    return rows.annotate(
+        total_quantity=Sum('quantity'), total_revenue=Sum('revenue'), total_lines=Sum('lines'),
+    ).order_by('period', 'group_key')
+
+
+def recent_rows(owner, start, end, granularity: str, breakdown: str, after_id: int):
+    rows = OrderLine.objects.filter(
+        order__owner=owner, order__id__gt=after_id, order__created_at__gte=start, order__created_at__lt=end
+    )
+    rows = group_rows(rows, 'order__created_at', granularity, BREAKDOWNS[breakdown][2])
+    return rows.annotate(
+        total_quantity=Sum('quantity'), total_revenue=Sum('total'), total_lines=Count('id'),
+    ).order_by('period', 'group_key')
+
+
+def report_rows(owner, start: datetime.date, end: datetime.date, granularity: str, breakdown: str, chunk_size: int = 2000):
+    """
+    Yields the rows of a sales report, one per period and breakdown key.
+
+    The pre-aggregated buckets are read through a server-side cursor and
+    merged on the fly with the orders not yet aggregated, so a report of
+    any size is streamed rather than materialised.
+
+    Parameters:
+    - owner (User): The seller.
+    - start (date): The first local date of the report.
+    - end (date): The last local date of the report, included.
+    - granularity (str): A key of `GRANULARITIES`.
+    - breakdown (str): A key of `BREAKDOWNS`.
+    - chunk_size (int): Bucket rows fetched per round trip. Default is 2000.
+
+    Yields:
+    tuple: (period, name, quantity, revenue, lines), by period then breakdown key.
+    """
+    start, end = report_range(start, end)
+
+    with consistent_snapshot():
+        after_id = aggregated_up_to()
+
+        # Orders past the watermark are few: at most the ones since the last aggregation run
+        recent = list(recent_rows(owner, start, end, granularity, breakdown, after_id))
+        buckets = bucket_rows(owner, start, end, granularity, breakdown).iterator(chunk_size=chunk_size)
+
+        merged = heapq.merge(buckets, recent, key=lambda row: (row[0], row[1]))
+        for (period, key), rows in itertools.groupby(merged, key=lambda row: (row[0], row[1])):
+            rows = list(rows)
+            yield (
+                period,
+                rows[0][2],
+                sum(row[3] for row in rows),
+                sum(row[4] for row in rows),
+                sum(row[5] for row in rows),
+            )
+
+
+def report_totals(owner, start: datetime.date, end: datetime.date) -> dict:
+    """
+    Returns:
+    dict: The quantity, revenue and lines of the whole report range.
+    """
+    start, end = report_range(start, end)
+
+    with consistent_snapshot():
+        after_id = aggregated_up_to()
+        totals = SalesBucket.objects.filter(
+            owner=owner, span=SalesBucket.Span.DAY, start__gte=start, start__lt=end
+        ).aggregate(
+            quantity=Sum('quantity', default=0), revenue=Sum('revenue', default=0), lines=Sum('lines', default=0),
+        )
+        recent = OrderLine.objects.filter(
+            order__owner=owner, order__id__gt=after_id, order__created_at__gte=start, order__created_at__lt=end
+        ).aggregate(
+            quantity=Sum('quantity', default=0), revenue=Sum('total', default=0), lines=Count('id'),
+        )
+    return {name: totals[name] + recent[name] for name in totals}
@@ -0,0 +1,152 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery
+from django.db.models.functions import Cast, Greatest
+
+
+# Text search configuration used for both the stored vectors and the queries
+SEARCH_CONFIG = 'english'
+
+# The fields the product search vectors are built from, by model
+SEARCH_FIELDS = {
+    'dashboard.category': ['name'],
+    'dashboard.subcategory': ['name'],
+    'dashboard.product': ['name', 'description', 'category_id', 'sub_category_id'],
+}
+
+
+def fixed_rank(expression):
+    """
+    Rounds a relevance score to a fixed-precision numeric.
+
+    The scores are `real`s, which a keyset cursor cannot carry exactly: the
+    next page would compare the rank against a float that no row equals,
+    and skip the rows tied with the cursor row. Rounded, the cursor holds
+    the rank the rows are compared on.
+
+    Parameters:
+    - expression (Expression): The score.
+
+    Returns:
+    Cast: The score as a numeric with six decimal places.
+    """
+    return Cast(expression, output_field=DecimalField(max_digits=12, decimal_places=6))
+
+
+def product_search_vector() -> SearchVector:
+    """
+    Builds the weighted search document of a product.
+
+    The category and sub-category names are read through subqueries rather
+    than joins, so the expression can be used in `QuerySet.update()` to
+    refresh any set of products in one statement.
+
+    Returns:
+    SearchVector: Expression producing the product's `tsvector`.
+    """
+    from .models import Category, SubCategory
+
+    category_name = Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+    sub_category_name = Subquery(SubCategory.objects.filter(pk=OuterRef('sub_category_id')).values('name')[:1])
+
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(category_name, sub_category_name, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def search_values(instance) -> dict:
+    # Deferred fields are left out, they cannot have changed unless loaded or set
+    fields = SEARCH_FIELDS[instance._meta.label_lower]
+    return {name: instance.__dict__[name] for name in fields if name in instance.__dict__}
+
+
+def remember_search_values(instance):
+    instance._search_values = search_values(instance)
+
+
+def search_fields_changed(instance) -> bool:
+    """
+    Tells whether a saved instance changed what the product search vectors
+    are built from, since it was loaded or last checked, so that e.g. a new
+    description or image of a category rewrites no vectors.
+
+    Parameters:
+    - instance (Model): A category, sub-category or product, just saved.
+
+    Returns:
+    bool: Whether a vector of the instance or of its products is stale.
+    """
+    loaded = getattr(instance, '_search_values', {})
+    values = search_values(instance)
+    instance._search_values = values
+    return any(name not in loaded or loaded[name] != value for name, value in values.items())
+
+
+def update_search_vector(queryset) -> int:
+    """
+    Recomputes the stored search vector of every product in the queryset.
+
+    Parameters:
+    - queryset (QuerySet): The products to refresh.
+
+    Returns:
+    int: The number of updated products.
+    """
+    return queryset.update(search_vector=product_search_vector())
+
+
+def search_products(queryset, query: str):
+    """
+    Filters products by a free-text query and annotates their relevance.
+
+    A product matches when the full-text query matches its search vector
+    (name, category, sub-category and description), or when the query is
+    similar enough to a word of its name to tolerate typos. Both conditions
+    are served by GIN indexes.
+
+    Parameters:
+    - queryset (QuerySet): The products to search.
+    - query (str): The text typed by the user.
+
+    Returns:
+    QuerySet: Matching products annotated with `rank`, higher is more relevant,
+    rounded by `fixed_rank` so that it can order keyset pages.
+    """
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+
+    return queryset.annotate(
+        rank=fixed_rank(Greatest(
+            SearchRank(F('search_vector'), search_query),
+            TrigramWordSimilarity(query, 'name'),
+        )),
+    ).filter(
+        Q(search_vector=search_query) | Q(name__trigram_word_similar=query)
+    )
+
+
+def search_contacts(queryset, query: str):
+    """
+    Filters customers or suppliers by a name or partial phone number and annotates their relevance.
+
+    A contact matches when the query is similar enough to a word of their
+    name, or when its digits appear in their phone number. Both conditions
+    are served by trigram GIN indexes.
+
+    Parameters:
+    - queryset (QuerySet): The customers or suppliers to search.
+    - query (str): The text typed by the user.
+
+    Returns:
+    QuerySet: Matching contacts annotated with `rank`, higher is more relevant,
+    rounded by `fixed_rank` so that it can order keyset pages.
+    """
+    from .dues import normalize_phone
+
+    condition = Q(name__trigram_word_similar=query)
+    phone = normalize_phone(query)
+    # Shorter fragments have no trigram to look up
+    if len(phone.lstrip('+')) >= 3:
+        condition |= Q(phone__contains=phone.lstrip('+'))
+
+    return queryset.annotate(rank=fixed_rank(TrigramWordSimilarity(query, 'name'))).filter(condition)
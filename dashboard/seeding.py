@@ -0,0 +1,220 @@
+import colorsys
+import os
+import random
+import tempfile
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.contrib.auth.models import User
+from PIL import Image, ImageDraw
+from .checkout import checkout
+from .dues import record_payment
+from .importer import CategoryImporter, ImageSource, ProductImporter, SubCategoryImporter
+from .inventory import take_snapshots
+from .models import Customer, Product, PurchaseOrderLine, Supplier
+from .purchasing import create_purchase_order, receive_purchase_order
+from .sales_report import aggregate_sales
+
+
+CATEGORY_NAMES = [
+    'Beverages', 'Snacks', 'Dairy', 'Bakery', 'Produce', 'Frozen', 'Pantry', 'Household', 'Personal Care',
+    'Baby', 'Pet Supplies', 'Stationery', 'Electronics', 'Toys', 'Hardware', 'Garden',
+]
+SUB_CATEGORY_NAMES = ['Classic', 'Premium', 'Organic', 'Family Pack', 'Imported', 'Local', 'Value', 'Seasonal']
+PRODUCT_NAMES = [
+    'Original', 'Light', 'Extra', 'Mini', 'Large', 'Citrus', 'Vanilla', 'Honey', 'Spicy', 'Smoked',
+    'Mint', 'Berry', 'Cocoa', 'Coconut', 'Ginger', 'Lemon', 'Sea Salt', 'Herbal', 'Classic Blend', 'Deluxe',
+]
+FIRST_NAMES = ['Amina', 'Bruno', 'Chen', 'Dara', 'Elif', 'Femi', 'Goran', 'Hana', 'Ivan', 'Jaya', 'Kofi', 'Lena']
+LAST_NAMES = ['Silva', 'Okafor', 'Nguyen', 'Kowalski', 'Haddad', 'Moreau', 'Tanaka', 'Rossi', 'Khan', 'Berg']
+
+
+class SeedSizes(NamedTuple):
+    categories: int = 10
+    sub_categories: int = 5
+    products: int = 20
+    customers: int = 50
+    suppliers: int = 10
+    orders: int = 50
+    images: int = 12
+
+
+def write_images(directory: str, count: int, size: int = 640) -> list:
+    """
+    Draws distinct JPEG images to import, one hue each.
+
+    Parameters:
+    - directory (str): Where to write the images.
+    - count (int): The number of images.
+    - size (int): Their width and height in pixels. Default is 640.
+
+    Returns:
+    list: The image file names.
+    """
+    names = []
+    for index in range(count):
+        hue = index / count
+        background = tuple(int(channel * 255) for channel in colorsys.hsv_to_rgb(hue, 0.35, 0.95))
+        foreground = tuple(int(channel * 255) for channel in colorsys.hsv_to_rgb(hue, 0.8, 0.6))
+        image = Image.new('RGB', (size, size), background)
+        draw = ImageDraw.Draw(image)
+        draw.ellipse((size // 5, size // 5, size * 4 // 5, size * 4 // 5), fill=foreground)
+        draw.rectangle((0, size * 7 // 8, size, size), fill=foreground)
+
+        name = f'seed-{index:02d}.jpg'
+        image.save(os.path.join(directory, name), 'JPEG', quality=85)
+        names.append(name)
+    return names
+
+
+def import_rows(importer, rows: list):
+    result = importer.run(enumerate(rows, start=1))
+    if result.errors:
+        line, message = result.errors[0]
+        raise ValueError(f'{importer.model.__name__} line {line}: {message}')
+
+
+def seed_catalog(owner, sizes: SeedSizes, images: ImageSource, image_names: list, rng: random.Random):
+    """
+    Imports a category > sub-category > product tree for an owner, through
+    the catalog importers the import page uses.
+    """
+    categories = [
+        f'{CATEGORY_NAMES[index % len(CATEGORY_NAMES)]} {index // len(CATEGORY_NAMES) + 1}'
+        for index in range(sizes.categories)
+    ]
+    sub_categories = [
+        (category, f'{category} {SUB_CATEGORY_NAMES[index % len(SUB_CATEGORY_NAMES)]} {index // len(SUB_CATEGORY_NAMES) + 1}')
+        for category in categories for index in range(sizes.sub_categories)
+    ]
+
+    import_rows(CategoryImporter(owner, images), [
+        {'name': name, 'image': rng.choice(image_names), 'description': f'Everything {name.lower()}.'}
+        for name in categories
+    ])
+    import_rows(SubCategoryImporter(owner, images), [
+        {'name': name, 'category': category, 'image': rng.choice(image_names), 'description': f'{name} range.'}
+        for category, name in sub_categories
+    ])
+    import_rows(ProductImporter(owner, images), [
+        {
+            'name': f'{sub_category} {PRODUCT_NAMES[index % len(PRODUCT_NAMES)]} {index // len(PRODUCT_NAMES) + 1}',
+            'category': category,
+            'sub_category': sub_category,
+            'image': rng.choice(image_names),
+            'price': f'{rng.uniform(0.5, 250):.2f}',
+            'description': f'{PRODUCT_NAMES[index % len(PRODUCT_NAMES)]} from the {sub_category.lower()} range.',
+        }
+        for category, sub_category in sub_categories for index in range(sizes.products)
+    ])
+
+
+def seed_people(owner, sizes: SeedSizes, rng: random.Random):
+    # One at a time: creating a customer counts it in the dashboard rollups
+    for index in range(sizes.customers):
+        name = f'{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[rng.randrange(len(LAST_NAMES))]}'
+        Customer.objects.create(
+            owner=owner, name=name, phone=f'+1555{owner.pk % 1000:03d}{index:04d}',
+            email=f'customer{index}@{owner.username}.example.com',
+        )
+
+    Supplier.objects.bulk_create([
+        Supplier(
+            owner=owner, name=f'{LAST_NAMES[index % len(LAST_NAMES)]} Wholesale {index + 1}',
+            contact_name=f'{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[index % len(LAST_NAMES)]}',
+            phone=f'+1666{owner.pk % 1000:03d}{index:04d}', email=f'sales{index}@supplier.example.com',
+        )
+        for index in range(sizes.suppliers)
+    ])
+
+
+def seed_trade(owner, sizes: SeedSizes, rng: random.Random):
+    """
+    Stocks the owner's products with purchase orders, one received and one
+    open, then rings up sales of the received stock, some of them leaving
+    customer dues.
+    """
+    products = list(Product.objects.filter(owner=owner).order_by('id').values_list('pk', 'name', 'price'))
+    suppliers = list(Supplier.objects.filter(owner=owner).order_by('id'))
+    customers = list(Customer.objects.filter(owner=owner).order_by('id'))
+    if not products:
+        return
+
+    stock = {}
+    for receive in (True, False):
+        lines = [
+            PurchaseOrderLine(
+                product_id=pk, name=name, quantity=rng.randint(20, 200),
+                unit_cost=(price * Decimal('0.6')).quantize(Decimal('0.01')),
+            )
+            for pk, name, price in rng.sample(products, min(len(products), 25))
+        ]
+        for line in lines:
+            line.total = line.unit_cost * line.quantity
+        purchase_order = create_purchase_order(
+            owner, rng.choice(suppliers) if suppliers else None, lines, reference=f'INV-{rng.randrange(10000, 99999)}',
+        )
+        if receive:
+            receive_purchase_order(purchase_order)
+            stock = {line.product_id: line.quantity for line in lines}
+
+    prices = {pk: price for pk, _, price in products}
+    for _ in range(sizes.orders):
+        stocked = [pk for pk, left in stock.items() if left]
+        if not stocked:
+            break
+        quantities = {
+            pk: min(rng.randint(1, 5), stock[pk]) for pk in rng.sample(stocked, min(len(stocked), rng.randint(1, 6)))
+        }
+        customer = rng.choice(customers) if customers and rng.random() < 0.6 else None
+        paid = None
+        if customer is not None and rng.random() < 0.3:
+            # Bought on credit, half paid at the till
+            paid = (sum(prices[pk] * quantity for pk, quantity in quantities.items()) / 2).quantize(Decimal('0.01'))
+        checkout(owner, quantities, customer=customer, paid=paid)
+        for pk, quantity in quantities.items():
+            stock[pk] -= quantity
+
+    # Some of the dues paid back later
+    for customer in Customer.objects.filter(owner=owner, dues__gt=0).order_by('id')[::2]:
+        record_payment(customer, (customer.dues / 2).quantize(Decimal('0.01')) or customer.dues, note='Cash')
+
+
+def seed_benchmark_data(users: int, sizes: SeedSizes = SeedSizes(), prefix: str = 'bench', password: str = 'benchmark', seed: int = 0) -> list:
+    """
+    Creates users with realistic, reproducible data on every dashboard page.
+
+    Each user gets a catalog imported with images, customers, suppliers,
+    purchase orders and sales. The sales buckets and stock snapshots are
+    then brought up to date, as the periodic jobs would.
+
+    Parameters:
+    - users (int): The number of users, named '<prefix>-0', '<prefix>-1', ...
+    - sizes (SeedSizes): Rows per user; sub-categories are per category and
+      products per sub-category.
+    - prefix (str): The username prefix. Default is 'bench'.
+    - password (str): Every user's password. Default is 'benchmark'.
+    - seed (int): The random seed, the same seed giving the same data. Default is 0.
+
+    Returns:
+    list: The created users.
+    """
+    rng = random.Random(seed)
+    created = []
+    with tempfile.TemporaryDirectory() as directory:
+        image_names = write_images(directory, sizes.images)
+        images = ImageSource(directory)
+        for index in range(users):
+            username = f'{prefix}-{index}'
+            owner = User.objects.create_user(
+                username=username, email=f'{username}@example.com', password=password,
+                first_name=FIRST_NAMES[index % len(FIRST_NAMES)], last_name='Benchmark',
+            )
+            seed_catalog(owner, sizes, images, image_names, rng)
+            seed_people(owner, sizes, rng)
+            seed_trade(owner, sizes, rng)
+            created.append(owner)
+
+    aggregate_sales()
+    take_snapshots()
+    return created
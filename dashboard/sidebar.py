@@ -1,59 +1,89 @@
-def create_section(id: int, name: str, url: str) -> dict:
+import functools
+from typing import NamedTuple
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import slugify
+
+
+SIDEBAR_TEMPLATE = 'dashboard/includes/sections/sidebar.html'
+
+# Stands for the user's profile URL in the cached sidebar HTML
+PROFILE_URL_MARKER = '__profile_url__'
+
+
+class Section(NamedTuple):
+    id: int
+    name: str
+    url: str
+
+
+class MenuItem(NamedTuple):
+    id: int
+    name: str
+    icon: str
+    url: str
+    sections: tuple
+    slug: str
+
+
+def create_section(id: int, name: str, url: str) -> Section:
     """
-    Helper function to create a section dictionary.
+    Helper function to create a section.
 
     Parameters:
     - id (int): The ID of the section.
     - name (str): The name of the section.
-    - url (str): The URL associated with the section.
+    - url (str): The name of the URL pattern associated with the section.
 
     Returns:
-    dict: Section dictionary.
+    Section: Section with its URL reversed.
     """
-    return {'id': id, 'name': name, 'url': url}
+    return Section(id=id, name=name, url=reverse(url))
 
 
-def create_menu_item(id: int, name: str, icon: str, url: str, sections: list = None) -> dict:
+def create_menu_item(id: int, name: str, icon: str, url: str, sections: list = None) -> MenuItem:
     """
-    Helper function to create a menu item dictionary.
+    Helper function to create a menu item.
 
     Parameters:
     - id (int): The unique identifier for the menu item.
     - name (str): The name of the menu item.
     - icon (str): The icon associated with the menu item.
-    - url (str): The URL associated with the menu item.
-    - sections (List[Dict[str, str]]): Optional list of sections under the menu item.
+    - url (str): The name of the URL pattern associated with the menu item.
+    - sections (List[Section]): Optional list of sections under the menu item.
 
     Returns:
-    dict: Menu item dictionary.
+    MenuItem: Menu item with its URL reversed, except the per-user profile URL.
     """
-    menu_item = {'id': id, 'name': name, 'icon': icon, 'url': url}
-    if sections:
-        menu_item['sections'] = sections
-    return menu_item
+    if url == 'profile':
+        url = PROFILE_URL_MARKER
+    elif url:
+        url = reverse(url)
+    return MenuItem(id=id, name=name, icon=icon, url=url, sections=tuple(sections or ()), slug=slugify(name))
 
 
-def sidebar_data(section_active_id: int = 1, sub_section_active_id: int = 1) -> dict:
+@functools.cache
+def get_menu() -> tuple:
     """
-    Generates sidebar data with optional highlighting of the active menu item.
-
-    Parameters:
-    - section_active_id (int): The ID of the active menu item. Default is 1.
-    - sub section_active_id (int): The ID of the active sub item. Default is 1.
+    Builds the sidebar menu once per process.
 
     Returns:
-    dict: Sidebar data dictionary.
+    tuple: (heading, menu items) pairs.
     """
-    data = dict(
-        general=[
+    return (
+        ('general', (
             create_menu_item(
                 id=1, name='Dashboard', icon='bi bi-grid', url='dashboard'
             ),
 
             create_menu_item(
                 id=2, name='Sales', icon='bi bi-speedometer2', url=None, sections=[
-                    create_section(id=1, name='POS', url='dashboard'),
-                    create_section(id=2, name='Orders', url='dashboard'),
+                    create_section(id=1, name='POS', url='pos'),
+                    create_section(id=2, name='Orders', url='orders'),
 
                 ]
             ),
@@ -67,13 +97,16 @@ def sidebar_data(section_active_id: int = 1, sub_section_active_id: int = 1) ->
             ),
 
             create_menu_item(
-                id=4, name='Inventory Management', icon='bi bi-shield-plus', url='dashboard'
+                id=4, name='Inventory Management', icon='bi bi-shield-plus', url=None, sections=[
+                    create_section(id=1, name='Stock Ledger', url='inventory'),
+                    create_section(id=2, name='Purchase Orders', url='purchase_orders'),
+                ]
             ),
 
             create_menu_item(
                 id=5, name='People Management', icon='bi bi-people', url=None, sections=[
-                    create_section(id=1, name='Customer', url='dashboard'),
-                    create_section(id=2, name='Suplier', url='dashboard'),
+                    create_section(id=1, name='Customer', url='customers'),
+                    create_section(id=2, name='Supplier', url='suppliers'),
 
                 ]
             ),
@@ -88,15 +121,15 @@ def sidebar_data(section_active_id: int = 1, sub_section_active_id: int = 1) ->
 
             create_menu_item(
                 id=8, name='Reports', icon='bi bi-journal-medical', url=None, sections=[
-                    create_section(id=1, name='Sales Report', url='dashboard'),
-                    create_section(id=2, name='Customer Report', url='dashboard'),
-                    create_section(id=3, name='Dues Report', url='dashboard'),
-                    create_section(id=4, name='Stock Report', url='dashboard'),
+                    create_section(id=1, name='Sales Report', url='sales_report'),
+                    create_section(id=2, name='Customer Report', url='customer_report'),
+                    create_section(id=3, name='Dues Report', url='dues_report'),
+                    create_section(id=4, name='Stock Report', url='stock_report'),
                 ]
             ),
-        ],
-        
-        pages=[
+        )),
+
+        ('pages', (
             create_menu_item(
                 id=9, name='Profile', icon='bi bi-person', url='profile'
             ),
@@ -106,16 +139,60 @@ def sidebar_data(section_active_id: int = 1, sub_section_active_id: int = 1) ->
                     create_section(id=1, name='Change Password', url='account_change_password')
                 ]
             ),
-        ]
+        )),
     )
 
-    for menu_item in data['general'] + data['pages']:
-        menu_item['collapsed'] = menu_item['id'] != section_active_id
 
-        if not menu_item["collapsed"]:
-            if menu_item.get('sections'):
+def render_sidebar(section_active_id: int, sub_section_active_id: int) -> str:
+    """
+    Renders the sidebar HTML for an active menu item, with the profile URL left as a marker.
+
+    Parameters:
+    - section_active_id (int): The ID of the active menu item.
+    - sub_section_active_id (int): The ID of the active sub item.
 
-                for section in menu_item.get('sections'):
-                    section["active"] = section['id'] == sub_section_active_id 
-    
-    return data
+    Returns:
+    str: The sidebar HTML.
+    """
+    return render_to_string(SIDEBAR_TEMPLATE, {
+        'menu': get_menu(),
+        'section_active_id': section_active_id,
+        'sub_section_active_id': sub_section_active_id,
+    })
+
+
+# One rendered sidebar per (section, sub-section) pair, kept for the life of the process
+cached_render_sidebar = functools.cache(render_sidebar)
+
+
+class Sidebar(NamedTuple):
+    section_active_id: int
+    sub_section_active_id: int
+
+    def render(self, username: str) -> str:
+        """
+        Parameters:
+        - username (str): The user whose profile the sidebar links to.
+
+        Returns:
+        str: The sidebar HTML, rendered once per active pair and reused.
+        """
+        # Templates may be edited while developing
+        render = render_sidebar if settings.DEBUG else cached_render_sidebar
+        html = render(self.section_active_id, self.sub_section_active_id)
+        profile_url = escape(reverse('profile', kwargs={'username': username}))
+        return mark_safe(html.replace(PROFILE_URL_MARKER, profile_url))
+
+
+def sidebar_data(section_active_id: int = 1, sub_section_active_id: int = 1) -> Sidebar:
+    """
+    Selects the sidebar state of a page, rendered by the `sidebar` template tag.
+
+    Parameters:
+    - section_active_id (int): The ID of the active menu item. Default is 1.
+    - sub section_active_id (int): The ID of the active sub item. Default is 1.
+
+    Returns:
+    Sidebar: The active menu item and sub item.
+    """
+    return Sidebar(section_active_id, sub_section_active_id)
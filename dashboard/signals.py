@@ -1,8 +1,12 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile
+from .choices import bump_choices_version
+from .fragments import bump_profile_version
+from .models import Profile, Category, SubCategory, Product, Customer
+from .rollups import record_customer
+from .search import remember_search_values, search_fields_changed, update_search_vector
 
 
 @receiver(post_save, sender=User)
@@ -14,3 +18,67 @@ def create_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_fragments(sender, instance, **kwargs):
+    # Saving the user saves the profile too, so name changes land here as well
+    bump_profile_version(instance.user_id)
+
+
+@receiver(post_save, sender=Customer)
+def count_new_customer(sender, instance, created, **kwargs):
+    # Counted once as the customer is created, the dashboard never counts customer rows
+    if created:
+        record_customer(instance.owner_id, instance.created_at)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+def invalidate_owner_choices(sender, instance, **kwargs):
+    # The product and sub-category forms offer the owner's categories and sub-categories
+    bump_choices_version(instance.owner_id)
+
+
+@receiver(post_init, sender=Category)
+@receiver(post_init, sender=SubCategory)
+@receiver(post_init, sender=Product)
+def remember_search_fields(sender, instance, **kwargs):
+    remember_search_values(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, created, **kwargs):
+    if search_fields_changed(instance) or created:
+        update_search_vector(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def update_category_products_search_vector(sender, instance, created, **kwargs):
+    # A new category has no products yet
+    if search_fields_changed(instance) and not created:
+        update_search_vector(Product.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=SubCategory)
+def update_sub_category_products_search_vector(sender, instance, created, **kwargs):
+    if search_fields_changed(instance) and not created:
+        update_search_vector(Product.objects.filter(sub_category=instance))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=SubCategory)
+def collect_products_for_search_vector(sender, instance, **kwargs):
+    # The products lose the reference on delete (SET_NULL), remember them first
+    lookup = 'category' if sender is Category else 'sub_category'
+    instance._search_product_ids = list(Product.objects.filter(**{lookup: instance}).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+def update_orphaned_products_search_vector(sender, instance, **kwargs):
+    product_ids = getattr(instance, '_search_product_ids', None)
+    if product_ids:
+        update_search_vector(Product.objects.filter(pk__in=product_ids))
@@ -0,0 +1,36 @@
+(function () {
+  "use strict";
+
+  /**
+   * Suggests customers by name or phone while the cashier types, filling
+   * the datalist of the POS customer field with their phone or email
+   */
+  const input = document.querySelector('[data-customer-lookup]')
+  if (!input) {
+    return
+  }
+
+  const list = document.getElementById(input.getAttribute('list'))
+  let timer = null
+
+  input.addEventListener('input', () => {
+    clearTimeout(timer)
+    const query = input.value.trim()
+    if (query.length < 2) {
+      return
+    }
+
+    timer = setTimeout(() => {
+      fetch(input.dataset.customerLookup + '?q=' + encodeURIComponent(query), {headers: {'Accept': 'application/json'}})
+        .then(response => response.json())
+        .then(data => {
+          list.replaceChildren(...data.results.map(customer => {
+            const option = document.createElement('option')
+            option.value = customer.phone || customer.email
+            option.label = customer.name + (Number(customer.dues) > 0 ? ' (dues ' + customer.dues + ')' : '')
+            return option
+          }))
+        })
+    }, 250)
+  })
+})();
@@ -0,0 +1,54 @@
+(function () {
+  "use strict";
+
+  /**
+   * Fills the selects rendered by dashboard.choices.LazySelect on demand:
+   * the options of the chosen parent value, narrowed by a typed prefix
+   */
+  const fill = (select, results) => {
+    const selected = select.value
+    const empty = select.querySelector('option[value=""]')
+    select.replaceChildren(...(empty ? [empty] : []), ...results.map(result => {
+      const option = document.createElement('option')
+      option.value = result.id
+      option.textContent = result.name
+      option.selected = String(result.id) === selected
+      return option
+    }))
+  }
+
+  document.querySelectorAll('select[data-lookup-url]').forEach(select => {
+    const parent = select.dataset.dependsOn ? select.form.elements[select.dataset.dependsOn] : null
+    const search = document.createElement('input')
+    search.type = 'search'
+    search.placeholder = 'Type to search'
+    search.className = 'form-control form-control-sm mb-1'
+    search.setAttribute('aria-label', 'Search ' + (select.labels.length ? select.labels[0].textContent : ''))
+    select.before(search)
+
+    let timer = null
+    const load = () => {
+      const params = new URLSearchParams({q: search.value.trim()})
+      if (parent && parent.value) {
+        params.set('category', parent.value)
+      }
+      fetch(select.dataset.lookupUrl + '?' + params, {headers: {'Accept': 'application/json'}})
+        .then(response => response.json())
+        .then(data => fill(select, data.results))
+    }
+
+    search.addEventListener('input', () => {
+      clearTimeout(timer)
+      timer = setTimeout(load, 250)
+    })
+    select.addEventListener('focus', load, {once: true})
+
+    if (parent) {
+      parent.addEventListener('change', () => {
+        select.value = ''
+        search.value = ''
+        load()
+      })
+    }
+  })
+})();
@@ -0,0 +1,136 @@
+import hashlib
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.db.models import F
+
+
+def file_digest(content) -> str:
+    """
+    Parameters:
+    - content (File): The file to hash, read from its start.
+
+    Returns:
+    str: The hex SHA-256 of the file's bytes.
+    """
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming every file by the SHA-256 of its bytes.
+
+    A file saved as `products/cola.jpg` is stored as `products/<sha256>.jpg`,
+    so identical bytes are written once whatever they were called. Each save
+    adds a reference to the file in `StoredFile` and each `delete()` removes
+    one; the file itself is removed with its last reference. Files without a
+    `StoredFile` row (such as field defaults) are never deleted.
+
+    Processed images also record the key of the upload they were made from
+    (see `image_processing.source_key`), so a re-upload of the same image can
+    reuse the processed file instead of being processed again.
+
+    Saving, referencing, releasing and removing a file hold a lock on its
+    name until the current transaction ends, so a file is never removed
+    between a save finding it already stored and the save committing its
+    reference. References are counted in the caller's transaction and are
+    rolled back with it.
+    """
+
+    def lock(self, name: str):
+        # Transaction-level advisory lock, released on commit or rollback
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))', [name])
+
+    def hashed_name(self, name: str, content) -> str:
+        ext = posixpath.splitext(name)[1].lower()
+        return posixpath.join(posixpath.dirname(name), file_digest(content) + ext)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        with transaction.atomic(savepoint=False):
+            self.lock(name)
+            if not self.exists(name):
+                super()._save(name, content)
+            self.add_reference(name)
+        return name
+
+    def reference(self, name: str):
+        """
+        Adds a reference to a stored file.
+
+        Parameters:
+        - name (str): The stored name.
+        """
+        with transaction.atomic(savepoint=False):
+            self.lock(name)
+            self.add_reference(name)
+
+    def add_reference(self, name: str):
+        # Callers hold the name's lock, so the row cannot be created concurrently
+        from .models import StoredFile
+
+        if not StoredFile.objects.filter(name=name).update(references=F('references') + 1):
+            StoredFile.objects.create(name=name, references=1)
+
+    def delete(self, name):
+        """
+        Removes a reference to a stored file, and the file with its last reference.
+
+        The file is removed once the current transaction commits, so a rolled
+        back deletion never loses a file still in use.
+        """
+        from .models import StoredFile
+
+        with transaction.atomic(savepoint=False):
+            self.lock(name)
+            stored = StoredFile.objects.filter(name=name).first()
+            if stored is None:
+                return
+            if stored.references > 1:
+                StoredFile.objects.filter(pk=stored.pk).update(references=F('references') - 1)
+                return
+            stored.delete()
+
+        transaction.on_commit(lambda: self.remove_unreferenced(name))
+
+    def remove_unreferenced(self, name: str):
+        from .models import StoredFile
+
+        # Waits for a save of the same bytes in progress, which may have found the file stored
+        with transaction.atomic(savepoint=False):
+            self.lock(name)
+            if not StoredFile.objects.filter(name=name).exists():
+                super().delete(name)
+
+    def reuse_processed(self, key: str):
+        """
+        Adds a reference to the image already processed from an upload.
+
+        Parameters:
+        - key (str): The source key of an upload, from `image_processing.source_key`.
+
+        Returns:
+        str: The stored name of the processed image, or None if there is none
+        or it lost its last reference meanwhile.
+        """
+        from .models import StoredFile
+
+        name = StoredFile.objects.filter(source_key=key).values_list('name', flat=True).first()
+        if name is None:
+            return None
+        with transaction.atomic(savepoint=False):
+            self.lock(name)
+            if not StoredFile.objects.filter(name=name).update(references=F('references') + 1):
+                return None
+        return name
+
+    def record_source(self, name: str, key: str):
+        from .models import StoredFile
+
+        StoredFile.objects.filter(name=name).update(source_key=key)
@@ -1,5 +1,9 @@
 from django import template
+from django.templatetags.static import static
 from django.urls import reverse
+from django.utils.html import format_html
+from ..image_processing import is_pending
+from ..renditions import RENDITION_FORMATS, RENDITION_WIDTHS, has_renditions, rendition
 
 
 register = template.Library()
@@ -10,3 +14,58 @@ def get_attribute(value, arg):
         return getattr(value, arg, '')
     except AttributeError:
         return ''
+
+
+@register.filter(name='image_url')
+def image_url(image):
+    """
+    URL of a stored image, or a placeholder while its processing is pending.
+    """
+    if not image:
+        return ''
+    if is_pending(image.name):
+        return static('dashboard/img/processing.svg')
+    return image.url
+
+
+@register.simple_tag(name='responsive_image')
+def responsive_image(image, sizes='100vw', alt='', css_class=''):
+    """
+    Renders a <picture> offering WebP and JPEG renditions of a stored image through `srcset`.
+
+    The renditions are only read, never generated here: it falls back to a
+    plain <img> of the original while the image is pending or until its
+    renditions exist.
+    """
+    if not image or is_pending(image.name):
+        return format_html('<img src="{}" alt="{}" class="{}">', image_url(image), alt, css_class)
+
+    if not has_renditions(image):
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', image.url, alt, css_class)
+
+    urls = {
+        format: [(width, rendition(image, width, format).url) for width in RENDITION_WIDTHS]
+        for format in RENDITION_FORMATS
+    }
+
+    def srcset(format):
+        return ', '.join(f'{url} {width}w' for width, url in urls[format])
+
+    return format_html(
+        '<picture>'
+        '<source type="{}" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy">'
+        '</picture>',
+        RENDITION_FORMATS['WEBP'], srcset('WEBP'), sizes,
+        urls['JPEG'][1][1], srcset('JPEG'), sizes, alt, css_class,
+    )
+
+
+@register.simple_tag(takes_context=True)
+def sidebar(context, sidebar_data):
+    """
+    Renders the cached sidebar of `dashboard.sidebar` for the current user.
+    """
+    if not sidebar_data:
+        return ''
+    return sidebar_data.render(context['request'].user.username)
@@ -0,0 +1,17 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class DashboardTestRunner(DiscoverRunner):
+    """
+    Runs the tests with the views' query budgets (dashboard.mixins.QueryBudgetMixin) enforced.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.query_budget_checks = override_settings(QUERY_BUDGET_CHECKS=True)
+        self.query_budget_checks.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.query_budget_checks.disable()
+        super().teardown_test_environment(**kwargs)
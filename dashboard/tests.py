@@ -1,3 +1,1685 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from io import BytesIO
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from decouple import Config, RepositoryEnv
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.template import Context, Template
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import Http404
+from django.urls import reverse
+from django.utils import timezone
+from django.views.generic import ListView
+from django.core.exceptions import ValidationError
+from PIL import Image
+from .models import (
+    Category, SubCategory, Product, Order, DailySalesRollup, StockMovement, StockSnapshot, SalesBucket, Customer,
+    Supplier, PurchaseOrder, StoredFile,
+)
+from denvow.media import ASGIMediaFilesHandler, MediaFilesHandler
+from .benchmarks import find_regressions, load_baselines, run_benchmarks
+from .checkout import checkout
+from .export import unescape_cell
+from .image_processing import is_pending, process_all_pending, process_image
+from .importer import CategoryImporter, ImageSource, ProductImporter, SubCategoryImporter
+from .db.base import DEFAULT_POOL_OPTIONS, DatabaseWrapper
+from .db.pool import close_pools
+from .forms import ProductForm
+from .renditions import RENDITION_FORMATS, RENDITION_WIDTHS, has_renditions, rendition
+from .metrics import CACHE_REQUESTS, METRICS, REQUEST_DURATION, InstrumentedCache, Registry, registry
+from .mixins import QueryBudgetExceeded
+from .pagination import KeysetPaginationMixin, encode_cursor
+from .profiling import _profiler_lock
+from .search import search_contacts, search_products
+from .storage import ContentAddressedStorage
+from .views import CategoryListView, CustomerListView, DuesReportView, OrderListView, POSView, ProductListView
+from .views import PurchaseOrderListView, SubCategoryLookupView, SupplierListView
+from .dues import find_customer, record_payment
+from .inventory import stock_level, take_snapshots, with_stock
+from .purchasing import create_purchase_order, parse_purchase_lines, receive_purchase_order
+from .seeding import write_images
+from .sales_report import aggregate_sales, rebuild_sales_buckets, report_rows, report_totals
+from .rollups import get_kpis, period_ranges, record_sale
+
+
+# Render templates without requiring `collectstatic` to have produced a manifest
+TEST_STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "imagekit": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+
+def create_catalog(owner, size: int) -> None:
+    for index in range(size):
+        category = Category.objects.create(
+            owner=owner, name=f'Category {index}', image='categories/test.jpg', description='Category'
+        )
+        sub_category = SubCategory.objects.create(
+            owner=owner, name=f'Sub-Category {index}', image='sub-categories/test.jpg',
+            category=category, description='Sub-Category'
+        )
+        Product.objects.create(
+            owner=owner, name=f'Product {index}', image='products/test.jpg',
+            category=category, sub_category=sub_category, description='Product'
+        )
+
+
+def stock_catalog(owner, quantity: int = 100) -> None:
+    StockMovement.objects.bulk_create([
+        StockMovement(owner=owner, product_id=pk, kind=StockMovement.Kind.PURCHASE, quantity=quantity)
+        for pk in Product.objects.filter(owner=owner).values_list('pk', flat=True)
+    ])
+
+
+def page_through(client, url: str, max_pages: int = 10, **query) -> list:
+    # The rows of a keyset-paginated list page, following its next cursors
+    rows = []
+    for _ in range(max_pages):
+        page = client.get(url, query).context['page_obj']
+        rows.extend(page)
+        if not page.has_next():
+            break
+        query['after'] = page.next_cursor
+    return rows
+
+
+class CSVExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+        create_catalog(self.user, 3)
+        create_catalog(User.objects.create_user(username='other', password='password'), 2)
+
+    def export(self, url_name):
+        response = self.client.get(reverse(url_name))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+    def test_exports_stream_the_users_rows(self):
+        exports = {
+            'category_export': ['Id', 'Name', 'Description', 'Image', 'Created At', 'Last Update'],
+            'sub_category_export': ['Id', 'Name', 'Category', 'Description', 'Image', 'Created At', 'Last Update'],
+            'product_export': [
+                'Id', 'Name', 'Category', 'Sub Category', 'Description', 'Price', 'Image', 'Created At', 'Last Update',
+            ],
+        }
+        for url_name, header in exports.items():
+            with self.subTest(url_name):
+                rows = self.export(url_name)
+                self.assertEqual(rows[0], header)
+                self.assertEqual(len(rows), 4)
+
+        product = self.export('product_export')[1]
+        self.assertEqual(product[1:6], ['Product 0', 'Category 0', 'Sub-Category 0', 'Product', '0.00'])
+
+    def test_formulas_are_escaped(self):
+        Category.objects.filter(owner=self.user, name='Category 0').update(
+            name='=HYPERLINK("http://example.com")', description='-1+2',
+        )
+        row = self.export('category_export')[1]
+        self.assertEqual(row[1:3], ['\'=HYPERLINK("http://example.com")', "'-1+2"])
+        self.assertEqual(unescape_cell(row[1]), '=HYPERLINK("http://example.com")')
+        self.assertEqual(unescape_cell("'quoted"), "'quoted")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        # Three equal names, so the pages split rows only `id` tells apart
+        self.categories = [
+            Category.objects.create(owner=self.user, name=name, image='categories/test.jpg', description='Category')
+            for name in ['Alpha', 'Beta', 'Beta', 'Beta', 'Gamma']
+        ]
+
+    def page(self, **query):
+        view = CategoryListView()
+        view.setup(RequestFactory().get('/', query))
+        _, page, _, _ = view.paginate_queryset(Category.objects.filter(owner=self.user), 2)
+        return page
+
+    def test_pages_round_trip_both_ways(self):
+        pages = [self.page()]
+        while pages[-1].has_next():
+            pages.append(self.page(after=pages[-1].next_cursor))
+        self.assertEqual([list(page) for page in pages], [self.categories[0:2], self.categories[2:4], self.categories[4:]])
+        self.assertFalse(pages[0].has_previous())
+
+        # Back from the last page, through the cursors the pages handed out
+        previous = self.page(before=pages[2].previous_cursor)
+        self.assertEqual(list(previous), self.categories[2:4])
+        self.assertEqual(list(self.page(before=previous.previous_cursor)), self.categories[0:2])
+        self.assertEqual(list(self.page(after=previous.next_cursor)), self.categories[4:])
+
+    def test_tampered_cursors_are_not_found(self):
+        cursors = ['not a cursor', encode_cursor(('Beta',)), encode_cursor(('Beta', 'x')), encode_cursor(('Beta', {'id': 1}))]
+        for cursor in cursors:
+            with self.subTest(cursor), self.assertRaises(Http404):
+                self.page(after=cursor)
+
+        view = OrderListView()
+        view.setup(RequestFactory().get('/', {'before': encode_cursor(('yesterday', 1))}))
+        with self.assertRaises(Http404):
+            view.paginate_queryset(Order.objects.all(), 2)
+
+    def test_datetime_and_decimal_orderings_page_through(self):
+        # Ties on both values, and times with microseconds
+        start = datetime.datetime(2026, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        for index, total in enumerate(['5.50', '5.50', '12.00', '5.50', '0.99']):
+            order = Order.objects.create(owner=self.user, total=Decimal(total))
+            Order.objects.filter(pk=order.pk).update(created_at=start + datetime.timedelta(microseconds=index // 2))
+        orders = Order.objects.filter(owner=self.user)
+
+        for ordering in [['-created_at', '-id'], ['-total', 'id']]:
+            class OrderPagesView(KeysetPaginationMixin, ListView):
+                model = Order
+
+            OrderPagesView.ordering = ordering
+
+            def page(**query):
+                view = OrderPagesView()
+                view.setup(RequestFactory().get('/', query))
+                return view.paginate_queryset(orders, 2)[1]
+
+            with self.subTest(ordering):
+                pages = [page()]
+                while pages[-1].has_next():
+                    pages.append(page(after=pages[-1].next_cursor))
+                expected = list(orders.order_by(*ordering).values_list('pk', flat=True))
+                self.assertEqual([order.pk for page in pages for order in page], expected)
+                self.assertEqual(list(page(before=pages[-1].previous_cursor)), list(pages[-2]))
+
+
+@override_settings(STORAGES=TEST_STORAGES, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class ListViewQueryCountTests(TestCase):
+    # user and the page of rows; the session comes from its cache, the profile header from the fragment cache
+    expected_queries = 2
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+
+        cache.clear()
+        self.client.get(reverse('dashboard'))
+
+    def assertListQueries(self, url_name):
+        with self.assertNumQueries(self.expected_queries):
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for rows in (1, 25):
+            with self.subTest(rows=rows):
+                Product.objects.all().delete()
+                SubCategory.objects.all().delete()
+                Category.objects.all().delete()
+                create_catalog(self.user, rows)
+
+                for url_name in (
+                    'categories', 'sub_categories', 'products', 'pos', 'orders', 'inventory', 'stock_report',
+                    'customers', 'customer_report', 'dues_report', 'suppliers', 'purchase_orders',
+                ):
+                    self.assertListQueries(url_name)
+
+    def test_related_names_are_rendered(self):
+        create_catalog(self.user, 2)
+        response = self.client.get(reverse('products'))
+        self.assertContains(response, 'Sub-Category 1')
+        self.assertContains(response, 'Category 0')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ShellFragmentCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password', first_name='Ada')
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def test_profile_update_invalidates_header(self):
+        self.assertContains(self.client.get(reverse('dashboard')), 'Ada')
+
+        self.user.first_name = 'Grace'
+        self.user.save()
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Grace')
+        self.assertNotContains(response, 'Ada')
+
+    def test_header_is_cached_per_user(self):
+        self.client.get(reverse('dashboard'))
+
+        other = User.objects.create_user(username='other', password='password', first_name='Linus')
+        self.client.force_login(other)
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Linus')
+        self.assertNotContains(response, 'Ada')
+
+
+class FormChoicesCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        cache.clear()
+        create_catalog(self.user, 2)
+        self.category = Category.objects.get(name='Category 1')
+
+    def test_choices_render_and_clean_from_the_cache(self):
+        ProductForm(self.user)
+
+        with self.assertNumQueries(0):
+            form = ProductForm(self.user)
+            self.assertIn('Category 1', str(form['category']))
+            self.assertEqual(form.fields['category'].clean(str(self.category.pk)).pk, self.category.pk)
+
+        # The model's foreign key validation is left one existence query per choice field
+        product = Product.objects.get(name='Product 1')
+        data = {
+            'name': 'Product 1', 'category': self.category.pk, 'sub_category': product.sub_category_id,
+            'price': '1', 'description': 'Product',
+        }
+        with self.assertNumQueries(2):
+            self.assertTrue(ProductForm(self.user, data=data, instance=product).is_valid())
+
+        other = User.objects.create_user(username='other', password='password')
+        create_catalog(other, 1)
+        with self.assertRaises(ValidationError):
+            form.fields['category'].clean(str(Category.objects.get(owner=other).pk))
+
+    def test_changes_invalidate_the_choices(self):
+        self.assertEqual(len(ProductForm(self.user).fields['category'].choices), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(owner=self.user, name='Category 2', image='categories/test.jpg', description='New')
+        self.assertEqual(len(ProductForm(self.user).fields['category'].choices), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertNotIn('Category 1', str(ProductForm(self.user)['category']))
+
+    def test_choices_cached_by_another_process_are_rechecked(self):
+        # Each process has its own LocMem cache: a bump in one leaves the other's list stale
+        stale, fresh = LocMemCache('choices-stale', {}), LocMemCache('choices-fresh', {})
+        product = Product.objects.get(name='Product 0')
+        deleted_pk = self.category.pk
+        with mock.patch('dashboard.choices.cache', stale):
+            ProductForm(self.user)
+
+        with mock.patch('dashboard.choices.cache', fresh), self.captureOnCommitCallbacks(execute=True):
+            created = Category.objects.create(owner=self.user, name='New', image='categories/test.jpg', description='New')
+            self.category.delete()
+
+        def form(category_pk):
+            data = {'name': 'Product 0', 'category': category_pk, 'sub_category': '', 'price': '1', 'description': 'P'}
+            return ProductForm(self.user, data=data, instance=product)
+
+        with mock.patch('dashboard.choices.cache', stale):
+            self.assertNotIn('New', str(ProductForm(self.user)['category']))
+            self.assertTrue(form(created.pk).is_valid())
+            deleted = form(deleted_pk)
+            self.assertFalse(deleted.is_valid())
+            self.assertIn('category', deleted.errors)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.tea = Category.objects.create(owner=self.user, name='Tea', image='categories/test.jpg', description='Leaves')
+
+    def product(self, name, category=None, description='Product'):
+        return Product.objects.create(
+            owner=self.user, name=name, category=category, image='products/test.jpg', description=description,
+        )
+
+    def search(self, query):
+        return list(search_products(Product.objects.filter(owner=self.user), query).order_by('-rank', 'id'))
+
+    def test_name_matches_rank_above_category_matches(self):
+        jasmine = self.product('Jasmine Blend', category=self.tea)
+        green = self.product('Green Tea')
+        self.product('Coffee Beans')
+        self.assertEqual(self.search('tea'), [green, jasmine])
+
+    def test_typos_match_by_trigram(self):
+        jasmine = self.product('Jasmine Blend', category=self.tea)
+        self.assertEqual(self.search('jasmnie'), [jasmine])
+        self.assertEqual(self.search('xylophone'), [])
+
+    def test_equal_ranks_page_by_id(self):
+        bags = [self.product('Tea Bag') for _ in range(5)]
+
+        def page(**query):
+            view = POSView()
+            view.setup(RequestFactory().get('/', {'query': 'tea bag', **query}))
+            view.request.user = self.user
+            _, page, _, _ = view.paginate_queryset(view.get_queryset(), 2)
+            return page
+
+        pages = [page()]
+        while pages[-1].has_next():
+            pages.append(page(after=pages[-1].next_cursor))
+        self.assertEqual([product.pk for page in pages for product in page], [bag.pk for bag in bags])
+        self.assertEqual([product.pk for product in page(before=pages[-1].previous_cursor)], [bags[2].pk, bags[3].pk])
+
+    def test_fractional_ranks_page_without_losing_ties(self):
+        for name in ['Green Tea', 'Green Tea', 'Tea Leaves Loose', 'Tea Leaves Loose', 'Tea Leaves Loose', 'Teapot']:
+            self.product(name)
+        self.product('Jasmine Blend', category=self.tea)
+        ranked = self.search('teas')
+        ranks = [product.rank for product in ranked]
+        self.assertEqual(len(ranked), 7)
+        self.assertTrue(all(rank < 1 for rank in ranks))
+        self.assertLess(len(set(ranks)), len(ranks))
+
+        def page(**query):
+            view = ProductListView()
+            view.setup(RequestFactory().get('/', {'query': 'teas', **query}))
+            view.request.user = self.user
+            return view.paginate_queryset(view.get_queryset(), 2)[1]
+
+        pages = [page()]
+        # Bounded: a cursor skipping its tied rows may also hand out pages in a loop
+        while pages[-1].has_next() and len(pages) < len(ranked):
+            pages.append(page(after=pages[-1].next_cursor))
+        self.assertEqual([product for page in pages for product in page], ranked)
+        self.assertEqual(list(page(before=pages[-1].previous_cursor)), list(pages[-2]))
+
+    def test_vectors_refresh_only_when_searched_fields_change(self):
+        product = self.product('Green Tea', category=self.tea)
+        Product.objects.update(search_vector=None)
+
+        self.tea.description = 'Dried leaves'
+        self.tea.save()
+        product.price = Decimal('3.00')
+        product.save()
+        self.assertIsNone(Product.objects.get().search_vector)
+
+        self.tea.name = 'Herbal'
+        self.tea.save()
+        self.assertEqual(self.search('herbal'), [product])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class SubCategoryLookupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+        create_catalog(self.user, 3)
+        self.category = Category.objects.get(name='Category 0')
+        SubCategory.objects.bulk_create([
+            SubCategory(
+                owner=self.user, name=f'Soda {index:02d}', image='sub-categories/test.jpg', category=self.category,
+                description='Sub-Category',
+            )
+            for index in range(30)
+        ])
+
+    def lookup(self, **params):
+        response = self.client.get(reverse('sub_category_lookup'), params)
+        return [result['name'] for result in response.json()['results']]
+
+    def test_prefix_matches_within_the_category(self):
+        self.assertEqual(self.lookup(category=self.category.pk, q='soda 1')[:2], ['Soda 10', 'Soda 11'])
+        self.assertEqual(len(self.lookup(category=self.category.pk, q='SODA')), SubCategoryLookupView.limit)
+        self.assertEqual(self.lookup(category=self.category.pk, q='Sub'), ['Sub-Category 0'])
+        self.assertEqual(self.lookup(q='Sub-Category 2'), ['Sub-Category 2'])
+
+        other = User.objects.create_user(username='other', password='password')
+        self.client.force_login(other)
+        self.assertEqual(self.lookup(q='Soda'), [])
+
+    def test_product_form_renders_only_the_selected_sub_category(self):
+        product = Product.objects.get(name='Product 1')
+        response = self.client.get(reverse('product_update', args=[product.pk]))
+        self.assertContains(response, 'Sub-Category 1')
+        self.assertNotContains(response, 'Soda 00')
+        self.assertContains(response, 'dashboard/js/lazy-select.js')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class OwnerCrudTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+        create_catalog(self.user, 1)
+        self.product = Product.objects.get()
+
+    def test_other_owners_objects_are_not_found(self):
+        other = User.objects.create_user(username='other', password='password')
+        self.client.force_login(other)
+        for url_name, obj in [
+            ('product_update', self.product),
+            ('product_delete', self.product),
+            ('category_update', self.product.category),
+            ('sub_category_delete', self.product.sub_category),
+        ]:
+            with self.subTest(url_name=url_name):
+                # Rendered by the project's not found handler
+                response = self.client.get(reverse(url_name, args=[obj.pk]))
+                self.assertTemplateUsed(response, 'dashboard/pages/404.html')
+        self.assertTrue(Product.objects.filter(pk=self.product.pk).exists())
+
+    def test_delete_flashes_its_message(self):
+        response = self.client.post(reverse('product_delete', args=[self.product.pk]), follow=True)
+        self.assertContains(response, 'Product Deleted successfully!')
+        self.assertFalse(Product.objects.exists())
+
+    def test_views_over_budget_raise(self):
+        class TightCategoryListView(CategoryListView):
+            query_budget = 0
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'budget of 0'):
+            TightCategoryListView.as_view()(request)
+
+    def test_image_uploads_fit_their_budgets(self):
+        # Stored through the content-addressed storage, whose bookkeeping the upload budgets allow for
+        storages = {**TEST_STORAGES, 'default': {'BACKEND': 'dashboard.storage.ContentAddressedStorage'}}
+        category, sub_category = self.product.category_id, self.product.sub_category_id
+        product = {'description': 'Product', 'category': category, 'sub_category': sub_category, 'price': '1'}
+        requests = [
+            ('category_create', [], {'description': 'Category'}),
+            ('category_update', [category], {'description': 'Category'}),
+            ('sub_category_create', [], {'description': 'Sub', 'category': category}),
+            ('sub_category_update', [sub_category], {'description': 'Sub', 'category': category}),
+            ('product_create', [], product),
+            ('product_update', [self.product.pk], product),
+        ]
+        with tempfile.TemporaryDirectory() as directory, override_settings(STORAGES=storages, MEDIA_ROOT=directory):
+            # New images each time; the second updates also release the images the first stored
+            for size, (url_name, args, data) in enumerate(requests * 2, start=16):
+                with self.subTest(url_name, size=size):
+                    # Cold caches: the session and the form choices are read from the database
+                    for alias in settings.CACHES:
+                        caches[alias].clear()
+                    data = {**data, 'name': f'Upload {size}', 'image': jpeg(size=size)}
+                    response = self.client.post(reverse(url_name, args=args), data)
+                    self.assertEqual(response.status_code, 302)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class SessionStorageTests(TestCase):
+    def test_requests_skip_the_session_table(self):
+        user = User.objects.create_user(username='owner', password='password')
+        for mode in ['cached-db', 'signed-cookies']:
+            with self.subTest(mode), override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[mode]):
+                client = Client()
+                client.force_login(user)
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.post(reverse('customer_create'), {'name': mode, 'phone': f'+1555{len(mode):07d}'})
+                    response = client.get(response.url)
+                    statements = [query['sql'] for query in queries]
+
+                self.assertContains(response, 'Customer created successfully!')
+                self.assertFalse([sql for sql in statements if '"django_session"' in sql])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+        create_catalog(self.user, 2)
+
+    def test_requests_report_their_timings(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=directory):
+                with self.assertLogs('dashboard.profiling', 'INFO') as logs:
+                    response = self.client.get(reverse('products'))
+
+            timing = response['Server-Timing']
+            self.assertRegex(timing, r'db;dur=[\d.]+;desc="Database \(\d+ queries\)"')
+            self.assertIn('tpl;dur=', timing)
+            self.assertRegex(timing, r'total;dur=[\d.]+$')
+
+            line = json.loads(logs.records[0].getMessage())
+            self.assertEqual((line['view'], line['status']), ('products', 200))
+            self.assertGreater(line['queries'], 0)
+
+            [dump] = os.listdir(directory)
+            self.assertTrue(dump.startswith(time.strftime('%Y')) and '-products-' in dump)
+            pstats.Stats(os.path.join(directory, dump))
+
+    def test_overlapping_samples_are_only_timed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=directory):
+                # Another request is being profiled
+                with _profiler_lock:
+                    response = self.client.get(reverse('products'))
+                self.assertIn('total;dur=', response['Server-Timing'])
+
+                # Another profiler is active in the process
+                active = ValueError('Another profiling tool is already active')
+                with mock.patch('cProfile.Profile.enable', side_effect=active):
+                    response = self.client.get(reverse('products'))
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(_profiler_lock.locked())
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('products'))
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(STORAGES=TEST_STORAGES, METRICS=True, METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+        create_catalog(self.user, 2)
+
+    def test_requests_are_exported_per_view(self):
+        self.client.get(reverse('products'))
+        self.client.get(reverse('products'))
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertContains(response, '# TYPE denvow_request_duration_seconds histogram')
+        self.assertRegex(
+            response.content.decode(), r'denvow_request_duration_seconds_bucket\{view="products",method="GET",le="\+Inf"\} [2-9]'
+        )
+        self.assertContains(response, 'denvow_db_queries_total{view="products"}')
+        self.assertContains(response, 'denvow_response_size_bytes_count{view="products"}')
+
+    def test_processes_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, 'metrics-1-1.json'), 'w') as file:
+                json.dump({REQUEST_DURATION.name: [[['products', 'GET'], [1] + [0] * 11 + [0.004]]]}, file)
+
+            local = Registry(METRICS)
+            local.observe(REQUEST_DURATION, ('products', 'GET'), 0.2)
+            totals = local.collect()[REQUEST_DURATION.name][('products', 'GET')]
+            # The directory is removed, nothing to flush at exit
+            local.path = None
+
+        self.assertEqual(sum(totals[:-1]), 2)
+        self.assertAlmostEqual(totals[-1], 0.204)
+
+    def test_cache_reads_are_counted(self):
+        cache = InstrumentedCache(None, {'OPTIONS': {'CACHE': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'metrics-test',
+        }}})
+
+        def reads():
+            return registry.collect()[CACHE_REQUESTS.name]
+
+        before = reads()
+        self.assertEqual(cache.get_or_set('choices-version:1', 5), 5)
+        self.assertEqual(cache.get('choices-version:1'), 5)
+        self.assertIsNone(cache.get('template.cache.dashboard_logo.0123abcd'))
+        after = reads()
+
+        def delta(group, result):
+            return after.get((group, result), 0) - before.get((group, result), 0)
+
+        self.assertEqual((delta('choices-version', 'hit'), delta('choices-version', 'miss')), (1, 1))
+        self.assertEqual(delta('template.cache.dashboard_logo', 'miss'), 1)
+
+
+class ConnectionPoolTests(TestCase):
+    def pooled_connection(self):
+        settings_dict = {
+            **connection.settings_dict, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {**connection.settings_dict['OPTIONS'], 'pool': {'max_size': 1, 'timeout': 0.1}},
+        }
+        # Under the default alias, which django.contrib.postgres looks up on connecting
+        pooled = DatabaseWrapper(settings_dict)
+        self.addCleanup(pooled.close)
+        return pooled
+
+    def backend_pid(self, pooled):
+        pooled.ensure_connection()
+        return pooled.connection.info.backend_pid
+
+    def test_closed_connections_are_lent_again(self):
+        self.addCleanup(close_pools)
+        first, second = self.pooled_connection(), self.pooled_connection()
+
+        backend_pid = self.backend_pid(first)
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()
+
+        first.close()
+        self.assertEqual(self.backend_pid(second), backend_pid)
+
+    def test_dropped_connections_are_replaced(self):
+        self.addCleanup(close_pools)
+        pooled = self.pooled_connection()
+        backend_pid = self.backend_pid(pooled)
+        pooled.close()
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [backend_pid])
+        self.assertNotEqual(self.backend_pid(pooled), backend_pid)
+        with pooled.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def test_the_example_environment_can_enable_the_pool(self):
+        example = Config(RepositoryEnv(settings.BASE_DIR / '.env.example'))
+        pooled = DatabaseWrapper({
+            **connection.settings_dict, 'CONN_MAX_AGE': example('DATABASE_CONN_MAX_AGE', cast=int),
+            'OPTIONS': {**connection.settings_dict['OPTIONS'], 'pool': True},
+        })
+        self.assertEqual(pooled.pool_options, DEFAULT_POOL_OPTIONS)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.today = datetime.date(2024, 3, 31)
+
+    def record(self, date: datetime.date, revenue: str, items: int = 1):
+        when = datetime.datetime.combine(date, datetime.time(12), tzinfo=datetime.timezone.utc)
+        record_sale(self.user.pk, when, Decimal(revenue), items)
+
+    def test_sales_increment_one_row_per_day(self):
+        self.record(self.today, '10.50', items=2)
+        self.record(self.today, '4.50', items=1)
+
+        rollup = DailySalesRollup.objects.get(owner=self.user)
+        self.assertEqual((rollup.orders, rollup.items, rollup.revenue), (2, 3, Decimal('15.00')))
+
+    def test_previous_period_covers_the_same_span(self):
+        self.assertEqual(
+            period_ranges('month', self.today),
+            ((datetime.date(2024, 3, 1), self.today), (datetime.date(2024, 2, 1), datetime.date(2024, 2, 29))),
+        )
+        self.assertEqual(
+            period_ranges('year', datetime.date(2024, 2, 10))[1],
+            (datetime.date(2023, 1, 1), datetime.date(2023, 2, 10)),
+        )
+
+    def test_kpis_read_the_selected_periods(self):
+        self.record(self.today, '30')
+        self.record(self.today - datetime.timedelta(days=1), '10')
+        self.record(datetime.date(2024, 2, 15), '20')
+        self.record(datetime.date(2023, 3, 1), '500')
+
+        kpis = get_kpis(self.user, {'sales': 'today', 'revenue': 'month', 'customers': 'bogus'}, today=self.today)
+
+        self.assertEqual((kpis['sales']['value'], kpis['sales']['change']), (1, 0))
+        self.assertEqual((kpis['revenue']['value'], kpis['revenue']['change']), (Decimal('40'), 100))
+        self.assertEqual(kpis['customers']['period'], 'year')
+        self.assertIsNone(kpis['customers']['change'])
+
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+        create_catalog(self.user, 3)
+        stock_catalog(self.user)
+        self.products = list(Product.objects.order_by('pk'))
+        for index, product in enumerate(self.products, start=1):
+            product.price = Decimal(index) + Decimal('0.50')
+            product.save()
+
+    def test_checkout_writes_order_ledger_and_rollup(self):
+        first, second, _ = self.products
+        order = checkout(self.user, {first.pk: 2, second.pk: 1})
+
+        self.assertEqual((order.items, order.total), (3, Decimal('5.50')))
+        self.assertEqual(sorted(order.lines.values_list('name', 'quantity')), [(first.name, 2), (second.name, 1)])
+        self.assertEqual(
+            list(with_stock(Product.objects.order_by('pk')).values_list('stock', flat=True)), [98, 99, 100]
+        )
+        rollup = DailySalesRollup.objects.get(owner=self.user)
+        self.assertEqual((rollup.orders, rollup.items, rollup.revenue), (1, 3, Decimal('5.50')))
+
+    def test_round_trips_do_not_grow_with_lines(self):
+        # Warm the day's rollup row, so both checkouts update it in place
+        checkout(self.user, {self.products[0].pk: 1})
+
+        # savepoint, locked prices, stock, order, lines, stock movements, rollup, release
+        for products in (self.products[:2], self.products):
+            with self.subTest(lines=len(products)), self.assertNumQueries(8):
+                checkout(self.user, {product.pk: 1 for product in products})
+
+    def test_checkout_beyond_the_stock_writes_nothing(self):
+        first, second, _ = self.products
+        checkout(self.user, {first.pk: 99})
+
+        with self.assertRaisesMessage(ValidationError, 'Not enough stock: Product 0 (1 left).'):
+            checkout(self.user, {first.pk: 2, second.pk: 1})
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(StockMovement.objects.filter(kind=StockMovement.Kind.SALE).count(), 1)
+        self.assertEqual(DailySalesRollup.objects.get(owner=self.user).orders, 1)
+
+        # The stock level counts snapshots as well as later movements
+        take_snapshots()
+        checkout(self.user, {first.pk: 1})
+        self.assertEqual(stock_level(first), 0)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_order_list_pages_past_the_first_page(self):
+        Order.objects.bulk_create([
+            Order(owner=self.user, total=Decimal('1.00')) for _ in range(OrderListView.paginate_by + 3)
+        ])
+        # Ties on the time, told apart by `id`
+        Order.objects.filter(pk__in=Order.objects.order_by('pk').values('pk')[:5]).update(created_at=timezone.now())
+
+        orders = list(Order.objects.order_by('-created_at', '-id'))
+        self.assertEqual(page_through(self.client, reverse('orders')), orders)
+
+    def test_json_checkout_rejects_other_owners_products(self):
+        other = User.objects.create_user(username='other', password='password')
+        create_catalog(other, 1)
+        foreign = Product.objects.get(owner=other)
+
+        response = self.client.post(
+            reverse('checkout'), json.dumps({'lines': [{'product': foreign.pk, 'quantity': 1}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+        response = self.client.post(
+            reverse('checkout'), json.dumps({'lines': [{'product': self.products[0].pk, 'quantity': 3}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total'], '4.50')
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_sell_the_same_units(self):
+        user = User.objects.create_user(username='owner', password='password')
+        create_catalog(user, 1)
+        stock_catalog(user, quantity=1)
+        product = Product.objects.get()
+        errors = []
+
+        def buy():
+            try:
+                checkout(user, {product.pk: 1})
+            except ValidationError as error:
+                errors.extend(error.messages)
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            checkout(user, {product.pk: 1})
+            # Waits for the product, then sees it sold out
+            thread = threading.Thread(target=buy)
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+
+        self.assertEqual(errors, ['Not enough stock: Product 0 (0 left).'])
+        self.assertEqual(stock_level(product), 0)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CustomerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+        create_catalog(self.user, 1)
+        stock_catalog(self.user)
+        self.product = Product.objects.get()
+        Product.objects.update(price=Decimal('10.00'))
+        self.customer = Customer.objects.create(
+            owner=self.user, name='Ada', phone='+15550102030', email='Ada@Example.com'
+        )
+
+    def test_lookup_by_phone_or_email(self):
+        self.assertEqual(find_customer(self.user, '+1 (555) 010-2030'), self.customer)
+        self.assertEqual(find_customer(self.user, 'ada@example.COM'), self.customer)
+        self.assertIsNone(find_customer(self.user, '5550102030'))
+
+        other = User.objects.create_user(username='other', password='password')
+        self.assertIsNone(find_customer(other, 'ada@example.com'))
+
+        response = self.client.get(reverse('customer_lookup'), {'q': '0102'})
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.customer.pk])
+
+    def test_duplicate_contacts_are_form_errors(self):
+        response = self.client.post(reverse('customer_create'), {'name': 'Ada 2', 'phone': '+1 555 010 2030'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('customer_create'), {'name': 'Ada 3', 'email': 'ADA@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_first_customer_of_the_day_fits_the_budget(self):
+        newcomer = User.objects.create_user(username='newcomer', password='password')
+        self.client.force_login(newcomer)
+        response = self.client.post(reverse('customer_create'), {'name': 'Grace', 'phone': '+15550109999'})
+        self.assertRedirects(response, reverse('customers'), fetch_redirect_response=False)
+        self.assertEqual(DailySalesRollup.objects.get(owner=newcomer).new_customers, 1)
+
+    def test_partial_payment_leaves_dues(self):
+        checkout(self.user, {self.product.pk: 3}, customer=self.customer, paid=Decimal('12.00'))
+        self.customer.refresh_from_db()
+        self.assertEqual(
+            (self.customer.orders, self.customer.total_spent, self.customer.dues), (1, Decimal('30.00'), Decimal('18.00'))
+        )
+
+        with self.assertRaises(ValidationError):
+            checkout(self.user, {self.product.pk: 1}, paid=Decimal('0'))
+
+        with self.assertRaises(ValidationError):
+            record_payment(self.customer, Decimal('18.01'))
+        record_payment(self.customer, Decimal('18.00'), note='cash')
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.dues, Decimal('0.00'))
+
+    def test_dues_report_lists_largest_dues_first(self):
+        other = Customer.objects.create(owner=self.user, name='Grace', phone='5550001111')
+        Customer.objects.create(owner=self.user, name='Linus', phone='5550002222')
+        checkout(self.user, {self.product.pk: 1}, customer=self.customer, paid=Decimal('5.00'))
+        checkout(self.user, {self.product.pk: 2}, customer=other, paid=Decimal('0'))
+
+        response = self.client.get(reverse('dues_report'))
+        self.assertEqual([customer.name for customer in response.context['object_list']], ['Grace', 'Ada'])
+
+        response = self.client.post(reverse('customer_payment', args=[other.pk]), {'amount': '20.00'})
+        self.assertRedirects(response, reverse('dues_report'))
+        response = self.client.get(reverse('dues_report'))
+        self.assertEqual([customer.name for customer in response.context['object_list']], ['Ada'])
+
+    def test_reports_page_past_the_first_page(self):
+        # Equal dues and totals, told apart by `id`
+        Customer.objects.bulk_create([
+            Customer(owner=self.user, name=f'Customer {index}', dues=Decimal(index % 4) + Decimal('0.25'),
+                     total_spent=Decimal(index % 3) * Decimal('10.10'))
+            for index in range(DuesReportView.paginate_by + 3)
+        ])
+        customers = Customer.objects.filter(owner=self.user)
+        for url_name, expected in [
+            ('dues_report', customers.filter(dues__gt=0).order_by('-dues', '-id')),
+            ('customer_report', customers.order_by('-total_spent', '-id')),
+        ]:
+            with self.subTest(url_name):
+                self.assertEqual(page_through(self.client, reverse(url_name)), list(expected))
+
+    def test_search_pages_keep_tied_ranks(self):
+        for name in ['Adamo King', 'Adamo King', 'Adamo King', 'Adams', 'Adams', 'Adamski']:
+            Customer.objects.create(owner=self.user, name=name)
+        ranked = list(search_contacts(Customer.objects.filter(owner=self.user), 'adamos').order_by('-rank', 'id'))
+        ranks = [customer.rank for customer in ranked]
+        self.assertTrue(all(rank < 1 for rank in ranks))
+        self.assertLess(len(set(ranks)), len(ranks))
+
+        with mock.patch.object(CustomerListView, 'paginate_by', 2):
+            self.assertEqual(page_through(self.client, reverse('customers'), query='adamos'), ranked)
+
+    def test_new_customers_are_counted_in_the_rollup(self):
+        Customer.objects.create(owner=self.user, name='Grace')
+        rollup = DailySalesRollup.objects.get(owner=self.user)
+        self.assertEqual(rollup.new_customers, 2)
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        create_catalog(self.user, 2)
+        self.product, self.other = Product.objects.order_by('pk')
+
+    def move(self, quantity: int, kind=StockMovement.Kind.ADJUSTMENT, product=None):
+        StockMovement.objects.create(owner=self.user, product=product or self.product, kind=kind, quantity=quantity)
+
+    def test_stock_is_snapshot_plus_later_movements(self):
+        self.move(10, StockMovement.Kind.PURCHASE)
+        self.move(-3, StockMovement.Kind.SALE)
+        self.assertEqual(take_snapshots(), 1)
+
+        snapshot = StockSnapshot.objects.get()
+        self.assertEqual(snapshot.quantity, 7)
+
+        self.move(2, StockMovement.Kind.RETURN)
+        self.assertEqual(stock_level(self.product), 9)
+        self.assertEqual(stock_level(self.other), 0)
+
+        # Only products that moved get a new snapshot
+        self.assertEqual(take_snapshots(), 1)
+        self.assertEqual(StockSnapshot.objects.order_by('-id').first().quantity, 9)
+        self.assertEqual(take_snapshots(), 0)
+
+    def test_movements_are_append_only(self):
+        self.move(5)
+        movement = StockMovement.objects.get()
+        movement.quantity = 50
+        with self.assertRaises(ValueError):
+            movement.save()
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_stock_report_reads_snapshots(self):
+        self.client.force_login(self.user)
+        self.move(4)
+        take_snapshots()
+        self.move(1)
+
+        response = self.client.get(reverse('stock_report'))
+        self.assertEqual([product.snapshot_quantity for product in response.context['object_list']], [4, 0])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PurchasingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.client.force_login(self.user)
+        create_catalog(self.user, 3)
+        self.products = list(Product.objects.order_by('pk'))
+        self.supplier = Supplier.objects.create(owner=self.user, name='Acme Wholesale', phone='5550103040')
+
+    def purchase(self, rows):
+        lines = parse_purchase_lines(self.user, enumerate(rows, start=2))
+        return create_purchase_order(self.user, self.supplier, lines)
+
+    def test_lines_are_matched_by_id_or_name(self):
+        first, second, _ = self.products
+        lines = parse_purchase_lines(self.user, [
+            (2, {'product': str(first.pk), 'quantity': '5', 'unit_cost': '1.25'}),
+            (3, {'product': second.name, 'quantity': '2', 'unit_cost': '3'}),
+        ])
+        self.assertEqual([(line.product_id, line.total) for line in lines], [(first.pk, Decimal('6.25')), (second.pk, Decimal('6.00'))])
+
+        with self.assertRaises(ValidationError) as raised:
+            parse_purchase_lines(self.user, [
+                (2, {'product': 'Missing', 'quantity': '1', 'unit_cost': '1'}),
+                (3, {'product': first.name, 'quantity': '0', 'unit_cost': '1'}),
+            ])
+        self.assertEqual(len(raised.exception.messages), 2)
+
+    def test_names_several_products_share_are_rejected(self):
+        first, second, _ = self.products
+        Product.objects.filter(pk=second.pk).update(name=first.name)
+
+        with self.assertRaisesMessage(ValidationError, 'several products are named'):
+            parse_purchase_lines(self.user, [(2, {'product': first.name, 'quantity': '1', 'unit_cost': '1'})])
+        lines = parse_purchase_lines(self.user, [(2, {'product': str(second.pk), 'quantity': '1', 'unit_cost': '1'})])
+        self.assertEqual(lines[0].product_id, second.pk)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_lists_page_past_the_first_page(self):
+        PurchaseOrder.objects.bulk_create([
+            PurchaseOrder(owner=self.user, supplier=self.supplier) for _ in range(PurchaseOrderListView.paginate_by + 3)
+        ])
+        # Ties on the time, told apart by `id`
+        first = PurchaseOrder.objects.order_by('pk').values('pk')[:5]
+        PurchaseOrder.objects.filter(pk__in=first).update(created_at=timezone.now())
+        purchase_orders = list(PurchaseOrder.objects.order_by('-created_at', '-id'))
+        self.assertEqual(page_through(self.client, reverse('purchase_orders')), purchase_orders)
+
+        for name in ['Acme Wholesalers', 'Acme Wholesalers', 'Acme Wholesalers', 'Acme Trading', 'Acme Trading']:
+            Supplier.objects.create(owner=self.user, name=name)
+        ranked = list(search_contacts(Supplier.objects.filter(owner=self.user), 'acmes').order_by('-rank', 'id'))
+        self.assertTrue(all(supplier.rank < 1 for supplier in ranked))
+        with mock.patch.object(SupplierListView, 'paginate_by', 2):
+            self.assertEqual(page_through(self.client, reverse('suppliers'), query='acmes'), ranked)
+
+    def test_receive_writes_one_movement_per_product_once(self):
+        first, second, _ = self.products
+        purchase_order = self.purchase([
+            {'product': first.pk, 'quantity': 4, 'unit_cost': 1},
+            {'product': second.pk, 'quantity': 2, 'unit_cost': 1},
+            {'product': first.pk, 'quantity': 1, 'unit_cost': 1},
+        ])
+        self.assertEqual((purchase_order.lines_count, purchase_order.items), (3, 7))
+
+        self.assertEqual(receive_purchase_order(purchase_order), 2)
+        self.assertEqual((stock_level(first), stock_level(second)), (5, 2))
+        self.assertEqual(
+            StockMovement.objects.filter(purchase_order=purchase_order, kind=StockMovement.Kind.PURCHASE).count(), 2
+        )
+
+        with self.assertRaises(ValidationError):
+            receive_purchase_order(PurchaseOrder.objects.get(pk=purchase_order.pk))
+        self.assertEqual(stock_level(first), 5)
+
+    def test_receive_round_trips_do_not_grow_with_lines(self):
+        # savepoint, status update, movements insert, release
+        for count in (2, 2000):
+            rows = [{'product': self.products[index % 3].pk, 'quantity': 1, 'unit_cost': 1} for index in range(count)]
+            purchase_order = self.purchase(rows)
+            with self.subTest(lines=count), self.assertNumQueries(4):
+                receive_purchase_order(purchase_order)
+        self.assertEqual(stock_level(self.products[0]), 1 + 667)
+
+    def test_upload_and_supplier_pages(self):
+        upload = BytesIO(f'Product,Quantity,Unit Cost\n{self.products[0].name},3,2.50\n'.encode())
+        upload.name = 'delivery.csv'
+        response = self.client.post(reverse('purchase_order_create'), {'supplier': self.supplier.pk, 'file': upload})
+        purchase_order = PurchaseOrder.objects.get()
+        self.assertRedirects(response, reverse('purchase_order_detail', args=[purchase_order.pk]))
+        self.assertEqual(purchase_order.total, Decimal('7.50'))
+
+        response = self.client.post(reverse('purchase_order_receive', args=[purchase_order.pk]))
+        self.assertEqual(stock_level(self.products[0]), 3)
+
+        response = self.client.get(reverse('suppliers'), {'query': '0103'})
+        self.assertContains(response, 'Acme Wholesale')
+        response = self.client.get(reverse('supplier_export'))
+        self.assertIn('Acme Wholesale', b''.join(response.streaming_content).decode())
+
+
+class SalesReportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        create_catalog(self.user, 2)
+        stock_catalog(self.user)
+        self.first, self.second = Product.objects.order_by('pk')
+        Product.objects.update(price=Decimal('2.00'))
+        self.day = datetime.date(2024, 3, 4)
+
+    def sell(self, day: datetime.date, hour: int, quantities: dict):
+        order = checkout(self.user, quantities)
+        created_at = datetime.datetime.combine(day, datetime.time(hour), tzinfo=datetime.timezone.utc)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+
+    def test_report_merges_buckets_with_recent_orders(self):
+        next_day = self.day + datetime.timedelta(days=1)
+        self.sell(self.day, 9, {self.first.pk: 2, self.second.pk: 1})
+        self.sell(self.day, 10, {self.first.pk: 1})
+        self.assertEqual(aggregate_sales(), 2)
+
+        # Not aggregated yet: read from the orders
+        self.sell(next_day, 9, {self.first.pk: 4})
+
+        rows = list(report_rows(self.user, self.day, next_day, 'day', 'product'))
+        self.assertEqual([(row[1], row[2], row[3]) for row in rows], [
+            (self.first.name, 3, Decimal('6.00')),
+            (self.second.name, 1, Decimal('2.00')),
+            (self.first.name, 4, Decimal('8.00')),
+        ])
+
+        hourly = list(report_rows(self.user, self.day, self.day, 'hour', 'total'))
+        self.assertEqual([row[2] for row in hourly], [3, 1])
+
+        totals = report_totals(self.user, self.day, next_day)
+        self.assertEqual((totals['quantity'], totals['revenue'], totals['lines']), (8, Decimal('16.00'), 4))
+
+    def test_aggregation_never_counts_an_order_twice(self):
+        self.sell(self.day, 9, {self.first.pk: 2})
+        aggregate_sales()
+        self.sell(self.day, 9, {self.first.pk: 3})
+        self.assertEqual(aggregate_sales(batch_size=1), 1)
+        self.assertEqual(aggregate_sales(), 0)
+
+        buckets = SalesBucket.objects.order_by('span').values_list('span', 'quantity', 'lines')
+        self.assertEqual(list(buckets), [('day', 5, 2), ('hour', 5, 2)])
+
+        self.assertEqual(rebuild_sales_buckets(), 2)
+        self.assertEqual(list(buckets), [('day', 5, 2), ('hour', 5, 2)])
+
+    def test_category_breakdown_follows_the_products_current_category(self):
+        self.sell(self.day, 9, {self.first.pk: 2, self.second.pk: 1})
+        aggregate_sales()
+        self.sell(self.day, 10, {self.first.pk: 1})
+
+        # Aggregated and recent sales of the moved product land in one row
+        Product.objects.filter(pk=self.first.pk).update(category=self.second.category)
+        rows = list(report_rows(self.user, self.day, self.day, 'day', 'category'))
+        self.assertEqual([(row[1], row[2]) for row in rows], [('Category 1', 4)])
+
+        Product.objects.filter(pk=self.second.pk).delete()
+        rows = list(report_rows(self.user, self.day, self.day, 'day', 'category'))
+        self.assertEqual([(row[1], row[2]) for row in rows], [('', 1), ('Category 1', 3)])
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_report_page_and_export(self):
+        self.client.force_login(self.user)
+        self.sell(self.day, 9, {self.first.pk: 2})
+        query = {'start': self.day, 'end': self.day, 'granularity': 'week', 'breakdown': 'category'}
+
+        response = self.client.get(reverse('sales_report'), query)
+        self.assertContains(response, 'Category 0')
+
+        response = self.client.get(reverse('sales_report_export'), query)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines()[1],
+            '2024-03-04T00:00:00+00:00,Category 0,2,4.00,1',
+        )
+
+
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        media = override_settings(STORAGES=TEST_STORAGES, MEDIA_ROOT=os.path.join(self.directory.name, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+
+        images = os.path.join(self.directory.name, 'images')
+        os.mkdir(images)
+        self.image = write_images(images, 1, size=32)[0]
+        self.images = ImageSource(images)
+        self.addCleanup(self.images.close)
+
+    def run_import(self, importer_class, rows: list):
+        return importer_class(self.user, self.images).run(enumerate(rows, start=1))
+
+    def import_tree(self):
+        self.run_import(CategoryImporter, [
+            {'name': name, 'description': name, 'image': self.image} for name in ('Tea', 'Coffee')
+        ])
+        self.run_import(SubCategoryImporter, [
+            {'name': 'Classic', 'category': category, 'description': 'Classic', 'image': self.image}
+            for category in ('Tea', 'Coffee')
+        ])
+
+    def test_rows_create_then_update(self):
+        self.import_tree()
+        row = {
+            'name': 'Jasmine', 'category': 'tea', 'sub_category': 'Classic', 'price': '2.50',
+            'description': 'Green tea', 'image': self.image,
+        }
+        result = self.run_import(ProductImporter, [row])
+        self.assertEqual((result.created, result.updated, result.errors), (1, 0, []))
+
+        # Without an image the existing one is kept
+        result = self.run_import(ProductImporter, [{**row, 'price': '3.00', 'image': ''}])
+        self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+
+        product = Product.objects.get(owner=self.user)
+        self.assertEqual(product.price, Decimal('3.00'))
+        self.assertEqual(product.category.name, 'Tea')
+        self.assertEqual(product.sub_category.category, product.category)
+        self.assertTrue(product.image.name.startswith('products/'))
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        self.import_tree()
+        valid = {'name': 'Jasmine', 'category': 'Tea', 'price': '2', 'description': 'Tea', 'image': self.image}
+        result = self.run_import(ProductImporter, [
+            valid,
+            {**valid, 'name': 'Sencha', 'price': 'cheap'},
+            {**valid, 'name': 'Oolong', 'category': 'Juice'},
+            {**valid, 'name': 'Matcha', 'image': ''},
+            # Only the model's validators reject this
+            {**valid, 'name': 'Earl Grey', 'price': '-1'},
+            {**valid, 'name': ''},
+        ])
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual(sorted(line for line, _message in result.errors), [2, 3, 4, 5, 6])
+        self.assertIn('Error in Category: "Juice" does not exist.', dict(result.errors).values())
+        self.assertTrue(dict(result.errors)[5].startswith('Error in Price:'))
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['Jasmine'])
+
+    def test_sub_category_names_resolve_within_the_category(self):
+        self.import_tree()
+        tea, coffee = Category.objects.get(name='Tea'), Category.objects.get(name='Coffee')
+        row = {
+            'name': 'Espresso', 'category': 'Coffee', 'sub_category': 'Classic', 'price': '2',
+            'description': 'Coffee', 'image': self.image,
+        }
+
+        result = self.run_import(ProductImporter, [row, {**row, 'name': 'Mocha', 'category': ''}])
+        self.assertEqual(result.created, 1)
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(result.errors[0][0], 2)
+        self.assertIn('Several records are named "Classic"', result.errors[0][1])
+        self.assertEqual(Product.objects.get(name='Espresso').sub_category.category, coffee)
+
+        # A sub-category is matched on its category and name, leaving the other category's alone
+        result = self.run_import(SubCategoryImporter, [
+            {'name': 'Classic', 'category': 'Coffee', 'description': 'Roasted', 'image': ''},
+        ])
+        self.assertEqual((result.created, result.updated), (0, 1))
+        self.assertEqual(SubCategory.objects.get(category=coffee).description, 'Roasted')
+        self.assertEqual(SubCategory.objects.get(category=tea).description, 'Classic')
+
+
+def jpeg(name: str = 'upload.jpg', size: int = 32) -> ContentFile:
+    buffer = BytesIO()
+    Image.new('RGB', (size, size), (200, 80, 40)).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+class InlineExecutor:
+    # Runs submitted work in the calling thread, as a worker would
+    def submit(self, function, *args):
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class AsyncImageProcessingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        media = override_settings(STORAGES=TEST_STORAGES, MEDIA_ROOT=self.directory.name, IMAGE_PROCESSING='async')
+        media.enable()
+        self.addCleanup(media.disable)
+        executor = mock.patch('dashboard.image_processing.get_executor', return_value=InlineExecutor())
+        executor.start()
+        self.addCleanup(executor.stop)
+
+    def upload(self, name: str = 'Cola') -> Category:
+        category = Category(owner=self.user, name=name, description=name)
+        category.image.save('upload.jpg', jpeg(), save=True)
+        return category
+
+    def test_upload_is_stored_raw_then_processed_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = self.upload()
+            pending_name = category.image.name
+            self.assertTrue(is_pending(pending_name))
+            self.assertTrue(category.image.storage.exists(pending_name))
+
+        category.refresh_from_db()
+        self.assertFalse(is_pending(category.image.name))
+        self.assertTrue(category.image.name.startswith('categories/'))
+        self.assertFalse(category.image.storage.exists(pending_name))
+        with Image.open(category.image.path) as image:
+            self.assertEqual(image.size, (600, 600))
+        self.assertTrue(has_renditions(category.image))
+
+    def test_processed_file_only_replaces_the_upload_the_row_still_holds(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            category = self.upload()
+        pending_name = category.image.name
+        Category.objects.filter(pk=category.pk).update(image='categories/newer.jpg')
+
+        self.assertIsNone(process_image('dashboard', 'category', category.pk, 'image', pending_name))
+        category.refresh_from_db()
+        self.assertEqual(category.image.name, 'categories/newer.jpg')
+        self.assertFalse(category.image.storage.exists(pending_name))
+        self.assertEqual(os.listdir(os.path.join(self.directory.name, 'categories')), ['pending'])
+
+    def test_process_all_pending_recovers_unprocessed_uploads(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            categories = [self.upload('Cola'), self.upload('Tea')]
+
+        self.assertEqual(process_all_pending(), 2)
+        for category in categories:
+            category.refresh_from_db()
+            self.assertFalse(is_pending(category.image.name))
+        self.assertEqual(process_all_pending(), 0)
+
+    def test_upload_is_processed_in_process_without_a_worker_pool(self):
+        with mock.patch('dashboard.image_processing.get_executor', side_effect=RuntimeError):
+            with self.assertLogs('dashboard.image_processing', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    category = self.upload()
+
+        category.refresh_from_db()
+        self.assertFalse(is_pending(category.image.name))
+
+    @override_settings(IMAGE_PROCESSING='sync')
+    def test_sync_mode_processes_in_the_request(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            category = self.upload()
+            self.assertFalse(is_pending(category.image.name))
+        with Image.open(category.image.path) as image:
+            self.assertEqual(image.size, (600, 600))
+
+
+class RenditionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        media = override_settings(STORAGES=TEST_STORAGES, MEDIA_ROOT=self.directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def render(self, image) -> str:
+        template = Template('{% load custom_filters %}{% responsive_image image sizes="64px" alt="Cola" %}')
+        return template.render(Context({'image': image}))
+
+    def test_upload_generates_every_rendition(self):
+        category = Category(owner=self.user, name='Cola', description='Cola')
+        category.image.save('upload.jpg', jpeg(), save=True)
+
+        self.assertTrue(has_renditions(category.image))
+        for format in RENDITION_FORMATS:
+            for width in RENDITION_WIDTHS:
+                with self.subTest(format=format, width=width):
+                    file = rendition(category.image, width, format)
+                    self.assertTrue(file.storage.exists(file.name))
+                    with Image.open(file.path) as image:
+                        self.assertEqual((image.format, image.size), (format, (width, width)))
+
+    def test_tag_offers_the_renditions_through_srcset(self):
+        category = Category(owner=self.user, name='Cola', description='Cola')
+        category.image.save('upload.jpg', jpeg(), save=True)
+
+        html = self.render(category.image)
+        self.assertIn('<picture><source type="image/webp"', html)
+        for width in RENDITION_WIDTHS:
+            self.assertIn(f'{rendition(category.image, width, "WEBP").url} {width}w', html)
+            self.assertIn(f'{rendition(category.image, width, "JPEG").url} {width}w', html)
+        self.assertIn(f'src="{rendition(category.image, 160, "JPEG").url}"', html)
+        self.assertIn('sizes="64px" alt="Cola"', html)
+
+    def test_tag_falls_back_to_the_original_without_generating(self):
+        storage = Category._meta.get_field('image').storage
+        name = storage.save('categories/legacy.jpg', jpeg())
+        category = Category.objects.create(owner=self.user, name='Cola', description='Cola', image=name)
+
+        html = self.render(category.image)
+        self.assertEqual(html, f'<img src="{category.image.url}" alt="Cola" class="" loading="lazy">')
+        self.assertFalse(has_renditions(category.image))
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'CACHE')))
+
+    def test_tag_shows_a_placeholder_while_pending(self):
+        category = Category(owner=self.user, name='Cola', description='Cola', image='categories/pending/upload.jpg')
+        self.assertIn('dashboard/img/processing.svg', self.render(category.image))
+
+
+class MediaHandlerTestsMixin:
+    """
+    Requests media through a handler wrapped around an application answering
+    'app', as `denvow.wsgi` and `denvow.asgi` wrap Django's.
+    """
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.media_root = os.path.join(self.directory.name, 'media')
+        os.makedirs(os.path.join(self.media_root, 'products'))
+        for name in ('products/cola.jpg', f'products/{"ab" * 32}.jpg'):
+            with open(os.path.join(self.media_root, name), 'wb') as file:
+                file.write(self.content)
+        with open(os.path.join(self.directory.name, 'secret.txt'), 'w') as file:
+            file.write('secret')
+
+        media = override_settings(
+            STORAGES=TEST_STORAGES, MEDIA_ROOT=self.media_root, MEDIA_SERVE_MODE='django', MEDIA_CACHE_MAX_AGE=3600,
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def get(self, path: str, method: str = 'GET', **headers) -> tuple:
+        """
+        Parameters:
+        - path (str): The request path.
+        - method (str): The request method. Default is 'GET'.
+        - headers: Request headers, by lowercase name with underscores.
+
+        Returns:
+        tuple: The status code, the response headers and the body.
+        """
+        raise NotImplementedError
+
+    def test_serves_the_file_with_validators(self):
+        status, headers, body = self.get('/media/products/cola.jpg')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(headers['Content-Type'], 'image/jpeg')
+        self.assertEqual(headers['Content-Length'], str(len(self.content)))
+        self.assertEqual(headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=3600')
+        self.assertIn('ETag', headers)
+        self.assertIn('Last-Modified', headers)
+
+        status, headers, body = self.get(f'/media/products/{"ab" * 32}.jpg', method='HEAD')
+        self.assertEqual((status, body), (200, b''))
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_if_none_match_gives_304(self):
+        etag = self.get('/media/products/cola.jpg')[1]['ETag']
+        status, headers, body = self.get('/media/products/cola.jpg', if_none_match=etag)
+        self.assertEqual((status, body), (304, b''))
+        self.assertEqual(headers['ETag'], etag)
+
+        self.assertEqual(self.get('/media/products/cola.jpg', if_none_match='"stale"')[0], 200)
+
+    def test_if_modified_since_gives_304(self):
+        last_modified = self.get('/media/products/cola.jpg')[1]['Last-Modified']
+        status, _headers, body = self.get('/media/products/cola.jpg', if_modified_since=last_modified)
+        self.assertEqual((status, body), (304, b''))
+
+        earlier = 'Mon, 01 Jan 2001 00:00:00 GMT'
+        self.assertEqual(self.get('/media/products/cola.jpg', if_modified_since=earlier)[0], 200)
+
+    def test_single_range_gives_206(self):
+        status, headers, body = self.get('/media/products/cola.jpg', range='bytes=10-19')
+        self.assertEqual(status, 206)
+        self.assertEqual(body, self.content[10:20])
+        self.assertEqual(headers['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(headers['Content-Length'], '10')
+
+        status, headers, body = self.get('/media/products/cola.jpg', range='bytes=-16')
+        self.assertEqual((status, body), (206, self.content[-16:]))
+
+        # A validator that no longer matches sends the whole file
+        status, _headers, body = self.get('/media/products/cola.jpg', range='bytes=10-19', if_range='"stale"')
+        self.assertEqual((status, body), (200, self.content))
+
+    def test_unsatisfiable_range_gives_416(self):
+        status, headers, _body = self.get('/media/products/cola.jpg', range=f'bytes={len(self.content)}-')
+        self.assertEqual(status, 416)
+        self.assertEqual(headers['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_paths_outside_the_media_root_are_rejected(self):
+        for path in ('/media/../secret.txt', '/media/products/../../secret.txt', '/media/products', '/media/none.jpg'):
+            with self.subTest(path):
+                status, _headers, body = self.get(path)
+                self.assertEqual(status, 404)
+                self.assertNotIn(b'secret', body)
+
+    def test_unsafe_methods_are_not_allowed(self):
+        self.assertEqual(self.get('/media/products/cola.jpg', method='POST')[0], 405)
+
+    def test_x_accel_redirect_mode(self):
+        with override_settings(MEDIA_SERVE_MODE='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/'):
+            status, headers, body = self.get('/media/products/cola.jpg', range='bytes=0-9')
+        self.assertEqual((status, body), (200, b''))
+        self.assertEqual(headers['X-Accel-Redirect'], '/protected-media/products/cola.jpg')
+        self.assertIn('ETag', headers)
+
+    def test_x_sendfile_mode(self):
+        with override_settings(MEDIA_SERVE_MODE='x-sendfile'):
+            status, headers, body = self.get('/media/products/cola.jpg')
+        self.assertEqual((status, body), (200, b''))
+        self.assertEqual(headers['X-Sendfile'], os.path.join(self.media_root, 'products/cola.jpg'))
+
+    def test_other_paths_reach_the_application(self):
+        self.assertEqual(self.get('/dashboard/')[::2], (200, b'app'))
+
+
+class WSGIMediaHandlerTests(MediaHandlerTestsMixin, SimpleTestCase):
+    def get(self, path: str, method: str = 'GET', **headers) -> tuple:
+        def application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'app']
+
+        environ = RequestFactory()._base_environ(
+            PATH_INFO=path, REQUEST_METHOD=method,
+            **{f'HTTP_{name.upper()}': value for name, value in headers.items()},
+        )
+        started = {}
+
+        def start_response(status, response_headers):
+            started.update(status=int(status.split()[0]), headers=dict(response_headers))
+
+        response = MediaFilesHandler(application)(environ, start_response)
+        try:
+            body = b''.join(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return started['status'], started['headers'], body
+
+
+class ASGIMediaHandlerTests(MediaHandlerTestsMixin, SimpleTestCase):
+    def get(self, path: str, method: str = 'GET', **headers) -> tuple:
+        async def application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'app'})
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': method, 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+            'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()],
+        }
+        messages = []
+
+        async def run():
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The client stays connected, the handler stops listening once it responded
+                await asyncio.Event().wait()
+
+            async def send(message):
+                messages.append(message)
+
+            await ASGIMediaFilesHandler(application)(scope, receive, send)
+
+        async_to_sync(run)()
+        start = messages[0]
+        response_headers = {name.decode().title(): value.decode() for name, value in start['headers']}
+        response_headers = {name.replace('Etag', 'ETag'): value for name, value in response_headers.items()}
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        return start['status'], response_headers, body
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.storage = ContentAddressedStorage(location=self.directory.name)
+
+    def references(self, name: str) -> int:
+        return StoredFile.objects.filter(name=name).values_list('references', flat=True).first() or 0
+
+    def test_identical_bytes_are_stored_once(self):
+        first = self.storage.save('products/cola.jpg', ContentFile(b'cola'))
+        second = self.storage.save('categories/drinks.JPG', ContentFile(b'cola'))
+        other = self.storage.save('products/tea.jpg', ContentFile(b'tea'))
+
+        self.assertTrue(first.startswith('products/') and first.endswith('.jpg'))
+        self.assertEqual(os.path.basename(first), os.path.basename(second))
+        self.assertNotEqual(first, other)
+        self.assertEqual(os.listdir(os.path.join(self.directory.name, 'products')).count(os.path.basename(first)), 1)
+        self.assertEqual(self.storage.save('products/again.jpg', ContentFile(b'cola')), first)
+        self.assertEqual(self.references(first), 2)
+
+    def test_file_is_removed_with_its_last_reference_on_commit(self):
+        name = self.storage.save('products/cola.jpg', ContentFile(b'cola'))
+        self.storage.save('products/cola.jpg', ContentFile(b'cola'))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.storage.delete(name)
+        self.assertEqual((self.references(name), len(callbacks)), (1, 0))
+        self.assertTrue(self.storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+            self.assertTrue(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertFalse(self.storage.exists(name))
+
+        # Unreferenced files, such as field defaults, are left alone
+        with open(os.path.join(self.directory.name, 'default.png'), 'wb') as file:
+            file.write(b'default')
+        self.storage.delete('default.png')
+        self.assertTrue(self.storage.exists('default.png'))
+
+    def test_reupload_before_the_removal_keeps_the_file(self):
+        name = self.storage.save('products/cola.jpg', ContentFile(b'cola'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.storage.delete(name)
+        self.assertEqual(self.storage.save('products/cola.jpg', ContentFile(b'cola')), name)
+
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.references(name), 1)
+
+    def test_references_roll_back_with_the_transaction(self):
+        name = self.storage.save('products/cola.jpg', ContentFile(b'cola'))
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            self.storage.save('products/cola.jpg', ContentFile(b'cola'))
+            self.storage.save('products/tea.jpg', ContentFile(b'tea'))
+            1 / 0
+        self.assertEqual(self.references(name), 1)
+        self.assertEqual(list(StoredFile.objects.values_list('name', flat=True)), [name])
+
+    def test_reuse_processed_skips_released_files(self):
+        name = self.storage.save('products/cola.jpg', ContentFile(b'cola'))
+        self.storage.record_source(name, 'key')
+        self.assertEqual(self.storage.reuse_processed('key'), name)
+        self.assertEqual(self.references(name), 2)
+        self.assertIsNone(self.storage.reuse_processed('other'))
+
+
+
+class ContentAddressedStorageTransactionTests(TransactionTestCase):
+    def test_removal_waits_for_a_save_that_found_the_file_stored(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = ContentAddressedStorage(location=directory.name)
+        name = storage.save('products/cola.jpg', ContentFile(b'cola'))
+        StoredFile.objects.filter(name=name).delete()
+        removed = threading.Event()
+
+        def remove():
+            try:
+                storage.remove_unreferenced(name)
+                removed.set()
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            # Finds the file still stored, so only adds a reference
+            self.assertEqual(storage.save('products/cola.jpg', ContentFile(b'cola')), name)
+            thread = threading.Thread(target=remove)
+            thread.start()
+            self.assertFalse(removed.wait(0.5))
+        thread.join()
+
+        self.assertTrue(removed.is_set())
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+
+    def test_failed_row_save_rolls_back_its_image_reference(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storages = {**TEST_STORAGES, 'default': {'BACKEND': 'dashboard.storage.ContentAddressedStorage'}}
+        user = User.objects.create_user(username='owner', password='password')
+
+        with override_settings(STORAGES=storages, MEDIA_ROOT=directory.name):
+            # Stored and referenced while saving the row, whose insert then fails
+            category = Category(owner=user, name='Cola', description=None, image=jpeg())
+            with self.assertRaises(IntegrityError):
+                category.save()
+        self.assertFalse(StoredFile.objects.exists())
+
+
+class BenchmarkTests(TestCase):
+    def test_no_route_runs_more_queries(self):
+        # Wall time and memory depend on the machine, `manage.py benchmark_views` compares them
+        cache.clear()
+        regressions = find_regressions(run_benchmarks(repeat=1), load_baselines(), timings=False)
+        self.assertFalse(regressions, '\n'.join(regressions))
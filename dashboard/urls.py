@@ -3,7 +3,17 @@ from .views import DashboardView
 from .views import UserProfileView
 from .views import CategoryCreateView, CategoryListView, CategoryUpdateView, CategoryDeleteView
 from .views import SubCategoryCreateView, SubCategoryListView, SubCategoryUpdateView, SubCategoryDeleteView
+from .views import SubCategoryLookupView
 from .views import ProductCreateView, ProductListView, ProductUpdateView, ProductDeleteView
+from .views import CategoryExportView, SubCategoryExportView, ProductExportView
+from .views import CatalogImportView
+from .views import POSView, CheckoutView, OrderListView, OrderDetailView
+from .views import StockMovementListView, StockMovementCreateView, StockReportView
+from .views import SalesReportView, SalesReportExportView
+from .views import CustomerCreateView, CustomerListView, CustomerUpdateView, CustomerDeleteView, CustomerLookupView
+from .views import CustomerReportView, DuesReportView, PaymentCreateView
+from .views import SupplierCreateView, SupplierListView, SupplierUpdateView, SupplierDeleteView, SupplierExportView
+from .views import PurchaseOrderListView, PurchaseOrderCreateView, PurchaseOrderDetailView, PurchaseOrderReceiveView
 
 
 urlpatterns = [
@@ -13,16 +23,53 @@ urlpatterns = [
     path('categories/', CategoryListView.as_view(), name='categories'),
     path('category/<int:pk>/update/', CategoryUpdateView.as_view(), name='category_update'),
     path('category/<int:pk>/delete/', CategoryDeleteView.as_view(), name='category_delete'),
+    path('categories/export/', CategoryExportView.as_view(), name='category_export'),
 
     path('sub-category/create/', SubCategoryCreateView.as_view(), name="sub_category_create"),
     path('sub-categories/', SubCategoryListView.as_view(), name='sub_categories'),
     path('sub-category/<int:pk>/update/', SubCategoryUpdateView.as_view(), name='sub_category_update'),
     path('sub-category/<int:pk>/delete/', SubCategoryDeleteView.as_view(), name='sub_category_delete'),
+    path('sub-categories/export/', SubCategoryExportView.as_view(), name='sub_category_export'),
+    path('sub-categories/lookup/', SubCategoryLookupView.as_view(), name='sub_category_lookup'),
 
     path('product/create/', ProductCreateView.as_view(), name="product_create"),
     path('products/', ProductListView.as_view(), name='products'),
     path('product/<int:pk>/update/', ProductUpdateView.as_view(), name="product_update"),
     path('product/<int:pk>/delete/', ProductDeleteView.as_view(), name='product_delete'),
+    path('products/export/', ProductExportView.as_view(), name='product_export'),
+
+    path('pos/', POSView.as_view(), name='pos'),
+    path('pos/checkout/', CheckoutView.as_view(), name='checkout'),
+    path('orders/', OrderListView.as_view(), name='orders'),
+    path('order/<int:pk>/', OrderDetailView.as_view(), name='order_detail'),
+
+    path('inventory/', StockMovementListView.as_view(), name='inventory'),
+    path('inventory/movement/create/', StockMovementCreateView.as_view(), name='stock_movement_create'),
+    path('purchase-orders/', PurchaseOrderListView.as_view(), name='purchase_orders'),
+    path('purchase-order/create/', PurchaseOrderCreateView.as_view(), name='purchase_order_create'),
+    path('purchase-order/<int:pk>/', PurchaseOrderDetailView.as_view(), name='purchase_order_detail'),
+    path('purchase-order/<int:pk>/receive/', PurchaseOrderReceiveView.as_view(), name='purchase_order_receive'),
+
+    path('customer/create/', CustomerCreateView.as_view(), name='customer_create'),
+    path('customers/', CustomerListView.as_view(), name='customers'),
+    path('customer/<int:pk>/update/', CustomerUpdateView.as_view(), name='customer_update'),
+    path('customer/<int:pk>/delete/', CustomerDeleteView.as_view(), name='customer_delete'),
+    path('customer/<int:pk>/payment/', PaymentCreateView.as_view(), name='customer_payment'),
+    path('customers/lookup/', CustomerLookupView.as_view(), name='customer_lookup'),
+
+    path('supplier/create/', SupplierCreateView.as_view(), name='supplier_create'),
+    path('suppliers/', SupplierListView.as_view(), name='suppliers'),
+    path('supplier/<int:pk>/update/', SupplierUpdateView.as_view(), name='supplier_update'),
+    path('supplier/<int:pk>/delete/', SupplierDeleteView.as_view(), name='supplier_delete'),
+    path('suppliers/export/', SupplierExportView.as_view(), name='supplier_export'),
+
+    path('reports/customers/', CustomerReportView.as_view(), name='customer_report'),
+    path('reports/dues/', DuesReportView.as_view(), name='dues_report'),
+    path('reports/sales/', SalesReportView.as_view(), name='sales_report'),
+    path('reports/sales/export/', SalesReportExportView.as_view(), name='sales_report_export'),
+    path('reports/stock/', StockReportView.as_view(), name='stock_report'),
+
+    path('catalog/import/', CatalogImportView.as_view(), name='catalog_import'),
 
     path('profile/<str:username>/', UserProfileView.as_view(), name='profile'),
 ]
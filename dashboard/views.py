@@ -1,14 +1,38 @@
+import csv
+import datetime
+import io
+import itertools
+import json
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib import messages
-from django.core.exceptions import PermissionDenied
-from django.views.generic import TemplateView, CreateView, UpdateView, ListView, DeleteView
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.views.generic import View, TemplateView, CreateView, UpdateView, ListView, DetailView, DeleteView, FormView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
-from django.shortcuts import get_object_or_404
-from .forms import UserUpdateForm, SubCategoryForm, ProductForm
-from .models import Profile, Category, SubCategory, Product
+from django.utils import timezone
+from django.shortcuts import get_object_or_404, redirect
+from decimal import Decimal, InvalidOperation
+from .forms import UserUpdateForm, SubCategoryForm, ProductForm, StockMovementForm, CatalogImportForm, SalesReportForm
+from .forms import CustomerForm, PaymentForm, SupplierForm, PurchaseOrderForm
+from .models import Profile, Category, SubCategory, Product, Order, StockMovement, Customer, Supplier, PurchaseOrder
 from .sidebar import sidebar_data
 from .page_title import page_title_data
+from .mixins import OwnerCreateMixin, OwnerDeleteMixin, OwnerListMixin, OwnerUpdateMixin
+from .mixins import FormMessagesMixin, OwnerFormMixin, PageContextMixin
+from .pagination import KeysetPaginationMixin
+from .list_fields import get_model_fields, queryset_for_fields
+from .search import search_products, search_contacts
+from .export import get_export_header, csv_response
+from .importer import IMPORTERS, ImageSource, read_rows
+from .rollups import KPI_DEFAULT_PERIODS, PERIODS, get_kpis
+from .checkout import checkout, parse_quantities
+from .dues import find_customer, record_payment
+from .purchasing import create_purchase_order, parse_purchase_lines, receive_purchase_order
+from .inventory import with_snapshot, with_stock
+from .sales_report import BREAKDOWNS, report_rows, report_totals
 
 
 # Create your views here.
@@ -21,8 +45,21 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context["app_name"] = settings.APP_NAME
         context["sidebar_data"] = sidebar_data(section_active_id=1)
         context["page_title_data"] = page_title_data(name='Dashboard', path_sequence=['Home', 'Dashboard'])
+        context["kpis"] = self.get_kpis()
         return context
 
+    def get_kpis(self) -> dict:
+        kpis = get_kpis(self.request.user, {kpi: self.request.GET.get(kpi) for kpi in KPI_DEFAULT_PERIODS})
+
+        # Each card's filter links keep the periods selected on the other cards
+        selected = {kpi: card['period'] for kpi, card in kpis.items()}
+        for kpi, card in kpis.items():
+            card['filters'] = [
+                (label, '?' + urlencode({**selected, kpi: period}), period == card['period'])
+                for period, label in PERIODS.items()
+            ]
+        return kpis
+
 
 class UserProfileView(LoginRequiredMixin, UpdateView):
     model = Profile
@@ -75,451 +112,995 @@ class UserProfileView(LoginRequiredMixin, UpdateView):
         return context
 
 
-class CategoryCreateView(LoginRequiredMixin, CreateView):
+class CategoryCreateView(OwnerCreateMixin, CreateView):
     model = Category
     fields = ['image', 'name', 'description']
     template_name = 'dashboard/pages/product-management/create.html'
     success_url = reverse_lazy('categories')
+    success_message = 'Category created successfully!'
+    query_budget = 3
+    upload_query_budget = 8
 
-    def form_valid(self, form):
-        # Set the owner before calling form validation
-        form.instance.owner = self.request.user
+    title = "Create Category"
+    sidebar = (3, 1)
+    breadcrumb = ['Home', 'Product Management']
 
-        response = super().form_valid(form)
-        messages.success(self.request, 'Category created successfully!')
-        return response
 
-    def form_invalid(self, form):
-        response = super().form_invalid(form)
-        for field, errors in form.errors.items():
-            for error in errors:
-                if field == '__all__':
-                    messages.error(self.request, f'Error: {error}')
-                else:
-                    field_name = form.fields[field].label
-                    messages.error(self.request, f'Error in {field_name}: {error}')
-        return response
+class CategoryListView(OwnerListMixin, KeysetPaginationMixin, ListView):
+    model = Category
+    template_name = 'dashboard/pages/product-management/list.html'
+    ordering = ['name', 'id']  # Keyset order, `id` breaks ties between equal names
+    paginate_by = 50
+    query_budget = 4
+
+    title = "Categories"
+    sidebar = (3, 1)
+    breadcrumb = ['Home', 'Product Management']
+
+    # Specify the desired order of fields
+    field_order = ['id', 'image', 'name', 'description', 'last_update']
+
+    def get_queryset(self):
+        # Join and load only the columns the list displays
+        return queryset_for_fields(super().get_queryset(), self.field_order, extra_fields=self.ordering)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context["title"] = "Create Category"
-        context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=1)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        # Get model fields
+        context["model_fields"] = get_model_fields(Category, self.field_order)
+
+        context['create_url'] = 'category_create'
+        context['update_url'] = 'category_update'
+        context['delete_url'] = 'category_delete'
+        context['export_url'] = 'category_export'
+        context['import_kind'] = 'categories'
         return context
 
 
-class CategoryListView(LoginRequiredMixin, ListView):
+class CategoryUpdateView(OwnerUpdateMixin, UpdateView):
+    model = Category
+    fields = ['name', 'image', 'description']
+    template_name = 'dashboard/pages/product-management/update.html'
+    success_url = reverse_lazy('categories')
+    success_message = 'Category Updated successfully!'
+    permission_denied_message = 'You do not have permission to update this category.'
+    query_budget = 5
+    upload_query_budget = 12
+
+    title = "Category Update"
+    sidebar = (3, 1)
+    breadcrumb = ['Home', 'Product Management']
+
+
+class CategoryDeleteView(OwnerDeleteMixin, DeleteView):
     model = Category
+    template_name = 'dashboard/pages/product-management/delete.html'
+    success_url = reverse_lazy('categories')
+    success_message = 'Category Deleted successfully!'
+    permission_denied_message = 'You do not have permission to delete this category.'
+    query_budget = 9
+
+    title = "Category Delete"
+    sidebar = (3, 1)
+    breadcrumb = ['Home', 'Product Management']
+
+
+class SubCategoryCreateView(OwnerCreateMixin, CreateView):
+    model = SubCategory
+    form_class = SubCategoryForm
+    form_takes_user = True
+    template_name = 'dashboard/pages/product-management/create.html'
+    success_url = reverse_lazy('sub_categories')
+    success_message = 'Subcategory created successfully!'
+    query_budget = 4
+    upload_query_budget = 10
+
+    title = "Sub-Category Create"
+    sidebar = (3, 2)
+    breadcrumb = ['Home', 'Product Management']
+
+
+class SubCategoryListView(OwnerListMixin, KeysetPaginationMixin, ListView):
+    model = SubCategory
     template_name = 'dashboard/pages/product-management/list.html'
-    ordering = ['name']  # Add this line to order by name
+    ordering = ['name', 'id']  # Keyset order, `id` breaks ties between equal names
+    paginate_by = 50
+    query_budget = 4
 
-    def get_queryset(self):
-        # Filter categories based on the currently logged-in user
-        return Category.objects.filter(owner=self.request.user).order_by(*self.ordering)
+    title = "Sub-Categories"
+    sidebar = (3, 2)
+    breadcrumb = ['Home', 'Product Management']
+
+    # Specify the desired order of fields
+    field_order = ['id', 'image', 'name', 'category', 'description', 'last_update']
 
+    def get_queryset(self):
+        # Join and load only the columns the list displays
+        return queryset_for_fields(super().get_queryset(), self.field_order, extra_fields=self.ordering)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Specify the desired order of fields
-        field_order = ['id', 'image', 'name', 'description', 'last_update']
-
         # Get model fields
-        model_fields = [Category._meta.get_field(field_name) for field_name in field_order]
+        context["model_fields"] = get_model_fields(SubCategory, self.field_order)
 
-        context["model_fields"] = model_fields
+        context['create_url'] = 'sub_category_create'
+        context['update_url'] = 'sub_category_update'
+        context['delete_url'] = 'sub_category_delete'
+        context['export_url'] = 'sub_category_export'
+        context['import_kind'] = 'sub-categories'
+        return context
 
-        context['create_url'] = 'category_create'
-        context['update_url'] = 'category_update'
-        context['delete_url'] = 'category_delete'
 
-        context["title"] = "Categories"
-        context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=1)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
-        return context
+class SubCategoryLookupView(LoginRequiredMixin, View):
+    """
+    JSON sub-categories of a category whose name starts with the typed text,
+    for the lazy sub-category selector of the product form.
+    """
+    limit = 20
 
+    def get(self, request, *args, **kwargs):
+        sub_categories = SubCategory.objects.filter(owner=request.user)
 
-class CategoryUpdateView(LoginRequiredMixin, UpdateView):
-    model = Category
-    fields = ['name', 'image', 'description']
+        category = request.GET.get('category', '')
+        if category:
+            if not category.isdigit():
+                return JsonResponse({'results': []})
+            sub_categories = sub_categories.filter(category=category)
+
+        # Prefix matching, served by the (owner, category, upper(name)) pattern index
+        query = request.GET.get('q', '').strip()
+        if query:
+            sub_categories = sub_categories.filter(name__istartswith=query)
+
+        results = sub_categories.order_by('name', 'id').values('id', 'name')[:self.limit]
+        return JsonResponse({'results': list(results)})
+
+
+class SubCategoryUpdateView(OwnerUpdateMixin, UpdateView):
+    model = SubCategory
+    form_class = SubCategoryForm
+    form_takes_user = True
     template_name = 'dashboard/pages/product-management/update.html'
-    success_url = reverse_lazy('categories')
+    success_url = reverse_lazy('sub_categories')
+    success_message = 'Subcategory updated successfully!'
+    permission_denied_message = 'You do not have permission to update this sub-category.'
+    query_budget = 7
+    upload_query_budget = 14
 
-    def get_queryset(self):
-        # Only allow the owner to update their own categories
-        return Category.objects.filter(owner=self.request.user)
+    title = "Sub-Category Update"
+    sidebar = (3, 2)
+    breadcrumb = ['Home', 'Product Management']
 
-    def form_valid(self, form):
-        # Set the owner before calling form validation
-        form.instance.owner = self.request.user
 
-        response = super().form_valid(form)
-        messages.success(self.request, 'Category Updated successfully!')
-        return response
+class SubCategoryDeleteView(OwnerDeleteMixin, DeleteView):
+    model = SubCategory
+    template_name = 'dashboard/pages/product-management/delete.html'
+    success_url = reverse_lazy('sub_categories')
+    success_message = 'Sub-Category Deleted successfully!'
+    permission_denied_message = 'You do not have permission to delete this sub-category.'
+    query_budget = 8
 
-    def get_object(self, queryset=None):
-        # Ensure the object being updated belongs to the current user
-        obj = super().get_object(queryset)
-        if obj.owner != self.request.user:
-            raise PermissionDenied("You do not have permission to update this category.")
-        return obj
+    title = "Sub-Category Delete"
+    sidebar = (3, 2)
+    breadcrumb = ['Home', 'Product Management']
 
-    def form_invalid(self, form):
-        response = super().form_invalid(form)
-        for field, errors in form.errors.items():
-            for error in errors:
-                if field == '__all__':
-                    messages.error(self.request, f'Error: {error}')
-                else:
-                    field_name = form.fields[field].label
-                    messages.error(self.request, f'Error in {field_name}: {error}')
-        return response
+
+class ProductCreateView(OwnerCreateMixin, CreateView):
+    model = Product
+    form_class = ProductForm
+    form_takes_user = True
+    template_name = 'dashboard/pages/product-management/create.html'
+    success_url = reverse_lazy('products')
+    success_message = 'Product created successfully!'
+    query_budget = 5
+    upload_query_budget = 13
+
+    title = "Product Create"
+    sidebar = (3, 3)
+    breadcrumb = ['Home', 'Product Management']
+
+
+class ProductListView(OwnerListMixin, KeysetPaginationMixin, ListView):
+    model = Product
+    template_name = 'dashboard/pages/product-management/list.html'
+    ordering = ['name', 'id']  # Keyset order, `id` breaks ties between equal names
+    paginate_by = 50
+    query_budget = 4
+
+    title = "Products"
+    sidebar = (3, 3)
+    breadcrumb = ['Home', 'Product Management']
+
+    # Specify the desired order of fields
+    field_order = ['id', 'image', 'name', 'category', 'sub_category', 'price', 'description', 'last_update']
+
+    def get_search_query(self) -> str:
+        return self.request.GET.get('query', '').strip()
+
+    def get_ordering(self):
+        # Search results are ordered by relevance instead of by name
+        if self.get_search_query():
+            return ['-rank', 'id']
+        return super().get_ordering()
+
+    def get_queryset(self):
+        # Join and load only the columns the list displays
+        queryset = queryset_for_fields(super().get_queryset(), self.field_order, extra_fields=self.ordering)
+
+        query = self.get_search_query()
+        if query:
+            queryset = search_products(queryset, query)
+        return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context["title"] = "Category Update"
-        context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=1)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        # Get model fields
+        context["model_fields"] = get_model_fields(Product, self.field_order)
+
+        context['create_url'] = 'product_create'
+        context['update_url'] = 'product_update'
+        context['delete_url'] = 'product_delete'
+        context['export_url'] = 'product_export'
+        context['import_kind'] = 'products'
+        context["has_search_bar"] = True
+        context["query"] = self.get_search_query()
         return context
 
 
-class CategoryDeleteView(LoginRequiredMixin, DeleteView):
-    model = Category
+class ProductUpdateView(OwnerUpdateMixin, UpdateView):
+    model = Product
+    form_class = ProductForm
+    form_takes_user = True
+    template_name = 'dashboard/pages/product-management/update.html'
+    success_url = reverse_lazy('products')
+    success_message = 'Product updated successfully!'
+    permission_denied_message = 'You do not have permission to update this product.'
+    query_budget = 9
+    upload_query_budget = 16
+
+    title = "Product Update"
+    sidebar = (3, 3)
+    breadcrumb = ['Home', 'Product Management']
+
+
+class ProductDeleteView(OwnerDeleteMixin, DeleteView):
+    model = Product
     template_name = 'dashboard/pages/product-management/delete.html'
-    success_url = reverse_lazy('categories')
+    success_url = reverse_lazy('products')
+    success_message = 'Product Deleted successfully!'
+    permission_denied_message = 'You do not have permission to delete this product.'
+    query_budget = 10
+
+    title = "Product Delete"
+    sidebar = (3, 3)
+    breadcrumb = ['Home', 'Product Management']
+
+
+class CatalogImportView(LoginRequiredMixin, PageContextMixin, FormMessagesMixin, FormView):
+    form_class = CatalogImportForm
+    template_name = 'dashboard/pages/product-management/import.html'
+
+    title = "Import"
+    breadcrumb = ['Home', 'Product Management']
+
+    # List page and sidebar sub-section of each import kind
+    kinds = {
+        'categories': ('categories', 1),
+        'sub-categories': ('sub_categories', 2),
+        'products': ('products', 3),
+    }
+
+    # Row errors beyond this are summarized instead of flashed one by one
+    max_error_messages = 20
+
+    def get_kind(self):
+        kind = self.request.POST.get('kind') or self.request.GET.get('kind')
+        return kind if kind in self.kinds else 'products'
+
+    @property
+    def sidebar(self):
+        return (3, self.kinds[self.get_kind()][1])
+
+    def get_initial(self):
+        initial = super().get_initial()
+        initial['kind'] = self.get_kind()
+        return initial
+
+    def form_valid(self, form):
+        kind = form.cleaned_data['kind']
+        upload = form.cleaned_data['file']
+
+        images = None
+        if form.cleaned_data['images']:
+            try:
+                images = ImageSource(form.cleaned_data['images'])
+            except ValueError as error:
+                form.add_error('images', str(error))
+                return self.form_invalid(form)
+
+        importer = IMPORTERS[kind](self.request.user, images=images)
+        try:
+            file = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            result = importer.run(read_rows(file, upload.name))
+        except (UnicodeDecodeError, json.JSONDecodeError, csv.Error, AttributeError) as error:
+            form.add_error('file', f'The file could not be read: {error}')
+            return self.form_invalid(form)
+        finally:
+            if images is not None:
+                images.close()
+
+        messages.success(self.request, f'Import finished: {result.created} created, {result.updated} updated.')
+        for line, message in result.errors[:self.max_error_messages]:
+            messages.error(self.request, f'Error on line {line}: {message}')
+        if len(result.errors) > self.max_error_messages:
+            messages.error(self.request, f'{len(result.errors) - self.max_error_messages} more rows had errors.')
+
+        return redirect(self.kinds[kind][0])
+
+
+class CSVExportView(LoginRequiredMixin, View):
+    """
+    Streams the current user's rows of `model` as a CSV download.
+
+    Rows are read through a server-side cursor in chunks of `chunk_size`
+    and formatted one at a time, so neither the result set nor the file is
+    held in memory.
+    """
+    model = None
+    export_fields = []
+    filename = 'export.csv'
+    ordering = ['name', 'id']
+    chunk_size = 2000
 
     def get_queryset(self):
-        # Only allow the owner to delete their own categories
-        return Category.objects.filter(owner=self.request.user)
+        return self.model.objects.filter(owner=self.request.user).order_by(*self.ordering)
+
+    def get(self, request, *args, **kwargs):
+        rows = self.get_queryset().values_list(*self.export_fields).iterator(chunk_size=self.chunk_size)
+        header = get_export_header(self.model, self.export_fields)
+        return csv_response(self.filename, header, rows)
+
+
+class CategoryExportView(CSVExportView):
+    model = Category
+    export_fields = ['id', 'name', 'description', 'image', 'created_at', 'last_update']
+    filename = 'categories.csv'
+
+
+class SubCategoryExportView(CSVExportView):
+    model = SubCategory
+    export_fields = ['id', 'name', 'category__name', 'description', 'image', 'created_at', 'last_update']
+    filename = 'sub-categories.csv'
+
+
+class ProductExportView(CSVExportView):
+    model = Product
+    export_fields = [
+        'id', 'name', 'category__name', 'sub_category__name', 'description', 'price', 'image', 'created_at',
+        'last_update'
+    ]
+    filename = 'products.csv'
+
+
+class POSView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    model = Product
+    template_name = 'dashboard/pages/sales/pos.html'
+    ordering = ['name', 'id']
+    paginate_by = 50
+
+    def get_search_query(self) -> str:
+        return self.request.GET.get('query', '').strip()
+
+    def get_ordering(self):
+        if self.get_search_query():
+            return ['-rank', 'id']
+        return super().get_ordering()
+
+    def get_queryset(self):
+        queryset = with_stock(Product.objects.filter(owner=self.request.user).only('id', 'name', 'price'))
+
+        query = self.get_search_query()
+        if query:
+            queryset = search_products(queryset, query)
+        return queryset
 
-    def get_object(self, queryset=None):
-        # Ensure the object being deleted belongs to the current user
-        obj = super().get_object(queryset)
-        if obj.owner != self.request.user:
-            raise PermissionDenied("You do not have permission to delete this category.")
-        return obj
-
-    def delete(self, request, *args, **kwargs):
-        messages.success(self.request, 'Category Deleted successfully!')
-        return super().delete(request, *args, **kwargs)
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["title"] = "Category Delete"
+        context["title"] = "POS"
         context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=1)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        context["has_search_bar"] = True
+        context["query"] = self.get_search_query()
+        context["sidebar_data"] = sidebar_data(section_active_id=2, sub_section_active_id=1)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Sales', context['title']])
         return context
 
 
-class SubCategoryCreateView(LoginRequiredMixin, CreateView):
-    model = SubCategory
-    form_class = SubCategoryForm
-    template_name = 'dashboard/pages/product-management/create.html'
-    success_url = reverse_lazy('sub_categories')
+class CheckoutView(LoginRequiredMixin, View):
+    """
+    Rings up a sale with `dashboard.checkout`.
+
+    Terminals post JSON, `{"lines": [{"product": <id>, "quantity": <n>}, ...]}`
+    with an optional `customer` (phone or email) and `paid` amount, and get
+    the order back as JSON. The POS page posts its form, one
+    `quantity-<product id>` field per product, and is redirected.
+    """
+    quantity_prefix = 'quantity-'
+
+    def post(self, request, *args, **kwargs):
+        if request.content_type == 'application/json':
+            return self.post_json(request)
+
+        lines = [
+            (key.removeprefix(self.quantity_prefix), value or 0)
+            for key, value in request.POST.items() if key.startswith(self.quantity_prefix)
+        ]
+        try:
+            customer, paid = self.get_payment(request.POST.get('customer'), request.POST.get('paid'))
+            order = checkout(request.user, parse_quantities(lines), customer=customer, paid=paid)
+        except ValidationError as error:
+            for message in error.messages:
+                messages.error(request, f'Error: {message}')
+            return redirect('pos')
+
+        messages.success(request, f'Order #{order.pk} completed: {order.items} items, {order.total}.')
+        return redirect('pos')
+
+    def post_json(self, request):
+        try:
+            data = json.loads(request.body)
+            lines = [(line['product'], line['quantity']) for line in data['lines']]
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'errors': ['Expected {"lines": [{"product": <id>, "quantity": <n>}]}.']}, status=400)
+
+        try:
+            customer, paid = self.get_payment(data.get('customer'), data.get('paid'))
+            order = checkout(request.user, parse_quantities(lines), customer=customer, paid=paid)
+        except ValidationError as error:
+            return JsonResponse({'errors': error.messages}, status=400)
+
+        return JsonResponse({
+            'order': order.pk, 'items': order.items, 'total': str(order.total), 'paid': str(order.paid),
+            'customer': order.customer_id,
+        }, status=201)
+
+    def get_payment(self, contact, paid) -> tuple:
+        """
+        Returns:
+        tuple: The customer found by phone or email (or None) and the amount paid (or None).
+
+        Raises:
+        ValidationError: If no customer matches, or the amount is not a number.
+        """
+        customer = None
+        if contact:
+            customer = find_customer(self.request.user, str(contact))
+            if customer is None:
+                raise ValidationError(f'No customer with the phone or email "{contact}".')
+
+        if paid in (None, ''):
+            return customer, None
+        try:
+            return customer, Decimal(str(paid))
+        except InvalidOperation:
+            raise ValidationError('The amount paid must be a number.')
+
+
+class OrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    model = Order
+    template_name = 'dashboard/pages/sales/orders.html'
+    ordering = ['-created_at', '-id']  # Newest first, `id` breaks ties
+    paginate_by = 50
 
-    def get_form_kwargs(self):
-        kwargs = super().get_form_kwargs()
-        kwargs['user'] = self.request.user
-        return kwargs
+    def get_queryset(self):
+        return Order.objects.filter(owner=self.request.user)
 
-    def form_valid(self, form):
-        # Set the owner before calling form validation
-        form.instance.owner = self.request.user
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["title"] = "Orders"
+        context["app_name"] = settings.APP_NAME
+        context["sidebar_data"] = sidebar_data(section_active_id=2, sub_section_active_id=2)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Sales', context['title']])
+        return context
 
-        response = super().form_valid(form)
-        messages.success(self.request, 'Subcategory created successfully!')
-        return response
 
-    def form_invalid(self, form):
-        response = super().form_invalid(form)
-        for field, errors in form.errors.items():
-            for error in errors:
-                if field == '__all__':
-                    messages.error(self.request, f'Error: {error}')
-                else:
-                    field_name = form.fields[field].label
-                    messages.error(self.request, f'Error in {field_name}: {error}')
-        return response
+class OrderDetailView(LoginRequiredMixin, DetailView):
+    model = Order
+    template_name = 'dashboard/pages/sales/order.html'
+
+    def get_queryset(self):
+        # Only the owner's orders, with their lines in one extra query
+        return Order.objects.filter(owner=self.request.user).select_related('customer').prefetch_related('lines')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["title"] = "Sub-Category Create"
+        context["title"] = str(self.object)
         context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=2)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        context["sidebar_data"] = sidebar_data(section_active_id=2, sub_section_active_id=2)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Sales', 'Orders', context['title']])
         return context
 
 
-class SubCategoryListView(LoginRequiredMixin, ListView):
-    model = SubCategory
-    template_name = 'dashboard/pages/product-management/list.html'
-    ordering = ['name']  # Add this line to order by name
+class StockMovementListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    model = StockMovement
+    template_name = 'dashboard/pages/inventory/ledger.html'
+    ordering = ['-id']  # Newest first, in ledger order
+    paginate_by = 50
 
     def get_queryset(self):
-        # Filter sub categories based on the currently logged-in user
-        return SubCategory.objects.filter(owner=self.request.user).order_by(*self.ordering)
+        return StockMovement.objects.filter(owner=self.request.user).select_related('product').only(
+            'id', 'kind', 'quantity', 'order_id', 'purchase_order_id', 'note', 'created_at', 'product__name'
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["title"] = "Inventory"
+        context["app_name"] = settings.APP_NAME
+        context["sidebar_data"] = sidebar_data(section_active_id=4, sub_section_active_id=1)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Inventory Management'])
+        return context
+
+
+class StockMovementCreateView(OwnerCreateMixin, CreateView):
+    model = StockMovement
+    form_class = StockMovementForm
+    form_takes_user = True
+    template_name = 'dashboard/pages/product-management/create.html'
+    success_url = reverse_lazy('inventory')
+    success_message = 'Stock movement recorded successfully!'
+    query_budget = 5
 
+    title = "Stock Movement"
+    sidebar = (4, 1)
+    breadcrumb = ['Home', 'Inventory Management']
+
+
+class StockReportView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """
+    Stock of every product as of its latest snapshot, or of the latest one
+    taken by the end of the `date` query parameter. Snapshots are written by
+    the `snapshot_stock` command.
+    """
+    model = Product
+    template_name = 'dashboard/pages/reports/stock.html'
+    ordering = ['name', 'id']
+    paginate_by = 50
+
+    def get_date(self):
+        try:
+            return datetime.date.fromisoformat(self.request.GET.get('date', ''))
+        except ValueError:
+            return None
+
+    def get_queryset(self):
+        as_of = None
+        date = self.get_date()
+        if date is not None:
+            as_of = timezone.make_aware(datetime.datetime.combine(date, datetime.time.max))
+        queryset = Product.objects.filter(owner=self.request.user).only('id', 'name')
+        return with_snapshot(queryset, as_of=as_of)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context["title"] = "Stock Report"
+        context["date"] = self.get_date()
+        context["app_name"] = settings.APP_NAME
+        context["sidebar_data"] = sidebar_data(section_active_id=8, sub_section_active_id=4)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Reports', context['title']])
+        return context
 
-        # Specify the desired order of fields
-        field_order = ['id', 'image', 'name', 'category','description', 'last_update']
 
-        # Get model fields
-        model_fields = [SubCategory._meta.get_field(field_name) for field_name in field_order]
+class SalesReportMixin:
+    def get_report_form(self) -> SalesReportForm:
+        return SalesReportForm(self.request.GET)
 
-        context["model_fields"] = model_fields
+    def get_report_rows(self, form: SalesReportForm):
+        data = form.cleaned_data
+        return report_rows(self.request.user, data['start'], data['end'], data['granularity'], data['breakdown'])
 
-        context['create_url'] = 'sub_category_create'
-        context['update_url'] = 'sub_category_update'
-        context['delete_url'] = 'sub_category_delete'
-        context["title"] = "Sub-Categories"
+
+class SalesReportView(LoginRequiredMixin, SalesReportMixin, TemplateView):
+    """
+    Sales over a date range by hour, day, week or month, in total or by
+    category or product. The page shows the first `max_rows` rows, the CSV
+    export streams all of them.
+    """
+    template_name = 'dashboard/pages/reports/sales.html'
+    max_rows = 500
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = self.get_report_form()
+        context["form"] = form
+        if form.is_valid():
+            rows = list(itertools.islice(self.get_report_rows(form), self.max_rows + 1))
+            context["rows"] = rows[:self.max_rows]
+            context["truncated"] = len(rows) > self.max_rows
+            context["breakdown_label"] = BREAKDOWNS[form.cleaned_data['breakdown']][0]
+            context["totals"] = report_totals(self.request.user, form.cleaned_data['start'], form.cleaned_data['end'])
+            context["export_query"] = urlencode(form.cleaned_data)
+
+        context["title"] = "Sales Report"
         context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=2)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        context["sidebar_data"] = sidebar_data(section_active_id=8, sub_section_active_id=1)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Reports', context['title']])
         return context
 
 
-class SubCategoryUpdateView(LoginRequiredMixin, UpdateView):
-    model = SubCategory
-    form_class = SubCategoryForm
-    template_name = 'dashboard/pages/product-management/update.html'
-    success_url = reverse_lazy('sub_categories')
+class SalesReportExportView(LoginRequiredMixin, SalesReportMixin, View):
+    def get(self, request, *args, **kwargs):
+        form = self.get_report_form()
+        if not form.is_valid():
+            for error in form.errors.values():
+                messages.error(request, f'Error: {error[0]}')
+            return redirect('sales_report')
 
-    def get_form_kwargs(self):
-        kwargs = super().get_form_kwargs()
-        kwargs['user'] = self.request.user
-        return kwargs
-    
-    def get_queryset(self):
-        # Only allow the owner to update their own categories
-        return SubCategory.objects.filter(owner=self.request.user)
-    
-    def get_object(self, queryset=None):
-        # Ensure the object being updated belongs to the current user
-        obj = super().get_object(queryset)
-        if obj.owner != self.request.user:
-            raise PermissionDenied("You do not have permission to update this sub-category.")
-        return obj
+        breakdown = form.cleaned_data['breakdown']
+        header = ['Period', BREAKDOWNS[breakdown][0], 'Quantity', 'Revenue', 'Lines']
+        rows = (
+            (timezone.localtime(period).isoformat(), *values) for period, *values in self.get_report_rows(form)
+        )
+        return csv_response('sales-report.csv', header, rows)
 
-    def form_valid(self, form):
-        # Set the owner before calling form validation
-        form.instance.owner = self.request.user
 
-        response = super().form_valid(form)
-        messages.success(self.request, 'Subcategory updated successfully!')
-        return response
+class CustomerCreateView(OwnerCreateMixin, CreateView):
+    model = Customer
+    form_class = CustomerForm
+    form_takes_user = True
+    template_name = 'dashboard/pages/product-management/create.html'
+    success_url = reverse_lazy('customers')
+    success_message = 'Customer created successfully!'
+    query_budget = 10  # The day's first customer also creates the dashboard rollup row, in a savepoint
 
-    def form_invalid(self, form):
-        response = super().form_invalid(form)
-        for field, errors in form.errors.items():
-            for error in errors:
-                if field == '__all__':
-                    messages.error(self.request, f'Error: {error}')
-                else:
-                    field_name = form.fields[field].label
-                    messages.error(self.request, f'Error in {field_name}: {error}')
-        return response
+    title = "Customer Create"
+    sidebar = (5, 1)
+    breadcrumb = ['Home', 'People Management']
+
+
+class CustomerListView(OwnerListMixin, KeysetPaginationMixin, ListView):
+    model = Customer
+    template_name = 'dashboard/pages/people/customers.html'
+    ordering = ['name', 'id']  # Keyset order, `id` breaks ties between equal names
+    paginate_by = 50
+    query_budget = 4
+
+    title = "Customers"
+    sidebar = (5, 1)
+    breadcrumb = ['Home', 'People Management']
+
+    def get_search_query(self) -> str:
+        return self.request.GET.get('query', '').strip()
 
+    def get_ordering(self):
+        # Search results are ordered by relevance instead of by name
+        if self.get_search_query():
+            return ['-rank', 'id']
+        return super().get_ordering()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        query = self.get_search_query()
+        if query:
+            queryset = search_contacts(queryset, query)
+        return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context["has_search_bar"] = True
+        context["query"] = self.get_search_query()
+        return context
+
+
+class CustomerUpdateView(OwnerUpdateMixin, UpdateView):
+    model = Customer
+    form_class = CustomerForm
+    form_takes_user = True
+    template_name = 'dashboard/pages/product-management/update.html'
+    success_url = reverse_lazy('customers')
+    success_message = 'Customer updated successfully!'
+    query_budget = 7
+
+    title = "Customer Update"
+    sidebar = (5, 1)
+    breadcrumb = ['Home', 'People Management']
+
 
-        context["title"] = "Sub-Category Update"
+class CustomerDeleteView(OwnerDeleteMixin, DeleteView):
+    model = Customer
+    template_name = 'dashboard/pages/product-management/delete.html'
+    success_url = reverse_lazy('customers')
+    success_message = 'Customer deleted successfully!'
+    query_budget = 8
+
+    title = "Customer Delete"
+    sidebar = (5, 1)
+    breadcrumb = ['Home', 'People Management']
+
+
+class CustomerLookupView(LoginRequiredMixin, View):
+    """
+    JSON customer lookup for the POS: an exact phone or email match, or
+    the closest names and partial phone numbers.
+    """
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({'results': []})
+
+        exact = find_customer(request.user, query)
+        if exact is not None:
+            customers = [exact]
+        else:
+            customers = search_contacts(Customer.objects.filter(owner=request.user), query).order_by('-rank', 'id')
+            customers = customers[:self.limit]
+
+        return JsonResponse({'results': [
+            {
+                'id': customer.pk, 'name': customer.name, 'phone': customer.phone, 'email': customer.email,
+                'dues': str(customer.dues),
+            }
+            for customer in customers
+        ]})
+
+
+class CustomerReportView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """
+    Customers by total spent, read in order from an index on the running totals.
+    """
+    model = Customer
+    template_name = 'dashboard/pages/reports/customers.html'
+    ordering = ['-total_spent', '-id']
+    paginate_by = 50
+
+    def get_queryset(self):
+        return Customer.objects.filter(owner=self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["title"] = "Customer Report"
         context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=2)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        context["sidebar_data"] = sidebar_data(section_active_id=8, sub_section_active_id=2)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Reports', context['title']])
         return context
 
 
-class SubCategoryDeleteView(LoginRequiredMixin, DeleteView):
-    model = SubCategory
-    template_name = 'dashboard/pages/product-management/delete.html'
-    success_url = reverse_lazy('sub_categories')
+class DuesReportView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """
+    Customers owing money, largest dues first: one scan of a partial index
+    over the running dues balances.
+    """
+    model = Customer
+    template_name = 'dashboard/pages/reports/dues.html'
+    ordering = ['-dues', '-id']
+    paginate_by = 50
 
     def get_queryset(self):
-        # Only allow the owner to delete their own sub-categories
-        return SubCategory.objects.filter(owner=self.request.user)
+        return Customer.objects.filter(owner=self.request.user, dues__gt=0)
 
-    def get_object(self, queryset=None):
-        # Ensure the object being deleted belongs to the current user
-        obj = super().get_object(queryset)
-        if obj.owner != self.request.user:
-            raise PermissionDenied("You do not have permission to delete this sub-category.")
-        return obj
-
-    def delete(self, request, *args, **kwargs):
-        messages.success(self.request, 'Sub-Category Deleted successfully!')
-        return super().delete(request, *args, **kwargs)
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["title"] = "Sub-Category Delete"
+        context["title"] = "Dues Report"
         context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=2)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        context["sidebar_data"] = sidebar_data(section_active_id=8, sub_section_active_id=3)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Reports', context['title']])
         return context
 
 
-class ProductCreateView(LoginRequiredMixin, CreateView):
-    model = Product
-    form_class = ProductForm
+class PaymentCreateView(LoginRequiredMixin, PageContextMixin, FormMessagesMixin, FormView):
+    form_class = PaymentForm
     template_name = 'dashboard/pages/product-management/create.html'
-    success_url = reverse_lazy('products')
+    success_url = reverse_lazy('dues_report')
 
-    def get_form_kwargs(self):
-        kwargs = super().get_form_kwargs()
-        kwargs['user'] = self.request.user
-        return kwargs
+    title = "Payment"
+    sidebar = (8, 3)
+    breadcrumb = ['Home', 'Reports', 'Dues Report']
 
-    def form_valid(self, form):
-        # Set the owner before calling form validation
-        form.instance.owner = self.request.user
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.customer = get_object_or_404(Customer, pk=kwargs['pk'], owner=request.user)
+        return super().dispatch(request, *args, **kwargs)
 
-        response = super().form_valid(form)
-        messages.success(self.request, 'Product created successfully!')
-        return response
+    def form_valid(self, form):
+        try:
+            record_payment(self.customer, form.cleaned_data['amount'], form.cleaned_data['note'])
+        except ValidationError as error:
+            form.add_error('amount', error)
+            return self.form_invalid(form)
+        return super().form_valid(form)
 
-    def form_invalid(self, form):
-        response = super().form_invalid(form)
-        for field, errors in form.errors.items():
-            for error in errors:
-                if field == '__all__':
-                    messages.error(self.request, f'Error: {error}')
-                else:
-                    field_name = form.fields[field].label
-                    messages.error(self.request, f'Error in {field_name}: {error}')
-        return response
+    def get_success_message(self, cleaned_data):
+        return f'Payment of {cleaned_data["amount"]} recorded for {self.customer}.'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["title"] = "Product Create"
-        context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=3)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        # The heading names the customer, the breadcrumb only the page
+        context["title"] = f"Payment from {self.customer} (dues {self.customer.dues})"
         return context
 
 
-class ProductListView(LoginRequiredMixin, ListView):
-    model = Product
+class SupplierCreateView(OwnerCreateMixin, CreateView):
+    model = Supplier
+    form_class = SupplierForm
+    template_name = 'dashboard/pages/product-management/create.html'
+    success_url = reverse_lazy('suppliers')
+    success_message = 'Supplier created successfully!'
+    query_budget = 3
+
+    title = "Supplier Create"
+    sidebar = (5, 2)
+    breadcrumb = ['Home', 'People Management']
+
+
+class SupplierListView(OwnerListMixin, KeysetPaginationMixin, ListView):
+    model = Supplier
     template_name = 'dashboard/pages/product-management/list.html'
-    ordering = ['name']  # Add this line to order by name
+    ordering = ['name', 'id']  # Keyset order, `id` breaks ties between equal names
+    paginate_by = 50
+    query_budget = 4
+
+    title = "Suppliers"
+    sidebar = (5, 2)
+    breadcrumb = ['Home', 'People Management']
+
+    # Specify the desired order of fields
+    field_order = ['name', 'contact_name', 'phone', 'email', 'last_update']
+
+    def get_search_query(self) -> str:
+        return self.request.GET.get('query', '').strip()
+
+    def get_ordering(self):
+        # Search results are ordered by relevance instead of by name
+        if self.get_search_query():
+            return ['-rank', 'id']
+        return super().get_ordering()
 
     def get_queryset(self):
-        # Filter sub categories based on the currently logged-in user
-        return Product.objects.filter(owner=self.request.user).order_by(*self.ordering)
+        # Load only the columns the list displays
+        queryset = queryset_for_fields(super().get_queryset(), self.field_order, extra_fields=self.ordering)
 
+        query = self.get_search_query()
+        if query:
+            queryset = search_contacts(queryset, query)
+        return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Specify the desired order of fields
-        field_order = ['id', 'image', 'name', 'category', 'sub_category', 'description', 'last_update']
-
         # Get model fields
-        model_fields = [Product._meta.get_field(field_name) for field_name in field_order]
+        context["model_fields"] = get_model_fields(Supplier, self.field_order)
 
-        context["model_fields"] = model_fields
-
-        context["title"] = "Products"
-        context['create_url'] = 'product_create'
-        context['update_url'] = 'product_update'
-        context['delete_url'] = 'product_delete'
-        context["app_name"] = settings.APP_NAME
+        context['create_url'] = 'supplier_create'
+        context['update_url'] = 'supplier_update'
+        context['delete_url'] = 'supplier_delete'
+        context['export_url'] = 'supplier_export'
         context["has_search_bar"] = True
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=3)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        context["query"] = self.get_search_query()
         return context
 
 
-class ProductUpdateView(LoginRequiredMixin, UpdateView):
-    model = Product
-    form_class = ProductForm
+class SupplierUpdateView(OwnerUpdateMixin, UpdateView):
+    model = Supplier
+    form_class = SupplierForm
     template_name = 'dashboard/pages/product-management/update.html'
-    success_url = reverse_lazy('products')
+    success_url = reverse_lazy('suppliers')
+    success_message = 'Supplier updated successfully!'
+    query_budget = 4
 
-    def get_form_kwargs(self):
-        kwargs = super().get_form_kwargs()
-        kwargs['user'] = self.request.user
-        return kwargs
-    
-    def get_queryset(self):
-        # Only allow the owner to update their own categories
-        return Product.objects.filter(owner=self.request.user)
-    
-    def get_object(self, queryset=None):
-        # Ensure the object being updated belongs to the current user
-        obj = super().get_object(queryset)
-        if obj.owner != self.request.user:
-            raise PermissionDenied("You do not have permission to update this product.")
-        return obj
+    title = "Supplier Update"
+    sidebar = (5, 2)
+    breadcrumb = ['Home', 'People Management']
 
-    def form_valid(self, form):
-        # Set the owner before calling form validation
-        form.instance.owner = self.request.user
 
-        response = super().form_valid(form)
-        messages.success(self.request, 'Product updated successfully!')
-        return response
+class SupplierDeleteView(OwnerDeleteMixin, DeleteView):
+    model = Supplier
+    template_name = 'dashboard/pages/product-management/delete.html'
+    success_url = reverse_lazy('suppliers')
+    success_message = 'Supplier deleted successfully!'
+    query_budget = 7
+
+    title = "Supplier Delete"
+    sidebar = (5, 2)
+    breadcrumb = ['Home', 'People Management']
+
+
+class SupplierExportView(CSVExportView):
+    model = Supplier
+    export_fields = ['id', 'name', 'contact_name', 'phone', 'email', 'address', 'created_at', 'last_update']
+    filename = 'suppliers.csv'
 
-    def form_invalid(self, form):
-        response = super().form_invalid(form)
-        for field, errors in form.errors.items():
-            for error in errors:
-                if field == '__all__':
-                    messages.error(self.request, f'Error: {error}')
-                else:
-                    field_name = form.fields[field].label
-                    messages.error(self.request, f'Error in {field_name}: {error}')
-        return response
 
+class PurchaseOrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    model = PurchaseOrder
+    template_name = 'dashboard/pages/inventory/purchase-orders.html'
+    ordering = ['-created_at', '-id']  # Newest first, `id` breaks ties
+    paginate_by = 50
+
+    def get_queryset(self):
+        return PurchaseOrder.objects.filter(owner=self.request.user).select_related('supplier').only(
+            'reference', 'status', 'lines_count', 'items', 'total', 'created_at', 'received_at', 'supplier__name',
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
-        context["title"] = "Product Update"
+        context["title"] = "Purchase Orders"
         context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=3)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        context["sidebar_data"] = sidebar_data(section_active_id=4, sub_section_active_id=2)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Inventory Management', context['title']])
         return context
 
 
-class ProductDeleteView(LoginRequiredMixin, DeleteView):
-    model = Product
-    template_name = 'dashboard/pages/product-management/delete.html'
-    success_url = reverse_lazy('products')
+class PurchaseOrderCreateView(LoginRequiredMixin, PageContextMixin, FormMessagesMixin, OwnerFormMixin, FormView):
+    form_class = PurchaseOrderForm
+    form_takes_user = True
+    template_name = 'dashboard/pages/product-management/create.html'
 
-    def get_queryset(self):
-        # Only allow the owner to delete their own product
-        return Product.objects.filter(owner=self.request.user)
+    title = "Purchase Order Create"
+    sidebar = (4, 2)
+    breadcrumb = ['Home', 'Inventory Management']
 
-    def get_object(self, queryset=None):
-        # Ensure the object being deleted belongs to the current user
-        obj = super().get_object(queryset)
-        if obj.owner != self.request.user:
-            raise PermissionDenied("You do not have permission to delete this product.")
-        return obj
+    # Line errors beyond this are summarized instead of flashed one by one
+    max_error_messages = 20
 
-    def delete(self, request, *args, **kwargs):
-        messages.success(self.request, 'Product Deleted successfully!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        try:
+            file = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            lines = parse_purchase_lines(self.request.user, read_rows(file, upload.name))
+        except (UnicodeDecodeError, json.JSONDecodeError, csv.Error, AttributeError) as error:
+            form.add_error('file', f'The file could not be read: {error}')
+            return self.form_invalid(form)
+        except ValidationError as error:
+            errors = error.messages
+            if len(errors) > self.max_error_messages:
+                errors = errors[:self.max_error_messages] + [f'{len(errors) - self.max_error_messages} more lines had errors.']
+            form.add_error('file', errors)
+            return self.form_invalid(form)
+
+        purchase_order = create_purchase_order(
+            self.request.user, form.cleaned_data['supplier'], lines, reference=form.cleaned_data['reference']
+        )
+        messages.success(self.request, f'{purchase_order} created with {purchase_order.lines_count} lines.')
+        return redirect('purchase_order_detail', pk=purchase_order.pk)
+
+
+class PurchaseOrderDetailView(LoginRequiredMixin, DetailView):
+    model = PurchaseOrder
+    template_name = 'dashboard/pages/inventory/purchase-order.html'
+
+    def get_queryset(self):
+        # Only the owner's purchase orders, with their lines in one extra query
+        return PurchaseOrder.objects.filter(owner=self.request.user).select_related('supplier').prefetch_related('lines')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["title"] = "Product Delete"
+        context["title"] = str(self.object)
         context["app_name"] = settings.APP_NAME
-        context["sidebar_data"] = sidebar_data(section_active_id=3, sub_section_active_id=3)
-        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Product Management', context['title']])
+        context["sidebar_data"] = sidebar_data(section_active_id=4, sub_section_active_id=2)
+        context["page_title_data"] = page_title_data(name=context['title'], path_sequence=['Home', 'Inventory Management', 'Purchase Orders', context['title']])
         return context
 
 
+class PurchaseOrderReceiveView(LoginRequiredMixin, View):
+    """
+    Receives a purchase order: its lines go into the inventory ledger in one statement.
+    """
+
+    def post(self, request, *args, **kwargs):
+        purchase_order = get_object_or_404(PurchaseOrder, pk=kwargs['pk'], owner=request.user)
+        try:
+            received = receive_purchase_order(purchase_order)
+        except ValidationError as error:
+            messages.error(request, f'Error: {error.messages[0]}')
+        else:
+            messages.success(request, f'{purchase_order} received: {received} products restocked.')
+        return redirect('purchase_order_detail', pk=purchase_order.pk)
+
+
 class NotFoundView(TemplateView):
     template_name = "dashboard/pages/404.html"
 
@@ -0,0 +1,23 @@
+from django.db import connection, transaction
+from django.db.models import Max
+
+
+def committed_watermark(model) -> int:
+    """
+    Finds the highest id of an append-only table below which every row is committed.
+
+    Ids are allocated when rows are inserted, not when they commit, so a row
+    with a lower id can still become visible after a higher one. A SHARE lock
+    waits for the transactions inserting rows to finish and holds new
+    inserts only for the time of reading the maximum id.
+
+    Parameters:
+    - model (Model): The append-only model, e.g. StockMovement or Order.
+
+    Returns:
+    int: The id incremental readers can safely count up to, 0 for an empty table.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(model._meta.db_table)} IN SHARE MODE')
+        return model.objects.aggregate(last=Max('id'))['last'] or 0
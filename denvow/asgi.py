@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'denvow.settings')
 
 application = get_asgi_application()
+
+from .media import ASGIMediaFilesHandler  # noqa: E402 (needs the settings module set)
+
+# Answers media requests before the middleware stack
+application = ASGIMediaFilesHandler(application)
@@ -0,0 +1,319 @@
+"""
+Production serving of user-uploaded media files.
+
+`MediaFilesHandler` wraps the WSGI (or ASGI) application and answers requests
+under `MEDIA_URL` before they reach the middleware stack, so image requests
+never load a session, a user or a profile. Depending on `MEDIA_SERVE_MODE`
+the file is either streamed by Django itself, through the server's
+`wsgi.file_wrapper` (zero-copy `os.sendfile` on gunicorn), or handed to the
+front proxy with an `X-Accel-Redirect` (nginx) or `X-Sendfile` header.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote, urlparse
+from urllib.request import url2pathname
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler, get_path_info
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseNotFound
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+
+SERVE_MODES = ('django', 'x-accel-redirect', 'x-sendfile')
+
+# Content-hashed names never change content: ImageKit's `CACHE/images/.../<md5>.webp`
+# renditions and the `<sha256>.jpg` uploads of `dashboard.storage`
+HASHED_NAME_RE = re.compile(r'(?:^|[._-])[0-9a-f]{32,}$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Read size when the server has no sendfile-capable file wrapper
+BLOCK_SIZE = 64 * 1024
+
+
+def is_hashed_name(path: str) -> bool:
+    """
+    Parameters:
+    - path (str): A media path.
+
+    Returns:
+    bool: True if the file name carries a content hash, so it can be cached forever.
+    """
+    return bool(HASHED_NAME_RE.search(posixpath.splitext(posixpath.basename(path))[0]))
+
+
+def get_etag(st) -> str:
+    # Strong validator: any rewrite of the file changes its size or mtime
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range(header: str, size: int):
+    """
+    Parses a single-range `Range` header.
+
+    Malformed headers and multiple ranges are ignored, which RFC 9110 allows:
+    the whole file is sent instead.
+
+    Parameters:
+    - header (str): The `Range` header value.
+    - size (int): The file size in bytes.
+
+    Returns:
+    tuple: The inclusive (start, end) byte positions, or None to send the whole file.
+
+    Raises:
+    ValueError: If the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # Suffix range: the last `end` bytes
+        length = int(end)
+        if not length or not size:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(end), size - 1) if end else size - 1
+    if end < start:
+        return None
+    return start, end
+
+
+def if_range_passes(request, etag: str, last_modified: int) -> bool:
+    """
+    Returns:
+    bool: False if an `If-Range` validator no longer matches, so the whole file is sent.
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+class BoundedFile:
+    """
+    Read-only view of `length` bytes of an open file, from its current position.
+
+    Has no `fileno()`, so servers fall back to plain reads, which stop at the
+    end of the range instead of the end of the file.
+    """
+
+    def __init__(self, file, length: int):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def serve_media(request, path: str):
+    """
+    Serves one media file with validators, cache headers and byte ranges.
+
+    Parameters:
+    - request (HttpRequest): The request, GET or HEAD.
+    - path (str): The file path, relative to `MEDIA_ROOT`.
+
+    Returns:
+    HttpResponse: The file, a 206 range, a 304/412/416 response, or a proxy redirect.
+
+    Raises:
+    Http404: If the file does not exist or lies outside `MEDIA_ROOT`.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('"%s" does not exist' % path)
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('"%s" does not exist' % path)
+
+    etag = get_etag(st)
+    last_modified = int(st.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': (
+            IMMUTABLE_CACHE_CONTROL if is_hashed_name(path)
+            else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+        ),
+        # Normally added by SecurityMiddleware, which media requests skip
+        'X-Content-Type-Options': 'nosniff',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        for header, value in headers.items():
+            response.headers.setdefault(header, value)
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if settings.MEDIA_SERVE_MODE == 'x-accel-redirect':
+        # nginx serves the file from an `internal` location, handling ranges itself
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        return response
+
+    if settings.MEDIA_SERVE_MODE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Sendfile'] = full_path
+        return response
+
+    size = st.st_size
+    headers['Accept-Ranges'] = 'bytes'
+    byte_range = None
+    if request.META.get('HTTP_RANGE') and if_range_passes(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+    else:
+        file = open(full_path, 'rb')
+        file.seek(start)
+        # Ranges reaching the end of the file keep the real file, and so sendfile
+        body = file if start + length == size else BoundedFile(file, length)
+        response = FileResponse(body, content_type=content_type, headers=headers)
+        response.block_size = BLOCK_SIZE
+
+    response['Content-Length'] = length
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+async def iterate_in_thread(iterator):
+    """
+    Asynchronously yields the blocks of a synchronous iterator, each read in a
+    worker thread.
+
+    Django would otherwise read a `FileResponse` entirely into memory before
+    sending it to an ASGI server.
+    """
+    read = sync_to_async(next, thread_sensitive=False)
+    while (block := await read(iterator, None)) is not None:
+        yield block
+
+
+def not_found() -> HttpResponse:
+    # A plain 404: `handler404` renders the whole site layout, with a 200 status
+    return HttpResponseNotFound(headers={'X-Content-Type-Options': 'nosniff'})
+
+
+class MediaFilesHandlerMixin:
+    """
+    Common methods of the WSGI and ASGI media handlers, modelled on Django's
+    `StaticFilesHandler`.
+    """
+    handles_files = True
+
+    def load_middleware(self, is_async=False):
+        # Media requests deliberately skip the middleware stack
+        pass
+
+    def get_base_url(self) -> str:
+        if settings.MEDIA_SERVE_MODE not in SERVE_MODES:
+            raise ImproperlyConfigured(
+                'MEDIA_SERVE_MODE must be one of %s.' % ', '.join(SERVE_MODES)
+            )
+        return settings.MEDIA_URL
+
+    def _should_handle(self, path: str) -> bool:
+        return path.startswith(self.base_url[2]) and not self.base_url[1]
+
+    def file_path(self, url: str) -> str:
+        return url2pathname(url.removeprefix(self.base_url[2]))
+
+    def serve(self, request):
+        return serve_media(request, self.file_path(request.path))
+
+    def get_response(self, request):
+        try:
+            return self.serve(request)
+        except Http404:
+            return not_found()
+
+    async def get_response_async(self, request):
+        try:
+            return await sync_to_async(self.serve, thread_sensitive=False)(request)
+        except Http404:
+            return not_found()
+
+
+class MediaFilesHandler(MediaFilesHandlerMixin, WSGIHandler):
+    """
+    WSGI middleware that intercepts requests under `MEDIA_URL` and serves them
+    with `serve_media`.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.base_url = urlparse(self.get_base_url())
+        super().__init__()
+
+    def __call__(self, environ, start_response):
+        if not self._should_handle(get_path_info(environ)):
+            return self.application(environ, start_response)
+        return super().__call__(environ, start_response)
+
+
+class ASGIMediaFilesHandler(MediaFilesHandlerMixin, ASGIHandler):
+    """
+    ASGI counterpart of `MediaFilesHandler`.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.base_url = urlparse(self.get_base_url())
+        super().__init__()
+
+    async def get_response_async(self, request):
+        response = await super().get_response_async(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = iterate_in_thread(iter(response.streaming_content))
+        return response
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and self._should_handle(scope['path']):
+            return await super().__call__(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -28,6 +29,23 @@ DEBUG = config('DEBUG', default=False, cast=bool)
 
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='', cast=lambda v: [s.strip() for s in v.split(',')])
 
+# Raise when a view runs more queries than its `query_budget` (dashboard.mixins); the tests always check
+QUERY_BUDGET_CHECKS = config('QUERY_BUDGET_CHECKS', default=DEBUG, cast=bool)
+
+# Per-request profiling (dashboard.profiling): a Server-Timing header and a JSON log line per
+# request, and cProfile dumps of a sampled fraction (0-1) of the requests in PROFILING_DIR
+PROFILING = config('PROFILING', default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+
+# Prometheus metrics (dashboard.metrics) served at /metrics/, with an optional bearer token.
+# With METRICS_DIR, each process (e.g. gunicorn worker) writes its totals there every
+# METRICS_FLUSH_INTERVAL seconds and the endpoint sums them; clear it on each deployment
+METRICS = config('METRICS', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5.0, cast=float)
+
 
 # Application definition
 PROJECT_APPS = [
@@ -53,11 +71,16 @@ INTERNAL_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 INSTALLED_APPS = PROJECT_APPS + EXTERNAL_APPS + INTERNAL_APPS
 
 MIDDLEWARE = [
+    # First, to measure the whole request; removed at startup unless PROFILING or METRICS is on
+    'dashboard.profiling.ProfilingMiddleware',
+    'dashboard.metrics.MetricsMiddleware',
+
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,19 +97,28 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'denvow.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates'
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'dashboard.context_processors.fragment_versions',
+            ],
+            # Parsed templates are kept in memory outside DEBUG, so edits show up while developing
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
             ],
         },
     },
@@ -108,17 +140,107 @@ WSGI_APPLICATION = 'denvow.wsgi.application'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
 DATABASES = {
-    # postgresql database as default
+    # postgresql database as default, through Django's backend extended with a connection pool
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'dashboard.db',
         'NAME': config('POSTGRES_DB'),
         'USER': config('POSTGRES_USER'),
         'PASSWORD': config('POSTGRES_PASSWORD'),
         'HOST': config('POSTGRES_HOST'),
-        'PORT': config('POSTGRES_PORT', default=5432, cast=int)
+        'PORT': config('POSTGRES_PORT', default=5432, cast=int),
+        # Seconds a thread keeps its connection for its next requests, 0 to close it after each request
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=0, cast=int),
+        # Check a reused connection before the request's first query, and reconnect if it was dropped
+        'CONN_HEALTH_CHECKS': config('DATABASE_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {
+            # Typo tolerance of the product search, pg_trgm's default of 0.6 misses common misspellings
+            'options': '-c pg_trgm.word_similarity_threshold=%s' % config('SEARCH_TRIGRAM_THRESHOLD', default=0.4, cast=float),
+        },
     }
 }
 
+if config('DATABASE_POOL', default=False, cast=bool):
+    # A pool per worker process, lending its connections to the requests; size it to the worker's threads
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'max_size': config('DATABASE_POOL_MAX_SIZE', default=4, cast=int),
+        'timeout': config('DATABASE_POOL_TIMEOUT', default=30.0, cast=float),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    # Local memory by default; use a shared backend (e.g. Redis) to share fragments between processes
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Sessions read by 'cached-db' below, which needs a shared backend (e.g. Redis): a local
+# memory copy is per process, so a session ended in one worker would live on in the others
+CACHES['sessions'] = {
+    'BACKEND': config('SESSION_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+    'LOCATION': config('SESSION_CACHE_LOCATION', default='sessions'),
+}
+
+if METRICS:
+    # Counts the cache's hits and misses for the metrics
+    CACHES['default'] = {
+        'BACKEND': 'dashboard.metrics.InstrumentedCache',
+        'OPTIONS': {'CACHE': CACHES['default']},
+    }
+
+# Lifetime of the cached page shell fragments (header, footer, asset tags)
+TEMPLATE_FRAGMENT_TIMEOUT = config('TEMPLATE_FRAGMENT_TIMEOUT', default=3600, cast=int)
+
+# Lifetime of the cached per-owner category and sub-category choices of the forms
+FORM_CHOICES_TIMEOUT = config('FORM_CHOICES_TIMEOUT', default=3600, cast=int)
+
+
+# Sessions and messages
+# https://docs.djangoproject.com/en/5.0/topics/http/sessions/
+
+# Where sessions live: 'db' reads the django_session row on every request, 'cached-db'
+# reads it from the shared 'sessions' cache and writes through to both, 'signed-cookies'
+# keeps it in the browser, signed with SECRET_KEY, so a request neither reads nor writes it
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached-db': 'django.contrib.sessions.backends.cached_db',
+    'signed-cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = config('SESSION_MODE', default='db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+if SESSION_MODE == 'cached-db' and CACHES['sessions']['BACKEND'].endswith('.LocMemCache'):
+    raise ImproperlyConfigured("SESSION_MODE 'cached-db' needs a shared SESSION_CACHE_BACKEND, e.g. Redis.")
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Flash messages ride in a cookie, stored in the session only when they overflow it
+MESSAGE_STORAGE = 'django.contrib.messages.storage.fallback.FallbackStorage'
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.0/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # The per-request lines of the profiling middleware
+        'dashboard.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -163,9 +285,27 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How media is sent: 'django' streams files from the app (zero-copy sendfile where
+# the WSGI server supports it), 'x-accel-redirect' (nginx) and 'x-sendfile'
+# (Apache, lighttpd) hand the transfer to the front proxy
+MEDIA_SERVE_MODE = config('MEDIA_SERVE_MODE', default='django')
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+# Browser cache lifetime of media without a content hash in its name
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=3600, cast=int)
+
+# Image processing: 'sync' resizes uploads in the request, 'async' stores the raw
+# upload and resizes it in a pool of local worker processes
+IMAGE_PROCESSING = config('IMAGE_PROCESSING', default='sync')
+IMAGE_PROCESSING_WORKERS = config('IMAGE_PROCESSING_WORKERS', default=2, cast=int)
+
 # storage
 STORAGES = {
+    # Names uploads by content hash, storing identical files once
     "default": {
+        "BACKEND": "dashboard.storage.ContentAddressedStorage",
+    },
+    # ImageKit renditions already have deterministic, hashed names
+    "imagekit": {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
     },
     "staticfiles": {
@@ -173,11 +313,16 @@ STORAGES = {
     },
 }
 
+IMAGEKIT_DEFAULT_FILE_STORAGE = 'imagekit'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Enables the query budget checks of the views for the whole suite
+TEST_RUNNER = 'dashboard.test_runner.DashboardTestRunner'
+
 
 # PROJECT CONF
 LOGIN_URL = 'account_login'
@@ -15,10 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include, re_path
+from django.urls import path, include
 from django.conf import settings
-from django.views.static import serve
 from django.conf.urls.static import static
+from dashboard.metrics import MetricsView
 from dashboard.views import NotFoundView
 
 
@@ -28,15 +28,13 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('accounts/', include('allauth.urls')),
     path('user/', include('dashboard.urls')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 handler404 = NotFoundView.as_view()
 
+# Media requests are answered by `denvow.media.MediaFilesHandler`, wrapped around the
+# WSGI/ASGI application in front of the middleware stack; this route only serves
+# callers of the URLconf itself, such as the test client
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-
-else:
-    # Serve media files in production using Django's default server
-    urlpatterns += [
-        re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
-    ]
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -15,3 +15,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'denvow.settings')
 
 application = get_wsgi_application()
+
+from .media import MediaFilesHandler  # noqa: E402 (needs the settings module set)
+
+# Answers media requests before the middleware stack
+application = MediaFilesHandler(application)